@@ -231,6 +231,7 @@ function App() {
   const [seedLogs, setSeedLogs] = useState(null);
   const [ingestionLogs, setIngestionLogs] = useState(null);
   const [queueData, setQueueData] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [selectedJob, setSelectedJob] = useState(null);
 
   // --- API HANDLERS ---
@@ -239,7 +240,22 @@ function App() {
     setSeedLogs("Initiating Seeding...");
     try {
       const res = await axios.post(`${API_BASE}/seed-knowledge`);
-      setSeedLogs(prev => prev + "\n" + (res.data.output || "Success!"));
+      let job = res.data.job;
+      const header = res.data.status === 'already_running'
+        ? `Seeding already running (job ${job.id})`
+        : `Seed job ${job.id} started`;
+      // Poll the job until it finishes; seeding runs in the background
+      while (!['SUCCEEDED', 'FAILED', 'CANCELLED'].includes(job.status)) {
+        const p = job.progress;
+        setSeedLogs(`${header}\n${job.status}: embedded ${p.embedded}/${p.total}, inserted ${p.inserted}/${p.total} (${job.rows_per_second} rows/s)`);
+        await new Promise(r => setTimeout(r, 1000));
+        job = (await axios.get(`${API_BASE}/seed-knowledge/jobs/${job.id}`)).data;
+      }
+      const p = job.progress;
+      const r = job.result;
+      setSeedLogs(`${header}\n${job.status}: inserted ${p.inserted}/${p.total} in ${job.elapsed_seconds}s` +
+        (r ? `\n${r.unchanged} unchanged, ${r.cached} embeddings from cache, ${r.updated} updated, ${r.deleted} deleted` : '') +
+        (job.error ? `\nError: ${job.error}` : ''));
     } catch (e) {
       setSeedLogs(prev => prev + "\nError: " + e.message);
     } finally { setLoading(false); }
@@ -260,9 +276,30 @@ function App() {
     try {
       const res = await axios.get(`${API_BASE}/active-queue`);
       setQueueData(res.data || []);
+      setNextCursor(res.headers['x-next-cursor'] || null);
     } catch (e) { console.error(e); }
   };
 
+  const loadMoreQueue = async () => {
+    if (!nextCursor) return;
+    try {
+      const res = await axios.get(`${API_BASE}/active-queue`, { params: { cursor: nextCursor } });
+      setQueueData(prev => [...prev, ...(res.data || [])]);
+      setNextCursor(res.headers['x-next-cursor'] || null);
+    } catch (e) { console.error(e); }
+  };
+
+  // List rows only carry the summary fields; load the full job for editor/player
+  const fetchJob = async (job) => {
+    try {
+      const res = await axios.get(`${API_BASE}/jobs/${job.id}`);
+      return res.data;
+    } catch (e) {
+      console.error(e);
+      return job;
+    }
+  };
+
   // --- NEW WORKFLOW HANDLERS ---
 
   const handleGenerateScript = async (payload) => {
@@ -277,6 +314,19 @@ function App() {
     } finally { setLoading(false); }
   };
 
+  const handleGenerateBatch = async (items) => {
+    setLoading(true);
+    try {
+      const res = await axios.post(`${API_BASE}/generate-script/batch`, { items });
+      const { created, existing, duplicates } = res.data;
+      alert(`Queued ${created} new scripts (${existing} already existed, ${duplicates} duplicates).`);
+      fetchQueue();
+      setView('dashboard');
+    } catch (e) {
+      alert("Error: " + e.message);
+    } finally { setLoading(false); }
+  };
+
   const handleApproveScript = async (payload) => {
     setLoading(true);
     try {
@@ -301,21 +351,33 @@ function App() {
     } finally { setLoading(false); }
   };
 
-  const openEditor = (job) => {
-    setSelectedJob(job);
+  const openEditor = async (job) => {
+    setSelectedJob(await fetchJob(job));
     setView('editor');
   };
 
-  const openPlayer = (job) => {
-    setSelectedJob(job);
+  const openPlayer = async (job) => {
+    setSelectedJob(await fetchJob(job));
     setView('publish');
   };
 
+  // Live queue: the API pushes changed rows over SSE instead of us polling.
+  // A 'resync' event (sent on connect, or when we fell behind) means refetch the first page.
   useEffect(() => {
     if (view === 'dashboard') {
-      fetchQueue();
-      const interval = setInterval(fetchQueue, 5000);
-      return () => clearInterval(interval);
+      const source = new EventSource(`${API_BASE}/queue/stream`);
+      source.addEventListener('change', (e) => {
+        const { row } = JSON.parse(e.data);
+        setQueueData(prev => {
+          const idx = prev.findIndex(r => r.id === row.id);
+          if (idx === -1) return [row, ...prev];
+          const next = [...prev];
+          next[idx] = { ...next[idx], ...row };
+          return next;
+        });
+      });
+      source.addEventListener('resync', fetchQueue);
+      return () => source.close();
     }
   }, [view]);
 
@@ -432,6 +494,11 @@ function App() {
             </tbody>
           </Table>
         </div>
+        {nextCursor && (
+          <ActionButton onClick={loadMoreQueue} style={{ marginTop: '20px', background: '#000', fontSize: '14px' }}>
+            LOAD MORE
+          </ActionButton>
+        )}
       </Card>
     </div>
   );
@@ -467,7 +534,7 @@ function App() {
       {view === 'news' && (
         <div style={{ width: '100%', maxWidth: '1200px' }}>
           <div style={{ marginBottom: '20px', cursor: 'pointer', fontWeight: 'bold' }} onClick={() => setView('dashboard')}>← Back to Dashboard</div>
-          <NewsFeed onGenerate={handleGenerateScript} />
+          <NewsFeed onGenerate={handleGenerateScript} onGenerateBatch={handleGenerateBatch} />
         </div>
       )}
 
@@ -118,7 +118,7 @@ const MOCK_TRENDS = [
   { id: 4, topic: "Student Loan Interest Deductions", source: "Spiegel", url: "https://spiegel.de", tag: "GUIDE" },
 ];
 
-const NewsFeed = ({ onGenerate }) => {
+const NewsFeed = ({ onGenerate, onGenerateBatch }) => {
   const [customTopic, setCustomTopic] = useState("");
   const [generating, setGenerating] = useState(null); // ID or 'custom'
   const [trends, setTrends] = useState([]);
@@ -149,6 +149,13 @@ const NewsFeed = ({ onGenerate }) => {
     if (id === 'custom') setCustomTopic("");
   };
 
+  const handleGenerateAll = async () => {
+    setGenerating('all');
+    // One request for every trend instead of one per card
+    await onGenerateBatch(trends.map(item => ({ topic: item.topic, source_url: item.url })));
+    setGenerating(null);
+  };
+
   return (
     <Container>
       <SectionTitle>
@@ -172,6 +179,16 @@ const NewsFeed = ({ onGenerate }) => {
 
       <SectionTitle>
         <TrendingUp size={32} /> Trending Now
+        {onGenerateBatch && trends.length > 1 && (
+          <Button
+            onClick={handleGenerateAll}
+            disabled={generating === 'all'}
+            style={{ marginLeft: 'auto', padding: '10px 20px', fontSize: '14px' }}
+          >
+            {generating === 'all' ? <RefreshCw className="spin" size={16} /> : <Send size={16} />}
+            Create All ({trends.length})
+          </Button>
+        )}
       </SectionTitle>
 
       <Grid>
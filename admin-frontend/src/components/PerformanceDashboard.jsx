@@ -140,6 +140,7 @@ const PerformanceDashboard = () => {
 
     const pieData = data ? data.status_distribution : PIE_DATA;
     const totalAssets = data ? data.total_assets : 0;
+    const outputData = data && data.daily_output ? data.daily_output : MOCK_OUTPUT_DATA;
 
     return (
         <Container>
@@ -176,7 +177,7 @@ const PerformanceDashboard = () => {
                 <ChartCard>
                     <ChartTitle>Weekly Production Output (Target: 30-60/day)</ChartTitle>
                     <ResponsiveContainer width="100%" height="85%">
-                        <BarChart data={MOCK_OUTPUT_DATA}>
+                        <BarChart data={outputData}>
                             <CartesianGrid strokeDasharray="3 3" />
                             <XAxis dataKey="name" />
                             <YAxis />
@@ -101,6 +101,7 @@ const VideoPlayer = ({ job, onPublish }) => {
                     <video
                         src={job.video_url}
                         controls
+                        preload="metadata"
                         style={{ height: '100%', width: 'auto', maxWidth: '100%' }}
                     />
                 ) : (
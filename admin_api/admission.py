@@ -0,0 +1,123 @@
+"""
+Admission control for the n8n workflow stages (migration 012).
+
+n8n acknowledges a webhook at once and works afterwards, so the API limits
+how many jobs each stage may have running in n8n:
+
+* The outbox dispatcher only claims as many triggers as the stage has free
+  slots (STAGE_LIMITS, across all API workers). A slot is held from
+  delivery until n8n writes the job's next status, or STAGE_TIMEOUT.
+  Everything else waits in the outbox with its job in PENDING_GENERATION /
+  PENDING_RENDER / READY_TO_PUBLISH, and is released in enqueue order.
+* ADMISSION_MODE=reject additionally refuses new requests for a stage whose
+  backlog already holds ADMISSION_MAX_QUEUED jobs while all its slots are
+  busy: 429 with a Retry-After estimated from the stage's recent service
+  time. The default, "queue", accepts everything.
+
+Queue wait (enqueue to dispatch) is recorded per stage in
+taxfix_stage_queue_wait_seconds.
+"""
+import math
+import os
+import time
+from typing import Dict, Optional
+
+from admin_api import db
+from dashboard import metrics
+
+STAGES = ("generate", "render", "publish")
+# Jobs running in n8n per stage; 0 = unlimited
+STAGE_LIMITS = {
+    "generate": int(os.environ.get("STAGE_LIMIT_GENERATE", "4")),  # OpenAI calls
+    "render": int(os.environ.get("STAGE_LIMIT_RENDER", "2")),      # editly, CPU bound
+    "publish": int(os.environ.get("STAGE_LIMIT_PUBLISH", "4")),
+}
+# A slot whose job never reports back is freed after this long (EXECUTIONS_TIMEOUT_MAX + margin)
+STAGE_TIMEOUT = int(os.environ.get("STAGE_TIMEOUT", "900"))
+ADMISSION_MODE = os.environ.get("ADMISSION_MODE", "queue")  # queue | reject
+ADMISSION_MAX_QUEUED = int(os.environ.get("ADMISSION_MAX_QUEUED", "20"))
+# Stage load is read from the database at most this often per worker
+ADMISSION_LOAD_TTL = float(os.environ.get("ADMISSION_LOAD_TTL", "1"))
+# Used for Retry-After until a stage has recent releases
+ADMISSION_DEFAULT_SERVICE_SECONDS = float(os.environ.get("ADMISSION_DEFAULT_SERVICE_SECONDS", "60"))
+ADMISSION_RETRY_AFTER_MAX = int(os.environ.get("ADMISSION_RETRY_AFTER_MAX", "300"))
+
+
+class StageSaturated(Exception):
+    def __init__(self, stage: str, retry_after: int, load: dict):
+        super().__init__(f"The {stage} stage is saturated ({load['running']} running, "
+                         f"{load['queued']} queued); retry in {retry_after}s")
+        self.stage = stage
+        self.retry_after = retry_after
+        self.load = load
+
+
+def limit(stage: str) -> Optional[int]:
+    """Running-job limit of `stage`, None when unlimited."""
+    return STAGE_LIMITS.get(stage) or None
+
+
+def observe_wait(stage: str, seconds: float):
+    metrics.observe_queue_wait(stage, seconds)
+
+
+class Admission:
+    def __init__(self):
+        self._load: Dict[str, dict] = {}
+        self._loaded_at = 0.0
+        self.counters = {"admitted": 0, "rejected": 0}
+
+    async def load(self, max_age: float = ADMISSION_LOAD_TTL) -> Dict[str, dict]:
+        """Per-stage running / queued / service time (cached for `max_age` seconds)."""
+        if time.monotonic() - self._loaded_at >= max_age:
+            rows = await db.stage_load(STAGE_TIMEOUT)
+            self._load = {r["stage"]: r for r in rows}
+            self._loaded_at = time.monotonic()
+        return self._load
+
+    def retry_after(self, stage: str, load: dict) -> int:
+        """Seconds until the backlog is expected to be back under ADMISSION_MAX_QUEUED."""
+        service = load.get("avg_service_seconds") or ADMISSION_DEFAULT_SERVICE_SECONDS
+        excess = load["queued"] - ADMISSION_MAX_QUEUED + 1
+        seconds = service * max(1, excess) / (limit(stage) or 1)
+        return max(1, min(ADMISSION_RETRY_AFTER_MAX, math.ceil(seconds)))
+
+    async def admit(self, stage: str, jobs: int = 1):
+        """
+        Checks that `jobs` new triggers for `stage` may be queued (reject
+        mode only); raises StageSaturated otherwise.
+        """
+        if ADMISSION_MODE != "reject" or limit(stage) is None or jobs <= 0:
+            return
+        try:
+            load = (await self.load()).get(stage)
+        except Exception as e:  # fail open: the dispatcher still enforces the limit
+            print(f"WARNING: stage load unavailable, admitting {stage}: {e}")
+            return
+        if load is None:
+            return
+        if load["running"] >= limit(stage) and load["queued"] >= ADMISSION_MAX_QUEUED:
+            self.counters["rejected"] += 1
+            metrics.count_admission_rejected(stage)
+            raise StageSaturated(stage, self.retry_after(stage, load), load)
+        # Requests within the same cache window see each other
+        load["queued"] += jobs
+        self.counters["admitted"] += 1
+
+    def stats(self) -> dict:
+        """Limits and the last stage load this worker read (nested per stage)."""
+        load = self._load
+        return {
+            "mode": ADMISSION_MODE,
+            "max_queued": ADMISSION_MAX_QUEUED,
+            "stage_timeout": STAGE_TIMEOUT,
+            "limit": {s: limit(s) or 0 for s in STAGES},
+            "running": {s: load[s]["running"] for s in load},
+            "queued": {s: load[s]["queued"] for s in load},
+            "oldest_queued_seconds": {s: load[s]["oldest_queued_seconds"] or 0.0 for s in load},
+            "avg_service_seconds": {s: load[s]["avg_service_seconds"] or 0.0 for s in load},
+            **self.counters,
+        }
+
+
+admission = Admission()
@@ -0,0 +1,221 @@
+"""
+In-process response cache for the Admin API read endpoints.
+
+Entries hold the already-encoded JSON body plus its validators (an ETag
+over the body, and Last-Modified from updated_at for single jobs), and the
+br/gzip variants of the body once a client has asked for them. They expire after a short TTL,
+are evicted LRU once RESPONSE_CACHE_MAX_ENTRIES is reached, and are
+invalidated by tag whenever content_queue changes (db change listener).
+
+Concurrent misses for the same key share one load, and a load that
+overlaps an invalidation is returned but not stored.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from fastapi import Request, Response
+
+from admin_api import encoding
+
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "5"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+
+# Tag shared by every entry derived from content_queue (lists, analytics)
+QUEUE_TAG = "queue"
+
+_FRACTION = re.compile(r"\.(\d+)")
+_CODING_SUFFIX = re.compile(r'-(?:br|gzip)"$')
+
+
+def job_tag(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    """Parses PostgREST timestamps (variable fractional digits, 'Z' suffix)."""
+    try:
+        value = value.replace("Z", "+00:00")
+        value = _FRACTION.sub(lambda m: "." + m.group(1)[:6].ljust(6, "0"), value, count=1)
+        return datetime.fromisoformat(value)
+    except (AttributeError, ValueError):
+        return None
+
+
+def last_modified(value: Any) -> Optional[datetime]:
+    """
+    updated_at of a single row. Lists only get an ETag: rows can leave a
+    filtered list without the newest updated_at in it changing.
+    """
+    if isinstance(value, dict) and isinstance(value.get("updated_at"), str):
+        return _parse_timestamp(value["updated_at"])
+    return None
+
+
+class Entry:
+    __slots__ = ("body", "etag", "last_modified", "headers", "expires", "tags", "variants")
+
+    def __init__(self, body: bytes, headers: Dict[str, str], last_mod: Optional[datetime],
+                 ttl: float, tags: Iterable[str]):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.last_modified = last_mod
+        self.headers = headers
+        self.expires = time.monotonic() + ttl
+        self.tags = frozenset(tags)
+        self.variants: Dict[str, bytes] = {}
+
+    def variant(self, coding: str) -> bytes:
+        """The body compressed with `coding`, computed once per entry."""
+        body = self.variants.get(coding)
+        if body is None:
+            body = self.variants[coding] = encoding.compress(self.body, coding, cached=True)
+        return body
+
+    def variant_etag(self, coding: str) -> str:
+        return f'{self.etag[:-1]}-{coding}"'
+
+
+def encode(value: Any) -> bytes:
+    return encoding.dumps(value)
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: float = RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._generation = 0
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0,
+                         "invalidations": 0, "coalesced": 0, "not_modified": 0,
+                         "compressed": 0}
+
+    def get(self, key: str) -> Optional[Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            del self._entries[key]
+            self.counters["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[tuple]],
+                          tags: Iterable[str], ttl: Optional[float] = None) -> Entry:
+        """
+        Cached entry for `key`, or the result of `loader()`, which returns
+        (value, extra_headers).
+        """
+        entry = self.get(key)
+        if entry is not None:
+            self.counters["hits"] += 1
+            return entry
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        self.counters["misses"] += 1
+        # The load runs as its own task: cancelling the request that started
+        # it (a client disconnect) must not fail the requests waiting on it.
+        task = asyncio.ensure_future(self._load(key, loader, tags, ttl))
+        self._loading[key] = task
+        task.add_done_callback(lambda t: self._loaded(key, t))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[tuple]],
+                    tags: Iterable[str], ttl: Optional[float]) -> Entry:
+        generation = self._generation
+        value, headers = await loader()
+        entry = Entry(encode(value), headers or {}, last_modified(value),
+                      self.ttl if ttl is None else ttl, tags)
+        if generation == self._generation:
+            self.put(key, entry)
+        return entry
+
+    def _loaded(self, key: str, task: asyncio.Future):
+        if self._loading.get(key) is task:
+            del self._loading[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when nobody else is waiting
+
+    def invalidate(self, tags: Iterable[str]):
+        tags = set(tags)
+        self._generation += 1
+        stale = [k for k, e in self._entries.items() if e.tags & tags]
+        for key in stale:
+            del self._entries[key]
+        self.counters["invalidations"] += len(stale)
+
+    def on_change(self, op: str, rows: List[dict]):
+        """db change listener: drop lists/analytics and the touched jobs."""
+        self.invalidate([QUEUE_TAG] + [job_tag(r["id"]) for r in rows if r.get("id")])
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"] + self.counters["coalesced"]
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hit_ratio": round((self.counters["hits"] + self.counters["coalesced"]) / lookups, 4) if lookups else 0.0,
+            **self.counters,
+        }
+
+    # -- HTTP ----------------------------------------------------------------
+
+    def _not_modified(self, request: Request, entry: Entry) -> bool:
+        inm = request.headers.get("if-none-match")
+        if inm is not None:
+            # Any representation (identity / br / gzip) of the same body
+            tags = [_CODING_SUFFIX.sub('"', t.strip().removeprefix("W/")) for t in inm.split(",")]
+            return "*" in tags or entry.etag in tags
+        ims = request.headers.get("if-modified-since")
+        if ims and entry.last_modified is not None:
+            try:
+                return entry.last_modified.replace(microsecond=0) <= parsedate_to_datetime(ims)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def respond(self, request: Request, entry: Entry) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache", **entry.headers}
+        if entry.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(entry.last_modified.astimezone(timezone.utc), usegmt=True)
+        body = entry.body
+        if len(body) >= encoding.COMPRESS_MIN_SIZE:
+            headers["Vary"] = "Accept-Encoding"
+            coding = encoding.negotiate(request.headers.get("accept-encoding"))
+            if coding is not None:
+                headers["ETag"] = entry.variant_etag(coding)
+                headers["Content-Encoding"] = coding
+        if self._not_modified(request, entry):
+            self.counters["not_modified"] += 1
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        if "Content-Encoding" in headers:
+            self.counters["compressed"] += 1
+            body = entry.variant(headers["Content-Encoding"])
+        return Response(body, media_type="application/json", headers=headers)
+
+
+cache = ResponseCache()
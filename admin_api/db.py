@@ -0,0 +1,469 @@
+"""
+Data-access layer for the Admin API.
+
+All Supabase queries go through the typed functions in this module so
+concurrent requests can actually overlap instead of serializing on the
+event loop:
+
+* "async" mode uses supabase-py's async client (async PostgREST),
+  bounded by a semaphore of DB_POOL_SIZE.
+* "thread" mode runs the sync client on a ThreadPoolExecutor with
+  DB_POOL_SIZE workers. Used when the async client is unavailable or
+  DB_MODE=thread is set.
+
+stats() exposes pool size and in-flight/waiting gauges for sizing.
+"""
+import asyncio
+import base64
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dashboard import metrics
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "16"))
+DB_MODE = os.environ.get("DB_MODE", "auto")  # auto | async | thread
+
+QUEUE_TABLE = "content_queue"
+
+# Slim shape for list views (cards / table rows). The large JSONB columns
+# (script_structure, blog_content, validations, ...) are only returned by get_job.
+SUMMARY_COLUMNS = (
+    "id", "topic", "platform", "status", "language", "source_url",
+    "compliance_score", "video_url", "target_platforms", "created_at", "updated_at",
+)
+# Keyset pagination order; every page is (created_at DESC, id DESC)
+CURSOR_COLUMNS = ("created_at", "id")
+
+_COLUMN_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+_CURSOR_TIMESTAMP = re.compile(r"^[0-9][0-9T:. +-]*$")
+_CURSOR_ID = re.compile(r"^[0-9A-Za-z-]+$")
+
+Job = Dict[str, Any]
+Cursor = Tuple[str, str]
+
+
+class DatabaseNotConfigured(RuntimeError):
+    pass
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+_mode: Optional[str] = None
+_client = None
+_executor: Optional[ThreadPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_listeners: List[Callable[[str, List[Job]], None]] = []
+_lock = threading.Lock()
+_gauges = {
+    "in_flight": 0,
+    "waiting": 0,
+    "peak_in_flight": 0,
+    "queries_total": 0,
+    "errors_total": 0,
+}
+
+
+def configured() -> bool:
+    return bool(SUPABASE_URL and SUPABASE_KEY)
+
+
+def client_library():
+    """
+    supabase-py, imported on first use: it is not needed to import the app.
+    The gunicorn master calls this before forking so preloaded workers share it.
+    """
+    import supabase
+
+    return supabase
+
+
+async def startup():
+    """
+    Creates the client (and thread pool). Called from the app lifespan, so
+    every worker process has its own.
+    """
+    global _mode, _client, _executor, _slots
+    if _client is not None or not configured():
+        return
+    supabase = client_library()
+    acreate_client = getattr(supabase, "acreate_client", None)  # missing in older supabase-py
+    if DB_MODE in ("auto", "async") and acreate_client is not None:
+        _client = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+        _slots = asyncio.Semaphore(DB_POOL_SIZE)
+        _mode = "async"
+    else:
+        _client = supabase.create_client(SUPABASE_URL, SUPABASE_KEY)
+        _executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="supabase")
+        _mode = "thread"
+
+
+async def shutdown():
+    global _mode, _client, _executor, _slots
+    if _mode == "async":
+        await _client.postgrest.aclose()
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _mode = _client = _executor = _slots = None
+
+
+async def warm_up() -> bool:
+    """
+    Runs one trivial query so the worker's first request does not pay for
+    connecting (DNS, TCP/TLS, HTTP/2 setup) to PostgREST.
+    """
+    if not configured():
+        return False
+    try:
+        await _execute(lambda c: c.table(QUEUE_TABLE).select("id").limit(1))
+        return True
+    except Exception as e:
+        print(f"WARNING: database warm-up failed: {e}")
+        return False
+
+
+def stats() -> dict:
+    """Pool size and current gauges."""
+    with _lock:
+        return {"mode": _mode, "pool_size": DB_POOL_SIZE, **_gauges}
+
+
+def add_change_listener(listener: Callable[[str, List[Job]], None]):
+    """
+    Registers `listener(op, rows)`, called after every write made through
+    this module ("insert" / "update") with the rows PostgREST returned, and
+    for changes made outside the API once they are detected ("external").
+    """
+    _listeners.append(listener)
+
+
+def notify_changes(op: str, rows: List[Job]):
+    if not rows:
+        return
+    for listener in _listeners:
+        try:
+            listener(op, rows)
+        except Exception as e:
+            print(f"WARNING: change listener failed: {e}")
+
+
+def _track(gauge: str, delta: int):
+    with _lock:
+        _gauges[gauge] += delta
+        if gauge == "in_flight":
+            _gauges["peak_in_flight"] = max(_gauges["peak_in_flight"], _gauges["in_flight"])
+
+
+async def _execute(build: Callable[[Any], Any]):
+    """
+    Runs the query returned by `build(client)` and returns its APIResponse.
+    """
+    if _client is None:
+        if not configured():
+            raise DatabaseNotConfigured("Supabase credentials not configured")
+        await startup()
+
+    _track("queries_total", 1)
+    _track("waiting", 1)
+
+    if _mode == "async":
+        try:
+            await _slots.acquire()
+        finally:
+            # also when cancelled while waiting, or the gauge drifts upward
+            _track("waiting", -1)
+        _track("in_flight", 1)
+        try:
+            query = build(_client)
+            with metrics.time_query(query):
+                return await query.execute()
+        except Exception:
+            _track("errors_total", 1)
+            raise
+        finally:
+            _track("in_flight", -1)
+            _slots.release()
+
+    # A cancelled call may leave `run` queued forever (or start it anyway), so
+    # whichever of `run` and the caller gets here first leaves the queue.
+    queued = [True]
+
+    def leave_queue():
+        with _lock:
+            if queued[0]:
+                queued[0] = False
+                _gauges["waiting"] -= 1
+
+    def run():
+        leave_queue()
+        _track("in_flight", 1)
+        try:
+            return metrics.execute(build(_client))
+        except Exception:
+            _track("errors_total", 1)
+            raise
+        finally:
+            _track("in_flight", -1)
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, run)
+    finally:
+        leave_queue()
+
+
+# ---------------------------------------------------------------------------
+# content_queue queries
+# ---------------------------------------------------------------------------
+
+def select_columns(fields: Optional[str]) -> str:
+    """
+    Translates a `fields=` query value into a PostgREST select list.
+    "summary" (default) -> SUMMARY_COLUMNS, "full" or "*" -> every column,
+    otherwise a comma-separated list of column names. The cursor columns
+    are always included so the next page can be requested.
+    """
+    if not fields or fields == "summary":
+        columns = list(SUMMARY_COLUMNS)
+    elif fields in ("full", "*"):
+        return "*"
+    else:
+        columns = [c.strip() for c in fields.split(",") if c.strip()]
+        invalid = [c for c in columns if not _COLUMN_NAME.match(c)]
+        if invalid:
+            raise InvalidQuery(f"Invalid field name(s): {', '.join(invalid)}")
+    for c in CURSOR_COLUMNS:
+        if c not in columns:
+            columns.append(c)
+    return ",".join(columns)
+
+
+def in_list(values: List[Any]) -> str:
+    """
+    PostgREST `in.(...)` operand with every value quoted, so topics that
+    contain commas, parentheses or quotes stay one value.
+    """
+    quoted = ('"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values)
+    return "(" + ",".join(quoted) + ")"
+
+
+def encode_cursor(row: Job) -> str:
+    raw = f"{row['created_at']}|{row['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, job_id = raw.split("|", 1)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidQuery("Invalid cursor")
+    if not _CURSOR_TIMESTAMP.match(created_at) or not _CURSOR_ID.match(job_id):
+        raise InvalidQuery("Invalid cursor")
+    return created_at, job_id
+
+
+async def list_queue(status: Optional[str] = None, limit: int = 50, columns: str = "*",
+                     after: Optional[Cursor] = None) -> List[Job]:
+    """
+    Latest jobs (newest first), optionally filtered by status.
+    `after` is the (created_at, id) of the last row of the previous page.
+    """
+    def build(client):
+        query = client.table(QUEUE_TABLE).select(columns)
+        if status:
+            query = query.eq("status", status)
+        if after:
+            created_at, job_id = after
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt."{job_id}")'
+            )
+        return query.order("created_at", desc=True).order("id", desc=True).limit(limit)
+
+    return (await _execute(build)).data or []
+
+
+async def queue_stats(days: int = 7) -> Dict[str, Any]:
+    """
+    Aggregated status/platform counts and the daily series for the last
+    `days` days, computed in the database (content_queue_stats RPC).
+    """
+    return (await _execute(lambda c: c.rpc("content_queue_stats", {"days": days}))).data or {}
+
+
+async def get_job(job_id: str) -> Optional[Job]:
+    res = await _execute(lambda c: c.table(QUEUE_TABLE).select("*").eq("id", job_id))
+    return res.data[0] if res.data else None
+
+
+async def list_changed_since(updated_at: Optional[str], columns: str = "*", limit: int = 500) -> List[Job]:
+    """
+    Rows with updated_at >= `updated_at`, oldest change first.
+    With updated_at=None returns only the most recently changed row.
+    """
+    def build(client):
+        query = client.table(QUEUE_TABLE).select(columns)
+        if updated_at is None:
+            return query.order("updated_at", desc=True).limit(1)
+        return query.gte("updated_at", updated_at).order("updated_at").limit(limit)
+
+    return (await _execute(build)).data or []
+
+
+async def create_jobs(rows: List[Job], columns: str = "*") -> Tuple[List[Job], List[Job]]:
+    """
+    Inserts `rows` in one statement, skipping topics that already exist
+    (ON CONFLICT (topic) DO NOTHING via the unique_topic constraint).
+    Returns (created, existing); `existing` is fetched in a second query
+    for the topics that were skipped. Topics must be unique within `rows`.
+    """
+    if not rows:
+        return [], []
+    res = await _execute(lambda c: c.table(QUEUE_TABLE).upsert(
+        rows, on_conflict="topic", ignore_duplicates=True))
+    created = res.data or []
+    notify_changes("insert", created)
+
+    skipped = sorted({r["topic"] for r in rows} - {r["topic"] for r in created})
+    existing: List[Job] = []
+    if skipped:
+        res = await _execute(lambda c: c.table(QUEUE_TABLE).select(columns)
+                             .filter("topic", "in", in_list(skipped)))
+        existing = res.data or []
+    return created, existing
+
+
+async def bulk_transition(job_ids: List[str], to_status: Optional[str] = None,
+                          platforms: Optional[List[str]] = None,
+                          from_statuses: Optional[List[str]] = None,
+                          actor: str = "admin_api", note: Optional[str] = None,
+                          mark_reviewed: bool = False,
+                          workflow_target: Optional[str] = None,
+                          render_priority: Optional[int] = None) -> List[Job]:
+    """
+    Changes status / target_platforms (and render_priority) of many jobs in
+    one statement and writes their audit_logs rows (content_queue_bulk_transition RPC).
+    Only rows whose current status is in `from_statuses` are changed;
+    with `workflow_target` each of them also gets an outbox entry.
+    Returns one row per existing id with old_status and `updated`.
+    """
+    params = {"job_ids": job_ids, "to_status": to_status, "platforms": platforms,
+              "from_statuses": from_statuses, "actor": actor, "audit_note": note,
+              "mark_reviewed": mark_reviewed, "workflow_target": workflow_target,
+              "priority": render_priority}
+    rows = (await _execute(lambda c: c.rpc("content_queue_bulk_transition", params))).data or []
+    changed = [{k: v for k, v in r.items() if k not in ("old_status", "updated")}
+               for r in rows if r.get("updated")]
+    notify_changes("update", changed)
+    return rows
+
+
+async def update_job(job_id: str, changes: Job) -> List[Job]:
+    """Applies `changes` to one job and returns the updated row(s)."""
+    res = await _execute(lambda c: c.table(QUEUE_TABLE).update(changes).eq("id", job_id))
+    notify_changes("update", res.data)
+    return res.data or []
+
+
+# ---------------------------------------------------------------------------
+# tax_laws (migrations 003, 015)
+# ---------------------------------------------------------------------------
+
+async def match_tax_laws(embedding: str, threshold: float, count: int, filter: Optional[dict] = None,
+                         ef_search: Optional[int] = None) -> List[Job]:
+    """
+    The `count` tax_laws rows nearest to `embedding` (pgvector literal) with
+    similarity above `threshold`, best first. `filter` (metadata must
+    contain it) and `ef_search` need migration 015.
+    """
+    params = {"query_embedding": embedding, "match_threshold": threshold, "match_count": count}
+    if filter:
+        params["filter"] = filter
+    if ef_search is not None:
+        params["ef_search"] = ef_search
+    return (await _execute(lambda c: c.rpc("match_tax_laws", params))).data or []
+
+
+# ---------------------------------------------------------------------------
+# workflow_outbox (migration 011)
+# ---------------------------------------------------------------------------
+
+async def claim_outbox(target: str, limit: int, lease_seconds: int, max_running: Optional[int] = None,
+                       stage_timeout: int = 900) -> List[Job]:
+    """
+    Leases up to `limit` due outbox rows for `target` (FOR UPDATE SKIP LOCKED),
+    and no more than the stage has free slots when `max_running` is set
+    (migration 012). Rows carry queued_seconds (enqueue to claim).
+    """
+    params = {"claim_target": target, "max_rows": limit, "lease_seconds": lease_seconds,
+              "max_running": max_running, "stage_timeout_seconds": stage_timeout}
+    return (await _execute(lambda c: c.rpc("workflow_outbox_claim_admitted", params))).data or []
+
+
+async def stage_load(stage_timeout: int = 900) -> List[Job]:
+    """Per-stage running / queued counts, oldest queued age and recent service time."""
+    params = {"stage_timeout_seconds": stage_timeout}
+    return (await _execute(lambda c: c.rpc("workflow_stage_load", params))).data or []
+
+
+async def complete_outbox(outbox_ids: List[int], error: Optional[str], max_attempts: int,
+                          backoff_base: float, backoff_max: float) -> List[Job]:
+    """
+    Marks claimed rows delivered (error=None) or schedules their retry.
+    Returns the content_queue rows whose retry_count / error_log / status changed.
+    """
+    params = {"outbox_ids": outbox_ids, "error": error, "max_attempts": max_attempts,
+              "backoff_base_seconds": backoff_base, "backoff_max_seconds": backoff_max}
+    rows = (await _execute(lambda c: c.rpc("workflow_outbox_complete", params))).data or []
+    notify_changes("update", rows)
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Render leases (migration 013)
+# ---------------------------------------------------------------------------
+
+async def claim_renders(worker: str, limit: int, lease_seconds: int, max_retries: int = 3) -> List[Job]:
+    """
+    Leases up to `limit` PENDING_RENDER jobs for `worker` (FOR UPDATE SKIP
+    LOCKED), highest render_priority first, then longest waiting. Jobs
+    whose previous lease expired come back with retry_count + 1; those out
+    of retries are moved to ERROR instead.
+    """
+    params = {"worker": worker, "max_jobs": limit, "lease_seconds": lease_seconds, "max_retries": max_retries}
+    rows = (await _execute(lambda c: c.rpc("render_claim", params))).data or []
+    return sorted(rows, key=lambda r: (-r["render_priority"], -r["queued_seconds"]))
+
+
+async def renew_renders(worker: str, job_ids: List[str], lease_seconds: int) -> List[str]:
+    """Extends `worker`'s leases; returns the ids it still holds."""
+    params = {"worker": worker, "job_ids": job_ids, "lease_seconds": lease_seconds}
+    rows = (await _execute(lambda c: c.rpc("render_renew", params))).data or []
+    return [r["id"] for r in rows]
+
+
+async def complete_render(worker: str, job_id: str, video_url: Optional[str], error: Optional[str],
+                          max_retries: int = 3, backoff_base: float = 30) -> List[Job]:
+    """
+    Records a render outcome: READY_TO_PUBLISH with `video_url`, or a failed
+    attempt (retried after a backoff, ERROR after `max_retries`). Empty if
+    the lease was lost in the meantime.
+    """
+    params = {"worker": worker, "job_id": job_id, "output_url": video_url, "error": error,
+              "max_retries": max_retries, "backoff_base_seconds": backoff_base}
+    rows = (await _execute(lambda c: c.rpc("render_complete", params))).data or []
+    notify_changes("update", rows)
+    return rows
+
+
+async def release_renders(worker: str, job_ids: List[str]) -> List[str]:
+    """Gives leases back without counting an attempt (shutdown)."""
+    params = {"worker": worker, "job_ids": job_ids}
+    rows = (await _execute(lambda c: c.rpc("render_release", params))).data or []
+    return [r["id"] for r in rows]
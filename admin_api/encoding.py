@@ -0,0 +1,214 @@
+"""
+JSON encoding and HTTP compression for Admin API responses.
+
+* dumps() uses orjson when installed (several times faster than the
+  stdlib on the large JSONB columns), falling back to json.dumps with
+  the same output shape.
+* FastJSONResponse is the app's default response class.
+* stream_json_list() encodes a list row by row, so large pages are sent
+  (and compressed) incrementally instead of being built as one string.
+* Compression is negotiated from Accept-Encoding (br, then gzip) for
+  bodies of at least COMPRESS_MIN_SIZE bytes. The response cache keeps
+  compressed variants of its entries (cache.Entry.variant()); other
+  responses go through CompressionMiddleware. SSE, media and ranged
+  responses are never compressed.
+"""
+import gzip
+import json
+import os
+import zlib
+from typing import Any, AsyncIterator, Iterable, List, Optional, Tuple
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "6"))
+# Per-request compression favours speed; cached entries are compressed once
+# and served many times, so they get a higher brotli quality.
+COMPRESS_BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", "4"))
+COMPRESS_CACHED_BROTLI_QUALITY = int(os.environ.get("COMPRESS_CACHED_BROTLI_QUALITY", "7"))
+# Rows encoded per chunk by stream_json_list
+STREAM_CHUNK_ROWS = int(os.environ.get("STREAM_CHUNK_ROWS", "20"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html", "text/csv")
+
+# Responses compressed by CompressionMiddleware (cached variants are counted by the cache)
+counters = {"responses": 0, "compressed": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON; non-JSON values (datetimes, UUIDs, ...) via str()."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def _json_list_chunks(rows: List[Any]) -> AsyncIterator[bytes]:
+    yield b"["
+    for i in range(0, len(rows), STREAM_CHUNK_ROWS):
+        chunk = b",".join(dumps(r) for r in rows[i:i + STREAM_CHUNK_ROWS])
+        yield (b"," + chunk) if i else chunk
+    yield b"]"
+
+
+def stream_json_list(rows: List[Any], headers: Optional[dict] = None) -> StreamingResponse:
+    """A JSON array response encoded STREAM_CHUNK_ROWS rows at a time."""
+    return StreamingResponse(_json_list_chunks(rows), media_type="application/json", headers=headers)
+
+
+# ---------------------------------------------------------------------------
+# Compression
+# ---------------------------------------------------------------------------
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred supported coding ("br" or "gzip") of an Accept-Encoding value."""
+    if not accept_encoding:
+        return None
+    q = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        q[coding.strip().lower()] = weight
+    offered = (["br"] if brotli is not None else []) + ["gzip"]
+    ranked = [(q.get(c, q.get("*", 0.0)), -i, c) for i, c in enumerate(offered)]
+    weight, _, coding = max(ranked)
+    return coding if weight > 0 else None
+
+
+def compress(body: bytes, coding: str, cached: bool = False) -> bytes:
+    if coding == "br":
+        quality = COMPRESS_CACHED_BROTLI_QUALITY if cached else COMPRESS_BROTLI_QUALITY
+        return brotli.compress(body, quality=quality)
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """Incremental compressor; every chunk is flushed so clients can decode as it arrives."""
+
+    def __init__(self, coding: str):
+        self.coding = coding
+        if coding == "br":
+            self._c = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        else:
+            self._c = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.coding == "br":
+            return self._c.process(data) + self._c.flush()
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._c.finish() if self.coding == "br" else self._c.flush()
+
+
+def compressible(headers: Iterable[Tuple[bytes, bytes]], status: int) -> bool:
+    if status < 200 or status in (204, 206, 304):
+        return False
+    content_type = b""
+    for key, value in headers:
+        if key in (b"content-encoding", b"content-range"):
+            return False
+        if key == b"content-type":
+            content_type = value
+    return content_type.decode("latin-1").split(";")[0].strip() in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI compression for responses that are not compressed already.
+    Single-message bodies below COMPRESS_MIN_SIZE are sent as they are;
+    streamed bodies are compressed chunk by chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept = None
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        coding = negotiate(accept)
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor: Optional[StreamCompressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                counters["responses"] += 1
+                if compressible(message.get("headers", []), message["status"]):
+                    start = message  # held until the first body chunk
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if start is not None:
+                held, start = start, None
+                if not more and len(body) < COMPRESS_MIN_SIZE:
+                    passthrough = True
+                    await send(held)
+                    await send(message)
+                    return
+                headers = [(k, v) for k, v in held.get("headers", []) if k != b"content-length"]
+                headers += [(b"content-encoding", coding.encode()), (b"vary", b"Accept-Encoding")]
+                counters["compressed"] += 1
+                if not more:
+                    out = compress(body, coding)
+                    counters["bytes_in"] += len(body)
+                    counters["bytes_out"] += len(out)
+                    await send({**held, "headers": headers + [(b"content-length", str(len(out)).encode())]})
+                    await send({"type": "http.response.body", "body": out})
+                    return
+                compressor = StreamCompressor(coding)
+                await send({**held, "headers": headers})
+
+            out = compressor.chunk(body) if body else b""
+            if not more:
+                out += compressor.finish()
+            counters["bytes_in"] += len(body)
+            counters["bytes_out"] += len(out)
+            await send({"type": "http.response.body", "body": out, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def stats() -> dict:
+    ratio = counters["bytes_out"] / counters["bytes_in"] if counters["bytes_in"] else 0.0
+    return {"min_size": COMPRESS_MIN_SIZE, "brotli": brotli is not None, "orjson": orjson is not None,
+            "ratio": round(ratio, 4), **counters}
@@ -0,0 +1,241 @@
+"""
+Push feed of content_queue changes for the admin UI.
+
+Instead of every open tab polling /active-queue, the API keeps one change
+feed per process and fans it out to subscribers:
+
+* Writes made through admin_api.db are published immediately
+  (db.add_change_listener).
+* Writes made elsewhere (n8n workflows, the Streamlit dashboard) are
+  picked up by a single shared poller on content_queue.updated_at and
+  announced through db.notify_changes("external", rows).
+
+Every change gets a version. Clients resume with the last cursor they saw
+("<epoch>:<version>", sent as the SSE id). If the cursor is too old or
+belongs to another process (with several workers, reconnects can land on
+any of them), the client is told to resync, which means refetching
+/active-queue.
+
+When a worker drains, close() ends its open streams so they do not hold up
+shutdown; EventSource clients reconnect to another worker.
+"""
+import asyncio
+import json
+import os
+import uuid
+from collections import OrderedDict, deque
+from typing import List, Optional
+
+from admin_api import db
+
+FEED_LOG_SIZE = int(os.environ.get("QUEUE_FEED_LOG_SIZE", "1000"))
+FEED_POLL_INTERVAL = float(os.environ.get("QUEUE_FEED_POLL_INTERVAL", "2"))
+FEED_POLL_LIMIT = int(os.environ.get("QUEUE_FEED_POLL_LIMIT", "500"))
+FEED_SUBSCRIBER_BUFFER = int(os.environ.get("QUEUE_FEED_SUBSCRIBER_BUFFER", "256"))
+FEED_HEARTBEAT = float(os.environ.get("QUEUE_FEED_HEARTBEAT", "15"))
+
+_SEEN_LIMIT = 10_000
+_KEEPALIVE = b": keep-alive\n\n"
+# Sent when the stream is closed for a drain: reconnect after one second
+_RECONNECT = b"retry: 1000\n\n"
+
+
+def _new_epoch() -> str:
+    return uuid.uuid4().hex[:8]
+
+
+def _frame(event: str, cursor: str, data: dict) -> bytes:
+    return f"id: {cursor}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=FEED_SUBSCRIBER_BUFFER)
+
+    def offer(self, frame: bytes, resync_frame: bytes):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog and tell it to refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(resync_frame)
+
+    def close(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class QueueFeed:
+    def __init__(self):
+        # Identifies this process' version sequence; cursors from another process resync
+        self.epoch = _new_epoch()
+        self.version = 0
+        self.closed = False
+        self.log = deque(maxlen=FEED_LOG_SIZE)  # (version, change)
+        self.subscribers = set()
+        self.published_total = 0
+        self.resyncs_total = 0
+        self._seen = OrderedDict()  # job id -> updated_at last published
+        self._watermark: Optional[str] = None
+        self._poller: Optional[asyncio.Task] = None
+
+    # -- cursors -------------------------------------------------------------
+
+    def cursor(self, version: Optional[int] = None) -> str:
+        return f"{self.epoch}:{self.version if version is None else version}"
+
+    def parse_cursor(self, cursor: Optional[str]) -> Optional[int]:
+        """Version encoded in `cursor`, or None if it is not from this process."""
+        if not cursor:
+            return None
+        epoch, _, version = cursor.partition(":")
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        return int(version)
+
+    def changes_since(self, version: Optional[int]) -> Optional[List[tuple]]:
+        """(version, change) pairs after `version`, or None if a resync is needed."""
+        if version is None or version > self.version:
+            return None
+        oldest = self.log[0][0] if self.log else self.version + 1
+        if version < oldest - 1:
+            return None
+        return [(v, change) for v, change in self.log if v > version]
+
+    # -- publishing ----------------------------------------------------------
+
+    def publish(self, rows: List[db.Job]):
+        """Appends changed rows (summary shape) to the feed and fans them out."""
+        for row in rows:
+            job_id, updated_at = row.get("id"), row.get("updated_at")
+            if job_id is None or self._seen.get(job_id) == updated_at:
+                continue  # already published (our own write seen again by the poller)
+            self._seen[job_id] = updated_at
+            self._seen.move_to_end(job_id)
+            if len(self._seen) > _SEEN_LIMIT:
+                self._seen.popitem(last=False)
+
+            self.version += 1
+            change = {"op": "upsert", "row": {c: row[c] for c in db.SUMMARY_COLUMNS if c in row}}
+            self.log.append((self.version, change))
+            self.published_total += 1
+
+            frame = _frame("change", self.cursor(), change)
+            resync = _frame("resync", self.cursor(), {})
+            for sub in list(self.subscribers):
+                sub.offer(frame, resync)
+
+    def resync_all(self):
+        """Forces every subscriber to refetch (e.g. the poller fell behind)."""
+        self.resyncs_total += 1
+        # Past the cleared log: every outstanding cursor (even the current one) now resyncs
+        self.version += 1
+        self.log.clear()
+        frame = _frame("resync", self.cursor(), {})
+        for sub in list(self.subscribers):
+            sub.offer(frame, frame)
+
+    # -- consumers -----------------------------------------------------------
+
+    def changes(self, cursor: Optional[str]) -> dict:
+        """Polling fallback: diffs since `cursor` (or a resync marker)."""
+        replay = self.changes_since(self.parse_cursor(cursor))
+        if replay is None:
+            return {"cursor": self.cursor(), "resync": True, "changes": []}
+        return {"cursor": self.cursor(), "resync": False, "changes": [c for _, c in replay]}
+
+    async def stream(self, cursor: Optional[str]):
+        """SSE byte stream: replay since `cursor`, then live changes."""
+        # Subscribe and compute the replay without yielding in between, so no
+        # change can fall into the gap.
+        sub = Subscriber()
+        self.subscribers.add(sub)
+        replay = self.changes_since(self.parse_cursor(cursor))
+        try:
+            if replay is None:
+                yield _frame("resync", self.cursor(), {})
+            else:
+                for version, change in replay:
+                    yield _frame("change", self.cursor(version), change)
+            while not self.closed:
+                try:
+                    frame = await asyncio.wait_for(sub.queue.get(), FEED_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    frame = _KEEPALIVE
+                if frame is None:
+                    break
+                yield frame
+            if self.closed:
+                yield _RECONNECT
+        finally:
+            self.subscribers.discard(sub)
+
+    def stats(self) -> dict:
+        return {
+            "epoch": self.epoch,
+            "version": self.version,
+            "subscribers": len(self.subscribers),
+            "log_size": len(self.log),
+            "published_total": self.published_total,
+            "resyncs_total": self.resyncs_total,
+        }
+
+    # -- external writes -----------------------------------------------------
+
+    async def poll_once(self):
+        columns = ",".join(db.SUMMARY_COLUMNS)
+        if self._watermark is None:
+            # Start from the newest change; history is served by /active-queue
+            rows = await db.list_changed_since(None, columns=columns)
+            self._watermark = rows[0]["updated_at"] if rows else "1970-01-01T00:00:00+00:00"
+            for row in rows:
+                self._seen[row["id"]] = row["updated_at"]
+            return
+
+        rows = await db.list_changed_since(self._watermark, columns=columns, limit=FEED_POLL_LIMIT)
+        fresh = [r for r in rows if self._seen.get(r["id"]) != r["updated_at"]]
+        if fresh:
+            # Goes through the db listeners, so other observers (cache) see it too
+            db.notify_changes("external", fresh)
+        if not rows:
+            return
+        newest = rows[-1]["updated_at"]
+        if len(rows) >= FEED_POLL_LIMIT and newest == self._watermark:
+            # A single burst larger than one page shares this timestamp; we
+            # cannot page past it, so let clients refetch instead.
+            self.resync_all()
+            self._watermark = None
+            return
+        self._watermark = newest
+
+    async def _poll_loop(self):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                print(f"WARNING: queue feed poll failed: {e}")
+            await asyncio.sleep(FEED_POLL_INTERVAL)
+
+    def close(self):
+        """Ends every open stream (the worker is draining)."""
+        self.closed = True
+        for sub in list(self.subscribers):
+            sub.close()
+
+    async def start(self):
+        # A fresh sequence per process: workers forked from a preloaded app
+        # must not accept each other's cursors.
+        self.epoch = _new_epoch()
+        db.add_change_listener(lambda op, rows: self.publish(rows))
+        if FEED_POLL_INTERVAL > 0 and db.configured():
+            self._poller = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+
+feed = QueueFeed()
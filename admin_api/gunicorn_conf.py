@@ -0,0 +1,95 @@
+"""
+gunicorn configuration for serving the Admin API in production:
+
+    gunicorn -c admin_api/gunicorn_conf.py admin_api.main:app
+
+* WEB_CONCURRENCY uvicorn workers, by default one per CPU the container may
+  use (serving.cpu_limit()).
+* The app is preloaded in the master and forked (GUNICORN_PRELOAD=0 to
+  import it in every worker instead). Nothing connects at import time;
+  the lifespan creates each worker's clients and warms them up.
+* SIGTERM drains: the worker stops accepting connections, closes its SSE
+  streams, gives in-flight requests DRAIN_TIMEOUT seconds, then runs the
+  lifespan shutdown (outbox deliveries, job cancellation, client close).
+* With several workers, Prometheus metrics are aggregated through
+  PROMETHEUS_MULTIPROC_DIR and seeding jobs are shared through
+  JOB_STATE_DIR; both default to a directory per master process.
+"""
+import gc
+import os
+import shutil
+import sys
+import tempfile
+
+from gunicorn.arbiter import Arbiter
+from uvicorn.server import Server
+from uvicorn.workers import UvicornWorker
+
+from admin_api import serving
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = serving.worker_count()
+worker_class = "admin_api.gunicorn_conf.Worker"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+# Drain, then lifespan shutdown (the outbox waits up to 10s for deliveries)
+graceful_timeout = int(serving.DRAIN_TIMEOUT) + 15
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+keepalive = int(os.environ.get("KEEPALIVE", "5"))
+errorlog = "-"
+accesslog = os.environ.get("ACCESS_LOG")
+
+# Set before the app (and prometheus_client) is imported; kept on config reloads
+STATE_DIR = os.environ.setdefault(
+    "ADMIN_API_STATE_DIR", os.path.join(tempfile.gettempdir(), f"admin_api-{os.getpid()}"))
+if workers > 1:
+    for key, name in (("PROMETHEUS_MULTIPROC_DIR", "metrics"), ("JOB_STATE_DIR", "jobs")):
+        os.makedirs(os.environ.setdefault(key, os.path.join(STATE_DIR, name)), exist_ok=True)
+
+
+class DrainingServer(Server):
+    async def shutdown(self, sockets=None):
+        serving.begin_drain()
+        await super().shutdown(sockets)
+
+
+class Worker(UvicornWorker):
+    """UvicornWorker that drains (see DrainingServer) with a bounded grace period."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config.timeout_graceful_shutdown = serving.DRAIN_TIMEOUT
+
+    async def _serve(self):
+        self.config.app = self.wsgi
+        server = DrainingServer(config=self.config)
+        self._install_sigquit_handler()
+        await server.serve(sockets=self.sockets)
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
+
+
+def on_starting(server):
+    if preload_app:
+        # Imported lazily by the lifespan; load it once here instead of in every worker
+        from admin_api import db
+
+        db.client_library()
+
+
+def pre_fork(server, worker):
+    # Objects created by the preloaded import are never collected; keeping
+    # them out of the GC stops collections in the workers from writing to
+    # (and so un-sharing) their pages.
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if STATE_DIR.startswith(os.path.join(tempfile.gettempdir(), "admin_api-")):
+        shutil.rmtree(STATE_DIR, ignore_errors=True)
@@ -0,0 +1,304 @@
+"""
+Background jobs for long-running admin actions (knowledge-base seeding).
+
+Jobs run in-process on a small thread pool instead of blocking the request
+or spawning a fresh interpreter. Each job has an id, a progress snapshot
+(rows embedded/inserted, throughput) and a cancel flag the work function
+checks between steps.
+
+Jobs are single-flight per kind: submitting while one of the same kind is
+queued or running returns the existing job instead of starting another.
+Finished jobs are kept (JOB_HISTORY) so the UI can read the final result.
+
+With several worker processes a job runs in the worker that accepted it.
+When JOB_STATE_DIR is set (the gunicorn config does), every job is also
+written there as a JSON snapshot, so any worker can report, list and
+cancel it (through a "<id>.cancel" marker the owner picks up with its next
+progress update) and single-flight holds across workers.
+"""
+import asyncio
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple, Union
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", "50"))
+JOB_STATE_DIR = os.environ.get("JOB_STATE_DIR")
+# Snapshots of a running job are rewritten at most this often (seconds)
+JOB_SNAPSHOT_INTERVAL = float(os.environ.get("JOB_SNAPSHOT_INTERVAL", "1"))
+
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+SUCCEEDED = "SUCCEEDED"
+FAILED = "FAILED"
+CANCELLED = "CANCELLED"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Job:
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.worker = os.getpid()
+        self.status = QUEUED
+        self.created_at = _now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.total = 0
+        self.embedded = 0
+        self.inserted = 0
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.cancel_event = threading.Event()
+        self._t0: Optional[float] = None
+        self._t1: Optional[float] = None
+        self._lock = threading.Lock()
+        self.on_progress: Optional[Callable[["Job"], None]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def progress(self, embedded: int, inserted: int, total: int):
+        """Progress callback for the work function (called from the worker thread)."""
+        with self._lock:
+            self.embedded, self.inserted, self.total = embedded, inserted, total
+        if self.on_progress is not None:
+            self.on_progress(self)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            elapsed = 0.0
+            if self._t0 is not None:
+                elapsed = (self._t1 or time.monotonic()) - self._t0
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "worker": self.worker,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "cancel_requested": self.cancel_event.is_set(),
+                "progress": {
+                    "total": self.total,
+                    "embedded": self.embedded,
+                    "inserted": self.inserted,
+                    "percent": round(100 * self.inserted / self.total, 1) if self.total else 0.0,
+                },
+                "elapsed_seconds": round(elapsed, 3),
+                "rows_per_second": round(self.inserted / elapsed, 2) if elapsed > 0 else 0.0,
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class Snapshot:
+    """A job owned by another worker process, as it last wrote it to JOB_STATE_DIR."""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.id = data["id"]
+        self.kind = data["kind"]
+
+    @property
+    def finished(self) -> bool:
+        return self.data["status"] in FINISHED
+
+    def to_dict(self) -> dict:
+        return self.data
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobRunner:
+    def __init__(self, workers: int = JOB_WORKERS, history: int = JOB_HISTORY,
+                 state_dir: Optional[str] = JOB_STATE_DIR):
+        self.workers = workers
+        self.history = history
+        self.state_dir = state_dir
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}  # kind -> queued/running job
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._saved_at: Dict[str, float] = {}
+
+    def startup(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="admin-job")
+
+    def shutdown(self):
+        """Asks in-flight jobs to stop (they stop between steps) and drops queued ones."""
+        for job in self._active.values():
+            job.cancel_event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # -- snapshots shared between worker processes ----------------------------
+
+    def _path(self, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.state_dir, job_id + suffix)
+
+    def _save(self, job: Job):
+        if not self.state_dir:
+            return
+        path = self._path(job.id)
+        try:
+            with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+                json.dump(job.to_dict(), f)
+            os.replace(f"{path}.{os.getpid()}.tmp", path)
+        except OSError as e:
+            print(f"WARNING: could not write job snapshot {path}: {e}")
+        self._saved_at[job.id] = time.monotonic()
+
+    def _load(self, job_id: str) -> Optional[Snapshot]:
+        if not self.state_dir or not job_id.isalnum():
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data["status"] not in FINISHED and not _alive(data["worker"]):
+            data.update(status=FAILED, error=f"worker {data['worker']} exited")
+        return Snapshot(data)
+
+    def _snapshots(self) -> list:
+        if not self.state_dir:
+            return []
+        ids = (os.path.basename(p)[:-len(".json")] for p in glob.glob(self._path("*")))
+        return [s for s in map(self._load, ids) if s is not None and s.id not in self._jobs]
+
+    def _on_progress(self, job: Job):
+        # Runs on the job's thread; picks up cancellation requested through another worker
+        if time.monotonic() - self._saved_at.get(job.id, 0.0) < JOB_SNAPSHOT_INTERVAL:
+            return
+        if os.path.exists(self._path(job.id, ".cancel")):
+            job.cancel_event.set()
+        self._save(job)
+
+    def _prune(self):
+        finished = sorted((s for s in self._snapshots() if s.finished),
+                          key=lambda s: s.data["created_at"], reverse=True)
+        for snapshot in finished[self.history:]:
+            for suffix in (".json", ".cancel"):
+                try:
+                    os.remove(self._path(snapshot.id, suffix))
+                except OSError:
+                    pass
+
+    # -- jobs ------------------------------------------------------------------
+
+    def submit(self, kind: str, work: Callable[[Job], Optional[dict]]) -> Tuple[Union[Job, Snapshot], bool]:
+        """
+        Starts `work(job)` in the pool, or returns the job of this kind that
+        is already in flight (in any worker). Returns (job, created).
+        """
+        active = self._active.get(kind)
+        if active is not None and not active.finished:
+            return active, False
+        if not self.state_dir:
+            return self._start(kind, work), True
+        with open(os.path.join(self.state_dir, f"{kind}.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            for snapshot in self._snapshots():
+                if snapshot.kind == kind and not snapshot.finished:
+                    return snapshot, False
+            return self._start(kind, work), True
+
+    def _start(self, kind: str, work: Callable[[Job], Optional[dict]]) -> Job:
+        if self._executor is None:
+            self.startup()
+
+        job = Job(kind)
+        self._active[kind] = job
+        self._jobs[job.id] = job
+        if self.state_dir:
+            job.on_progress = self._on_progress
+            self._save(job)
+        while len(self._jobs) > self.history:
+            oldest = next(iter(self._jobs.values()))
+            if not oldest.finished:
+                break
+            self._jobs.popitem(last=False)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._run, job, work)
+        future.add_done_callback(lambda _: self._release(job))
+        return job
+
+    def _run(self, job: Job, work: Callable[[Job], Optional[dict]]):
+        if job.cancel_event.is_set():
+            job.status, job.finished_at = CANCELLED, _now()
+            self._save(job)
+            return
+        job.status, job.started_at, job._t0 = RUNNING, _now(), time.monotonic()
+        self._save(job)
+        status, result, error = FAILED, None, None
+        try:
+            result = work(job)
+            status = SUCCEEDED
+        except JobCancelled as e:
+            status, error = CANCELLED, str(e) or None
+        except Exception as e:
+            print(f"WARNING: {job.kind} job {job.id} failed: {e}")
+            error = str(e)
+        finally:
+            with job._lock:
+                job._t1 = time.monotonic()
+                job.result, job.error, job.finished_at = result, error, _now()
+                job.status = status
+            if self.state_dir:
+                self._save(job)
+                self._prune()
+
+    def _release(self, job: Job):
+        if self._active.get(job.kind) is job:
+            del self._active[job.kind]
+        self._saved_at.pop(job.id, None)
+
+    def get(self, job_id: str) -> Optional[Union[Job, Snapshot]]:
+        return self._jobs.get(job_id) or self._load(job_id)
+
+    def list(self, kind: Optional[str] = None) -> list:
+        jobs = [j.to_dict() for j in self._jobs.values()] + [s.to_dict() for s in self._snapshots()]
+        jobs = [j for j in jobs if kind is None or j["kind"] == kind]
+        return sorted(jobs, key=lambda j: j["created_at"], reverse=True)[:self.history]
+
+    def cancel(self, job_id: str) -> Optional[Union[Job, Snapshot]]:
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        if isinstance(job, Job):
+            job.cancel_event.set()
+            return job
+        # Owned by another worker: it stops at its next progress update
+        open(self._path(job_id, ".cancel"), "w").close()
+        job.data["cancel_requested"] = True
+        return job
+
+
+runner = JobRunner()
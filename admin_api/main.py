@@ -1,17 +1,54 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
+import time
+_import_started = time.perf_counter()  # reported as the worker's import time
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from typing import Optional
 import sys
 import os
-import subprocess
-from supabase import create_client, Client
-import requests
+import datetime
+import uuid
 
 # Add parent directory to path to import dashboard script if needed
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-app = FastAPI()
+from admin_api import (admission, db, encoding, events, jobs, media, n8n, outbox, profiler, rag,
+                       render_scheduler, serving)
+from admin_api.cache import QUEUE_TAG, cache, job_tag
+from dashboard import metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared, pooled HTTP client for all n8n webhook calls
+    await n8n.startup()
+    # Supabase data-access layer (async client or bounded thread pool)
+    await db.startup()
+    # Response cache is invalidated by every content_queue change
+    db.add_change_listener(cache.on_change)
+    # content_queue change feed (SSE / diff polling)
+    await events.feed.start()
+    # Worker threads for long-running admin jobs (knowledge-base seeding)
+    jobs.runner.startup()
+    # Delivers queued workflow triggers (generate / render / publish) to n8n
+    await outbox.dispatcher.start()
+    # Connect before taking traffic, so the first request does not pay for it
+    await db.warm_up()
+    serving.mark_ready()
+    yield
+    await outbox.dispatcher.stop()
+    jobs.runner.shutdown()
+    await events.feed.stop()
+    await n8n.shutdown()
+    await rag.shutdown()
+    await db.shutdown()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=encoding.FastJSONResponse)
 
 # Enable CORS for the React Frontend
 app.add_middleware(
@@ -20,19 +57,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Profile-Id"],
 )
+# br/gzip for responses that are not pre-compressed by the response cache
+app.add_middleware(encoding.CompressionMiddleware)
+# Latency histogram per route (see /metrics)
+app.add_middleware(metrics.RequestMetricsMiddleware)
+# Opt-in per-request sampling profiler (X-Profile header / PROFILE_SAMPLE_RATE)
+app.add_middleware(profiler.ProfilerMiddleware)
 
-# Serve Generated Videos
-if not os.path.exists("/files"):
-   os.makedirs("/files", exist_ok=True)
-app.mount("/files", StaticFiles(directory="/files"), name="files")
+# Component gauges and counters, also exposed through /metrics
+metrics.register_stats("db", db.stats)
+metrics.register_stats("queue_feed", events.feed.stats)
+metrics.register_stats("cache", cache.stats)
+metrics.register_stats("outbox", outbox.dispatcher.stats)
+metrics.register_stats("media", media.server.stats)
+metrics.register_stats("compression", encoding.stats)
+metrics.register_stats("worker", serving.stats)
+metrics.register_stats("admission", admission.admission.stats)
+metrics.register_stats("rag", rag.stats)
 
-# Supabase Client
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
+# Open SSE streams would hold a draining worker until the drain timeout
+serving.on_drain(events.feed.close)
 
 
+@app.exception_handler(admission.StageSaturated)
+async def stage_saturated(request: Request, exc: admission.StageSaturated):
+    return JSONResponse(
+        {"detail": str(exc), "stage": exc.stage, "retry_after": exc.retry_after},
+        status_code=429, headers={"Retry-After": str(exc.retry_after)})
+
+# Analytics tolerate more staleness than lists (writes still invalidate them)
+ANALYTICS_CACHE_TTL = float(os.environ.get("ANALYTICS_CACHE_TTL", "30"))
+# Full-payload pages of at least this many rows bypass the response cache and
+# are encoded / compressed row by row while they are sent
+LIST_STREAM_MIN_ROWS = int(os.environ.get("LIST_STREAM_MIN_ROWS", "100"))
+# Queue depth gauges are refreshed by /metrics at most this often
+METRICS_QUEUE_DEPTH_TTL = float(os.environ.get("METRICS_QUEUE_DEPTH_TTL", "15"))
+# Upper bound on items per bulk request (one statement / one webhook each)
+BULK_MAX_ITEMS = int(os.environ.get("BULK_MAX_ITEMS", "500"))
+# Approvals trigger the n8n Rendering Workflow unless admin_api.render_scheduler renders
+RENDER_WEBHOOK = render_scheduler.RENDER_BACKEND != "scheduler"
+# Statuses a job may be in for the bulk transitions
+APPROVABLE_STATUSES = ["PENDING_REVIEW", "APPROVED"]
+PUBLISHABLE_STATUSES = ["READY_TO_PUBLISH", "PUBLISHED"]
+
 # Request Models
 class TriggerRequest(BaseModel):
     workflow_id: str = "taxfix-production"
@@ -43,6 +112,9 @@ class GenerateScriptRequest(BaseModel):
     platform: str = "TikTok"
     language: str = "de"
 
+class GenerateScriptBatchRequest(BaseModel):
+    items: list[GenerateScriptRequest]
+
 class ApproveScriptRequest(BaseModel):
     id: str # UUID
     script_structure: dict
@@ -50,79 +122,250 @@ class ApproveScriptRequest(BaseModel):
     blog_content: dict
     blog_content_en: dict = {}
     social_metrics: dict
+    render_priority: int = 0  # higher renders first (RENDER_BACKEND=scheduler)
 
 class PublishVideoRequest(BaseModel):
     id: str # UUID
     platforms: list[str] = ["TikTok", "Instagram"]
 
+class BulkApproveRequest(BaseModel):
+    ids: list[str]
+    reviewed_by: str = "admin_api"
+    note: Optional[str] = None
+    render_priority: int = 0
+
+class BulkPublishRequest(BaseModel):
+    ids: list[str]
+    platforms: list[str] = ["TikTok", "Instagram"]
+    changed_by: str = "admin_api"
+
 class ContentProcessorRequest(BaseModel):
     action: str
     payload: dict
 
+class RagSearchRequest(BaseModel):
+    query: str
+    match_count: Optional[int] = None  # default RAG_MATCH_COUNT
+    match_threshold: Optional[float] = None  # default RAG_MATCH_THRESHOLD
+    filter: dict = {}  # metadata must contain this, e.g. {"year": 2024}
+    ef_search: Optional[int] = None
+
 
 @app.get("/health")
 def health_check():
     return {"status": "ok", "service": "Taxfix Admin API"}
 
-@app.post("/seed-knowledge")
+_queue_depth_checked = 0.0
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus exposition: request latency per route, Supabase / n8n /
+    embedding timings, content_queue depth per status and the gauges of
+    /db/stats, /queue/feed/stats, /cache/stats, /outbox/stats, /media/stats,
+    /admission/stats and /rag/stats.
+    """
+    global _queue_depth_checked
+    if db.configured() and time.monotonic() - _queue_depth_checked > METRICS_QUEUE_DEPTH_TTL:
+        _queue_depth_checked = time.monotonic()
+        try:
+            metrics.set_queue_depth((await db.queue_stats(days=1)).get("status_counts", {}))
+            await admission.admission.load()
+        except Exception as e:
+            print(f"WARNING: queue depth refresh failed: {e}")
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
+@app.get("/profiles")
+def list_profiles():
+    """
+    The PROFILE_KEEP slowest profiled requests, slowest first.
+    """
+    return {**profiler.profiler.stats(), "profiles": profiler.profiler.list()}
+
+@app.get("/profiles/{profile_id}")
+def download_profile(profile_id: int):
+    """
+    Collapsed stacks of one profile ("frame;frame count" lines) for
+    flamegraph.pl / speedscope.
+    """
+    profile = profiler.profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(profile.collapsed(), media_type="text/plain", headers={
+        "Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'})
+
+@app.delete("/profiles")
+def clear_profiles():
+    profiler.profiler.clear()
+    return {"status": "cleared"}
+
+@app.get("/worker/stats")
+def worker_stats():
+    """
+    The worker process that served this request: pid, import and ready
+    time, resident memory (rss / pss / uss) and whether it is draining.
+    """
+    return serving.stats()
+
+@app.get("/db/stats")
+def db_stats():
+    """
+    Data-access pool size and in-flight gauges.
+    """
+    return db.stats()
+
+SEED_JOB = "seed-knowledge"
+
+def run_seed(job: jobs.Job) -> dict:
+    # Imported on first use: keeps openai out of API startup, and later runs
+    # reuse the already-imported module and its clients.
+    from dashboard import seed_knowledge
+    try:
+        return seed_knowledge.seed_db(on_progress=job.progress, cancel_event=job.cancel_event)
+    except seed_knowledge.SeedCancelled as e:
+        raise jobs.JobCancelled(str(e))
+    finally:
+        # Upserts may have changed rows in place, which a sync does not see
+        if rag.index_backend is not None:
+            rag.index_backend.request_reload()
+
+@app.post("/seed-knowledge", status_code=202)
 async def trigger_seed():
     """
-    Triggers the python script to seed tax laws.
+    Starts seeding the tax-law knowledge base as a background job.
+    Returns the running job instead if one is already in progress.
+    """
+    job, created = jobs.runner.submit(SEED_JOB, run_seed)
+    return {"status": "started" if created else "already_running", "job": job.to_dict()}
+
+@app.get("/seed-knowledge/jobs")
+def list_seed_jobs():
+    """
+    Recent seeding jobs, newest first.
+    """
+    return jobs.runner.list(SEED_JOB)
+
+@app.get("/seed-knowledge/jobs/{job_id}")
+def get_seed_job(job_id: str):
+    """
+    Progress of one seeding job (rows embedded/inserted, throughput).
+    """
+    job = jobs.runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Seed job not found")
+    return job.to_dict()
+
+@app.post("/seed-knowledge/jobs/{job_id}/cancel")
+def cancel_seed_job(job_id: str):
+    """
+    Requests cancellation; the job stops before the next law.
+    """
+    job = jobs.runner.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Seed job not found")
+    return job.to_dict()
+
+async def list_page(request: Request, limit: int, cursor: Optional[str], fields: Optional[str],
+                    status: Optional[str] = None) -> Response:
+    """
+    One keyset page of content_queue (newest first), served through the response cache
+    (large full-payload pages are streamed instead). The cursor for the following page
+    is returned in the X-Next-Cursor header.
     """
     try:
-        # We run the script as a subprocess to ensure clean environment execution
-        # Assumes the script is at ../dashboard/seed_knowledge.py
-        script_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "dashboard", "seed_knowledge.py")
-        
-        if not os.path.exists(script_path):
-            raise HTTPException(status_code=404, detail=f"Script not found at {script_path}")
-
-        result = subprocess.run(
-            ["python3", script_path], 
-            capture_output=True, 
-            text=True,
-            env={**os.environ} # Pass current env vars (API keys)
-        )
-        
-        if result.returncode != 0:
-            return {"status": "error", "output": result.stderr}
-            
-        return {"status": "success", "output": result.stdout}
-        
+        columns = db.select_columns(fields)
+        after = db.decode_cursor(cursor) if cursor else None
+    except db.InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def load():
+        rows = await db.list_queue(status=status, limit=limit, columns=columns, after=after)
+        headers = {"X-Next-Cursor": db.encode_cursor(rows[-1])} if len(rows) == limit else {}
+        return rows, headers
+
+    if columns == "*" and limit >= LIST_STREAM_MIN_ROWS:
+        try:
+            rows, headers = await load()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        return encoding.stream_json_list(rows, headers={**headers, "Cache-Control": "private, no-cache"})
+
+    key = f"list:{status}:{limit}:{columns}:{cursor}"
+    try:
+        entry = await cache.get_or_load(key, load, tags=[QUEUE_TAG])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return cache.respond(request, entry)
 
 @app.get("/active-queue")
-async def get_active_queue():
+async def get_active_queue(
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     """
-    Fetches the latest 50 items from the content_queue.
+    Fetches the latest items from the content_queue (50 per page).
+    Returns the slim summary shape unless `fields=full` or a column list is given;
+    use /jobs/{id} for the full payload of a single job.
     """
-    if not supabase:
+    if not db.configured():
         raise HTTPException(status_code=500, detail="Supabase credentials not configured")
-        
-    try:
-        response = supabase.table("content_queue") \
-            .select("*") \
-            .order("created_at", desc=True) \
-            .limit(50) \
-            .execute()
-        return response.data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+    return await list_page(request, limit, cursor, fields)
+
+@app.get("/queue/stream")
+async def queue_stream(request: Request, since: Optional[str] = None):
+    """
+    Server-Sent Events stream of content_queue changes (summary rows).
+    Events: `change` ({"op": "upsert", "row": {...}}) and `resync` (refetch /active-queue).
+    Resumes from `since` or the Last-Event-ID header sent by EventSource on reconnect.
+    """
+    cursor = since or request.headers.get("last-event-id")
+    return StreamingResponse(
+        events.feed.stream(cursor),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/queue/changes")
+def queue_changes(since: Optional[str] = None):
+    """
+    Polling fallback for clients without SSE: changes since the `since` cursor.
+    """
+    return events.feed.changes(since)
+
+@app.get("/outbox/stats")
+def outbox_stats():
+    """
+    Workflow trigger dispatcher counters and per-target in-flight batches.
+    """
+    return outbox.dispatcher.stats()
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """
+    Per-stage limits, running and queued jobs, oldest wait and recent
+    service time (a fresh read unless one is under ADMISSION_LOAD_TTL old).
+    """
+    if db.configured():
+        await admission.admission.load()
+    return admission.admission.stats()
+
+@app.get("/queue/feed/stats")
+def queue_feed_stats():
+    return events.feed.stats()
 
 @app.post("/trigger-n8n")
 async def trigger_n8n(request: TriggerRequest):
     """
     Triggers the n8n Workflow via Webhook.
     """
-    # URL of the n8n container in the docker network
-    # We call the 'production' webhook (without /test/)
-    N8N_WEBHOOK_URL = "http://taxfix-n8n-factory:5678/webhook/trigger"
-    
     try:
         # Fire and forget (or wait for ack)
         # We send an empty JSON payload just to trigger it
-        response = requests.post(N8N_WEBHOOK_URL, json={"trigger": "admin-ui"})
+        response = await n8n.post_webhook(n8n.WEBHOOK_TRIGGER, {"trigger": "admin-ui"})
         print(f"DEBUG N8N INGESTION RESPONSE: Code={response.status_code}, Body={response.text}")
         
         if response.status_code >= 400:
@@ -133,41 +376,39 @@ async def trigger_n8n(request: TriggerRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to call n8n: {str(e)}")
 
+def new_job_row(req: GenerateScriptRequest) -> dict:
+    return {
+        "topic": req.topic,
+        "source_url": req.source_url,
+        "platform": req.platform,
+        "language": req.language,
+        "status": "PENDING_GENERATION",
+        # Enqueued with the insert (only if the row is actually created)
+        "workflow_trigger": outbox.request("generate", {"topic": req.topic, "language": req.language})
+    }
+
 @app.post("/generate-script")
 async def generate_script(req: GenerateScriptRequest):
     """
-    1. Inserts a new job into content_queue.
-    2. Triggers the Generation Workflow (Webhook).
+    1. Inserts a new job into content_queue (or returns the existing job for the topic).
+    2. Queues the Generation Workflow trigger (delivered by the outbox dispatcher).
     """
-    if not supabase:
+    if not db.configured():
         raise HTTPException(status_code=500, detail="DB Config Missing")
-    
+    await admission.admission.admit("generate")
+
     try:
-        # 1. Check if topic already exists to prevent duplicates (Idempotency)
-        existing = supabase.table("content_queue").select("*").eq("topic", req.topic).execute()
-        if existing.data and len(existing.data) > 0:
+        # Idempotent on topic: ON CONFLICT DO NOTHING, so concurrent requests
+        # for the same topic cannot both insert.
+        created, existing = await db.create_jobs([new_job_row(req)])
+        if existing:
             print(f"Topic '{req.topic}' already exists. Returning existing job.")
-            item = existing.data[0]
             
             # Optional: If it was stuck in ERROR or something, maybe we want to retry? 
             # For now, just return it so UI redirects to it.
-            return {"status": "success", "job": item}
-
-        # 2. Insert into DB
-        data = {
-            "topic": req.topic,
-            "source_url": req.source_url,
-            "platform": req.platform,
-            "language": req.language,
-            "status": "PENDING_GENERATION"
-        }
-        res = supabase.table("content_queue").insert(data).execute()
-        new_job = res.data[0]
-        
-        # Trigger n8n Webhook
-        # We use a dedicated webhook for 'Generate'
-        N8N_WEBHOOK = "http://taxfix-n8n-factory:5678/webhook/generate-script"
-        requests.post(N8N_WEBHOOK, json={"id": new_job['id'], "topic": req.topic, "language": req.language})
+            return {"status": "success", "job": existing[0]}
+        new_job = created[0]
+        outbox.dispatcher.notify()
         
         return {"status": "success", "job": new_job}
     except Exception as e:
@@ -176,26 +417,78 @@ async def generate_script(req: GenerateScriptRequest):
         print(f"ERROR in /generate-script: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate-script/batch")
+async def generate_script_batch(req: GenerateScriptBatchRequest):
+    """
+    Bulk /generate-script: queues many topics at once.
+    1. Inserts all new topics in one statement (existing topics are skipped).
+    2. Queues the Generation Workflow for every new job (delivered in batches).
+    Returns a per-item result: created, existing or duplicate (repeated in the request).
+    """
+    if not db.configured():
+        raise HTTPException(status_code=500, detail="DB Config Missing")
+    if len(req.items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per batch")
+
+    rows, seen = [], set()
+    for item in req.items:
+        if item.topic not in seen:
+            seen.add(item.topic)
+            rows.append(new_job_row(item))
+    await admission.admission.admit("generate", len(rows))
+
+    try:
+        created, existing = await db.create_jobs(rows, columns=",".join(db.SUMMARY_COLUMNS))
+    except Exception as e:
+        print(f"ERROR in /generate-script/batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    jobs_by_topic = {j["topic"]: ("existing", j) for j in existing}
+    jobs_by_topic.update({j["topic"]: ("created", j) for j in created})
+
+    results, reported = [], set()
+    for item in req.items:
+        outcome, job = jobs_by_topic.get(item.topic, ("error", None))
+        if item.topic in reported:
+            outcome = "duplicate"
+        reported.add(item.topic)
+        summary = {c: job[c] for c in db.SUMMARY_COLUMNS if c in job} if job else None
+        results.append({"topic": item.topic, "result": outcome, "job": summary})
+
+    if created:
+        outbox.dispatcher.notify()
+
+    return {
+        "status": "success",
+        "created": len(created),
+        "existing": len(existing),
+        "duplicates": len(req.items) - len(rows),
+        "results": results,
+        "queued": len(created),
+    }
+
 @app.post("/approve-script")
 async def approve_script(req: ApproveScriptRequest):
     """
     1. Updates the script content in DB.
     2. Sets status to 'APPROVED' (or 'RENDERING').
-    3. Triggers the Rendering Workflow.
+    3. Queues the Rendering Workflow trigger (same write), unless the
+       render scheduler picks PENDING_RENDER jobs up itself.
     """
+    if RENDER_WEBHOOK:
+        await admission.admission.admit("render")
     try:
-        supabase.table("content_queue").update({
+        await db.update_job(req.id, {
             "script_structure": req.script_structure,
             "script_structure_en": req.script_structure_en,
             "blog_content": req.blog_content,
             "blog_content_en": req.blog_content_en,
             "social_metrics": req.social_metrics,
-            "status": "PENDING_RENDER" # New status for video gen
-        }).eq("id", req.id).execute()
-        
-        # Trigger n8n Webhook for Video Generation
-        N8N_WEBHOOK = "http://taxfix-n8n-factory:5678/webhook/render-video"
-        requests.post(N8N_WEBHOOK, json={"id": req.id})
+            "status": "PENDING_RENDER", # New status for video gen
+            "render_priority": req.render_priority,
+            "workflow_trigger": outbox.request("render") if RENDER_WEBHOOK else None
+        })
+        outbox.dispatcher.notify()
         
         return {"status": "success", "message": "Script approved, rendering started."}
     except Exception as e:
@@ -205,106 +498,253 @@ async def approve_script(req: ApproveScriptRequest):
 async def publish_video(req: PublishVideoRequest):
     """
     1. Updates target platforms.
-    2. Triggers Publisher Workflow.
+    2. Queues the Publisher Workflow trigger (same write).
     """
+    await admission.admission.admit("publish")
     try:
-        supabase.table("content_queue").update({
-            "target_platforms": req.platforms
-        }).eq("id", req.id).execute()
-        
-        # Trigger n8n Webhook
-        N8N_WEBHOOK = "http://taxfix-n8n-factory:5678/webhook/publish-video"
-        requests.post(N8N_WEBHOOK, json={"id": req.id})
+        await db.update_job(req.id, {
+            "target_platforms": req.platforms,
+            "workflow_trigger": outbox.request("publish")
+        })
+        outbox.dispatcher.notify()
         
         return {"status": "success", "message": "Publishing trigger sent."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def valid_ids(ids: list) -> tuple:
+    """Splits request ids into (valid UUIDs, rejected), preserving order and dropping repeats."""
+    if len(ids) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per batch")
+    valid, invalid = [], []
+    for job_id in dict.fromkeys(ids):
+        try:
+            uuid.UUID(job_id)
+            valid.append(job_id)
+        except ValueError:
+            invalid.append(job_id)
+    return valid, invalid
+
+async def bulk_transition(ids: list, **kwargs) -> tuple:
+    """
+    Runs db.bulk_transition and builds the per-id results.
+    Returns (updated rows, results).
+    """
+    if not db.configured():
+        raise HTTPException(status_code=500, detail="DB Config Missing")
+    valid, invalid = valid_ids(ids)
+    try:
+        rows = await db.bulk_transition(valid, **kwargs) if valid else []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    by_id = {r["id"]: r for r in rows}
+    results = []
+    for job_id in valid:
+        row = by_id.get(job_id)
+        if row is None:
+            results.append({"id": job_id, "result": "not_found"})
+        elif row["updated"]:
+            results.append({"id": job_id, "result": "updated", "old_status": row["old_status"], "status": row["status"]})
+        else:
+            results.append({"id": job_id, "result": "skipped", "status": row["old_status"],
+                            "error": f"Status {row['old_status']} not allowed"})
+    results += [{"id": job_id, "result": "invalid", "error": "Not a UUID"} for job_id in invalid]
+    return [r for r in rows if r["updated"]], results
+
+def bulk_response(results: list, queued: int) -> dict:
+    updated = sum(1 for r in results if r["result"] == "updated")
+    if queued:
+        outbox.dispatcher.notify()
+    return {
+        "status": "success" if updated == len(results) else "partial",
+        "updated": updated,
+        "failed": len(results) - updated,
+        "results": results,
+        "queued": queued,
+    }
+
+@app.post("/approve-script/batch")
+async def approve_script_batch(req: BulkApproveRequest):
+    """
+    Bulk approve: moves jobs in review to PENDING_RENDER in one statement
+    (with their audit rows and Rendering Workflow triggers).
+    Jobs with a script edit should go through /approve-script instead.
+    """
+    if RENDER_WEBHOOK:
+        await admission.admission.admit("render", len(req.ids))
+    updated, results = await bulk_transition(
+        req.ids, to_status="PENDING_RENDER", from_statuses=APPROVABLE_STATUSES,
+        actor=req.reviewed_by, note=req.note, mark_reviewed=True,
+        workflow_target="render" if RENDER_WEBHOOK else None, render_priority=req.render_priority)
+    return bulk_response(results, len(updated))
+
+@app.post("/publish-video/batch")
+async def publish_video_batch(req: BulkPublishRequest):
+    """
+    Bulk publish: sets target platforms on rendered jobs in one statement
+    (with their audit rows and Publisher Workflow triggers).
+    """
+    await admission.admission.admit("publish", len(req.ids))
+    updated, results = await bulk_transition(
+        req.ids, platforms=req.platforms, from_statuses=PUBLISHABLE_STATUSES,
+        actor=req.changed_by, note=f"Publish requested: {', '.join(req.platforms)}",
+        workflow_target="publish")
+    return bulk_response(results, len(updated))
+
 @app.post("/trigger-content-processor")
 async def trigger_content_processor(req: ContentProcessorRequest):
     """
     Proxies the Content Processor requests (Translate, Regenerate, Metadata)
     to the n8n container to avoid CORS issues.
     """
-    # Internal Docker Network URL
-    # Updated to include Workflow ID (11) as per User verification
-    N8N_WEBHOOK = "http://taxfix-n8n-factory:5678/webhook/11/webhook/process-content"
-    
     try:
-        response = requests.post(N8N_WEBHOOK, json=req.dict())
+        response = await n8n.post_webhook(n8n.WEBHOOK_PROCESS_CONTENT, req.dict())
         print(f"DEBUG N8N RESPONSE: Code={response.status_code}, Body={response.text}")
         return {"status": "success", "n8n_response": response.text}
     except Exception as e:
         print(f"Error calling n8n: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def load_analytics():
+    stats = await db.queue_stats(days=7)
+    status_counts = stats.get("status_counts", {})
+
+    # Daily series in the shape the bar chart expects: {name, TikTok, Instagram, ...}
+    daily_output = []
+    for day in stats.get("daily") or []:
+        date = datetime.date.fromisoformat(day["date"])
+        daily_output.append({
+            "name": date.strftime("%a"),
+            "date": day["date"],
+            "total": day["total"],
+            **day["platforms"],
+        })
+
+    analytics = {
+        "status_distribution": [
+            {"name": "Approved", "value": status_counts.get("READY_TO_PUBLISH", 0) + status_counts.get("PUBLISHED", 0)},
+            {"name": "Pending Review", "value": status_counts.get("PENDING_REVIEW", 0) + status_counts.get("PENDING_GENERATION", 0)},
+            {"name": "Drafting/Error", "value": status_counts.get("NEW", 0) + status_counts.get("ERROR", 0)}
+        ],
+        "platform_distribution": [
+            {"name": platform, "value": count}
+            for platform, count in sorted(stats.get("platform_counts", {}).items())
+        ],
+        "daily_output": daily_output,
+        "total_assets": stats.get("total", 0),
+        "compliance_rate": 98.5 # Hardcoded for now as we don't store individual scores easily yet
+    }
+    return analytics, {}
+
 @app.get("/analytics")
-async def get_analytics():
+async def get_analytics(request: Request):
     """
     Returns aggregated stats for the KPI Dashboard.
     1. Status Counts (Pie Chart)
-    2. Daily Output (Bar Chart) - Simulated distribution based on real count
+    2. Daily Output (Bar Chart) - last 7 days per platform
+    All counting happens in the database (content_queue_stats RPC), so the
+    payload and latency do not grow with the size of content_queue.
     """
-    if not supabase:
+    if not db.configured():
          raise HTTPException(status_code=500, detail="DB Missing")
 
     try:
-        # Fetch all items (lightweight select)
-        res = supabase.table("content_queue").select("status, created_at, platform").execute()
-        items = res.data
-        
-        # 1. Status Counts
-        status_counts = {}
-        for item in items:
-            s = item.get('status', 'PENDING')
-            status_counts[s] = status_counts.get(s, 0) + 1
-            
-        # 2. Daily Output (Grouping by date string)
-        # For POC, we'll just group by the last 7 days from the DB entries
-        # If DB is empty/sparse, we might pad it.
-        
-        # Create a simple structure
-        analytics = {
-            "status_distribution": [
-                {"name": "Approved", "value": status_counts.get("READY_TO_PUBLISH", 0) + status_counts.get("PUBLISHED", 0)},
-                {"name": "Pending Review", "value": status_counts.get("PENDING_REVIEW", 0) + status_counts.get("PENDING_GENERATION", 0)},
-                {"name": "Drafting/Error", "value": status_counts.get("NEW", 0) + status_counts.get("ERROR", 0)}
-            ],
-            "total_assets": len(items),
-            "compliance_rate": 98.5 # Hardcoded for now as we don't store individual scores easily yet
-        }
-        return analytics
+        entry = await cache.get_or_load("analytics", load_analytics, tags=[QUEUE_TAG], ttl=ANALYTICS_CACHE_TTL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return cache.respond(request, entry)
 
 @app.get("/news")
-async def get_news():
+async def get_news(
+    request: Request,
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     """
     Returns ingested news items (PENDING_GENERATION) for the News Feed.
+    Paginated like /active-queue.
     """
-    if not supabase:
+    if not db.configured():
          raise HTTPException(status_code=500, detail="DB Missing")
 
-    try:
-        # Fetch items that are new/pending
-        res = supabase.table("content_queue").select("*").eq("status", "PENDING_GENERATION").order("created_at", desc=True).limit(20).execute()
-        return res.data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Fetch items that are new/pending
+    return await list_page(request, limit, cursor, fields, status="PENDING_GENERATION")
 
 @app.get("/jobs/{job_id}")
-async def get_job(job_id: str):
+async def get_job(job_id: str, request: Request):
     """
     Fetches a single job by ID.
     Used for refreshing the Editor state.
     """
-    if not supabase:
+    if not db.configured():
          raise HTTPException(status_code=500, detail="DB Missing")
 
-    try:
-        res = supabase.table("content_queue").select("*").eq("id", job_id).execute()
-        if not res.data or len(res.data) == 0:
+    async def load():
+        job = await db.get_job(job_id)
+        if not job:
             raise HTTPException(status_code=404, detail="Job not found")
-        return res.data[0]
+        return job, {}
+
+    try:
+        entry = await cache.get_or_load(f"job:{job_id}", load, tags=[job_tag(job_id)])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return cache.respond(request, entry)
+
+@app.post("/rag/search")
+async def rag_search(req: RagSearchRequest):
+    """
+    Embeds the query (cached per normalized text, concurrent identical
+    queries share one embeddings call) and returns the matching tax_laws
+    rows with their similarity, best first.
+    """
+    try:
+        return await rag.search(req.query, match_count=req.match_count, match_threshold=req.match_threshold,
+                                filter=req.filter, ef_search=req.ef_search)
+    except rag.InvalidSearch as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        print(f"ERROR in /rag/search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/rag/stats")
+def rag_stats():
+    """
+    Query-embedding cache hit ratio, embeddings calls made (misses) and
+    saved (hits + coalesced), and searches per backend.
+    """
+    return rag.stats()
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Response cache hit/miss counters.
+    """
+    return cache.stats()
+
+# Serve Generated Videos (byte ranges, ETags, cache headers; see admin_api/media.py)
+@app.get("/media/stats")
+def media_stats():
+    """
+    Bytes served, responses per status and concurrent video streams.
+    """
+    return media.server.stats()
+
+@app.api_route("/files/{name:path}", methods=["GET", "HEAD"])
+async def get_file(name: str, request: Request):
+    return await media.server.respond(request, name)
+
+@app.api_route("/media/{digest}/{name:path}", methods=["GET", "HEAD"])
+async def get_media(digest: str, name: str, request: Request):
+    """
+    Content-addressed (immutable) URL of a file, as advertised in the
+    Content-Location of /files responses.
+    """
+    return await media.server.respond(request, name, digest=digest)
+
+
+serving.mark_imported(time.perf_counter() - _import_started)
@@ -0,0 +1,326 @@
+"""
+Media endpoint for rendered videos (replaces the StaticFiles mount at /files).
+
+* Single byte ranges (206 / 416), so the preview player can seek and the
+  publisher can resume without downloading the whole MP4.
+* Strong ETags over the file content (blake2b, computed once per
+  inode/size/mtime in a worker thread), plus If-None-Match /
+  If-Modified-Since (304) and If-Range.
+* /files/<name> is revalidated on every use (names are reused when a job is
+  re-rendered); /media/<digest>/<name> is content-addressed and cached as
+  immutable for a year. /files responses advertise that URL in
+  Content-Location.
+* Zero-copy transfer: behind nginx (MEDIA_ACCEL_REDIRECT set) the body is
+  handed off with X-Accel-Redirect and nginx sends it with sendfile. Servers
+  that implement the ASGI zero-copy extension get the file descriptor;
+  otherwise the file is streamed in MEDIA_CHUNK_SIZE preads off the event
+  loop.
+* Bytes served, responses per status and concurrent streams are counted
+  (stats()).
+"""
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", "/files")
+MEDIA_CHUNK_SIZE = int(os.environ.get("MEDIA_CHUNK_SIZE", str(256 * 1024)))
+# nginx internal location mapped to MEDIA_ROOT, e.g. "/_media/"; empty = serve from Python
+MEDIA_ACCEL_REDIRECT = os.environ.get("MEDIA_ACCEL_REDIRECT", "")
+MEDIA_IMMUTABLE_MAX_AGE = int(os.environ.get("MEDIA_IMMUTABLE_MAX_AGE", str(365 * 24 * 3600)))
+
+CACHE_REVALIDATE = "public, no-cache"
+CACHE_IMMUTABLE = f"public, max-age={MEDIA_IMMUTABLE_MAX_AGE}, immutable"
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) inclusive for a single "bytes=" range, None when the header
+    should be ignored (malformed or multiple ranges -> full 200 response).
+    Raises ValueError when the range is unsatisfiable.
+    """
+    m = _RANGE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if not m.group(1):  # suffix: last N bytes
+        length = int(m.group(2))
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(m.group(1))
+    end = int(m.group(2)) if m.group(2) else size - 1
+    if m.group(2) and end < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+class MediaFile:
+    __slots__ = ("path", "name", "size", "mtime", "digest")
+
+    def __init__(self, path: str, name: str, st: os.stat_result, digest: str):
+        self.path = path
+        self.name = name
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.digest = digest
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime, usegmt=True)
+
+    @property
+    def immutable_url(self) -> str:
+        return f"/media/{self.digest}/{quote(self.name)}"
+
+
+class MediaResponse(Response):
+    """ASGI response for (part of) a media file; picks the cheapest transfer the server offers."""
+
+    def __init__(self, server: "MediaServer", file: MediaFile, status_code: int, headers: Dict[str, str],
+                 start: int = 0, length: int = 0, send_body: bool = True):
+        self.server = server
+        self.file = file
+        self.status_code = status_code
+        self.media_headers = headers
+        self.start = start
+        self.length = length
+        self.send_body = send_body and length > 0
+        self.background = None
+        self.body = b""
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        headers = dict(self.media_headers)
+        accel = bool(MEDIA_ACCEL_REDIRECT) and self.send_body
+        if accel:
+            # nginx serves the internal location with sendfile and applies the
+            # original Range / conditional headers itself
+            # Percent-encoded: nginx decodes the URI, and header values must be latin-1
+            headers["X-Accel-Redirect"] = MEDIA_ACCEL_REDIRECT.rstrip("/") + "/" + quote(self.file.name)
+            headers["Content-Length"] = "0"
+            headers.pop("Content-Range", None)
+        await send({
+            "type": "http.response.start",
+            "status": 200 if accel else self.status_code,
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+        })
+        if not self.send_body or accel:
+            await send({"type": "http.response.body", "body": b""})
+            if accel:
+                self.server.counters["accel_redirects"] += 1
+                self.server.record_bytes(self.length)
+            return
+
+        self.server.stream_started()
+        try:
+            if "http.response.zerocopysend" in (scope.get("extensions") or {}):
+                await self._zerocopy(send)
+            else:
+                await self._stream(receive, send)
+        finally:
+            self.server.stream_finished()
+
+    async def _zerocopy(self, send: Send):
+        with open(self.file.path, "rb") as f:
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": f,
+                "offset": self.start,
+                "count": self.length,
+            })
+        self.server.counters["zerocopy_sends"] += 1
+        self.server.record_bytes(self.length)
+
+    async def _stream(self, receive: Receive, send: Send):
+        loop = asyncio.get_running_loop()
+        disconnected = asyncio.Event()
+
+        async def watch():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.create_task(watch())
+        fd = os.open(self.file.path, os.O_RDONLY)
+        try:
+            offset, remaining = self.start, self.length
+            while remaining > 0 and not disconnected.is_set():
+                chunk = await loop.run_in_executor(None, os.pread, fd, min(MEDIA_CHUNK_SIZE, remaining), offset)
+                if not chunk:  # truncated underneath us
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                self.server.record_bytes(len(chunk))
+            if remaining > 0 and not disconnected.is_set():
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            os.close(fd)
+            watcher.cancel()
+
+
+class MediaServer:
+    def __init__(self, root: str = MEDIA_ROOT):
+        self.root = root
+        # (path, inode, size, mtime_ns) -> digest; concurrent requests share one hash
+        self._digests: Dict[tuple, asyncio.Future] = {}
+        self.active_streams = 0
+        self.peak_streams = 0
+        self.counters = {"bytes_served": 0, "requests": 0, "range_requests": 0, "not_modified": 0,
+                         "streams": 0, "hashed_files": 0, "zerocopy_sends": 0,
+                         "accel_redirects": 0}
+        self.responses: Dict[int, int] = {}
+
+    # -- files ---------------------------------------------------------------
+
+    def resolve(self, name: str) -> str:
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, name))
+        if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail="Not Found")
+        return path
+
+    @staticmethod
+    def _hash(path: str) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                h.update(chunk)
+        return h.hexdigest()
+
+    async def digest(self, path: str, st: os.stat_result) -> str:
+        key = (path, st.st_ino, st.st_size, st.st_mtime_ns)
+        fut = self._digests.get(key)
+        if fut is None:
+            # A new version replaces the old entry for the same path
+            for stale in [k for k in self._digests if k[0] == path]:
+                del self._digests[stale]
+            fut = asyncio.get_running_loop().run_in_executor(None, self._hash, path)
+            self._digests[key] = fut
+            self.counters["hashed_files"] += 1
+        try:
+            return await asyncio.shield(fut)
+        except Exception:
+            self._digests.pop(key, None)
+            raise
+
+    async def open(self, name: str) -> MediaFile:
+        path = self.resolve(name)
+        st = os.stat(path)
+        return MediaFile(path, os.path.relpath(path, os.path.realpath(self.root)), st, await self.digest(path, st))
+
+    # -- HTTP ----------------------------------------------------------------
+
+    @staticmethod
+    def _not_modified(request: Request, file: MediaFile) -> bool:
+        inm = request.headers.get("if-none-match")
+        if inm is not None:
+            tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+            return "*" in tags or file.etag in tags
+        ims = request.headers.get("if-modified-since")
+        if ims:
+            try:
+                return int(file.mtime) <= parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _range_applies(request: Request, file: MediaFile) -> bool:
+        if_range = request.headers.get("if-range")
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"'):
+            return if_range == file.etag  # strong comparison only
+        return if_range == file.last_modified
+
+    async def respond(self, request: Request, name: str, digest: Optional[str] = None):
+        file = await self.open(name)
+        self.counters["requests"] += 1
+        if digest is not None and digest != file.digest:
+            # Content changed since that URL was issued; point at the current version
+            return self._finish(MediaResponse(self, file, 307, {
+                "Location": file.immutable_url, "Cache-Control": "no-cache", "Content-Length": "0"}, send_body=False))
+
+        headers = {
+            "ETag": file.etag,
+            "Last-Modified": file.last_modified,
+            "Cache-Control": CACHE_IMMUTABLE if digest is not None else CACHE_REVALIDATE,
+            "Accept-Ranges": "bytes",
+        }
+        if digest is None:
+            headers["Content-Location"] = file.immutable_url
+        if self._not_modified(request, file):
+            self.counters["not_modified"] += 1
+            return self._finish(MediaResponse(self, file, 304, headers, send_body=False))
+
+        headers["Content-Type"] = mimetypes.guess_type(file.name)[0] or "application/octet-stream"
+        send_body = request.method != "HEAD"
+        header = request.headers.get("range")
+        if header and self._range_applies(request, file):
+            try:
+                byte_range = parse_range(header, file.size)
+            except ValueError:
+                headers["Content-Range"] = f"bytes */{file.size}"
+                headers["Content-Length"] = "0"
+                del headers["Content-Type"]
+                return self._finish(MediaResponse(self, file, 416, headers, send_body=False))
+            if byte_range is not None:
+                start, end = byte_range
+                self.counters["range_requests"] += 1
+                headers["Content-Range"] = f"bytes {start}-{end}/{file.size}"
+                headers["Content-Length"] = str(end - start + 1)
+                return self._finish(MediaResponse(self, file, 206, headers, start, end - start + 1, send_body))
+
+        headers["Content-Length"] = str(file.size)
+        return self._finish(MediaResponse(self, file, 200, headers, 0, file.size, send_body))
+
+    def _finish(self, response: MediaResponse) -> MediaResponse:
+        self.responses[response.status_code] = self.responses.get(response.status_code, 0) + 1
+        return response
+
+    # -- stats ---------------------------------------------------------------
+
+    def stream_started(self):
+        self.active_streams += 1
+        self.peak_streams = max(self.peak_streams, self.active_streams)
+        self.counters["streams"] += 1
+
+    def stream_finished(self):
+        self.active_streams -= 1
+
+    def record_bytes(self, n: int):
+        self.counters["bytes_served"] += n
+
+    def stats(self) -> dict:
+        return {
+            "root": self.root,
+            "active_streams": self.active_streams,
+            "peak_streams": self.peak_streams,
+            "responses": {str(k): v for k, v in sorted(self.responses.items())},
+            "digests_cached": len(self._digests),
+            **self.counters,
+        }
+
+
+server = MediaServer()
@@ -0,0 +1,89 @@
+"""
+Shared async HTTP client for n8n webhook calls.
+
+Every webhook dispatch from the Admin API goes through one pooled
+httpx.AsyncClient (keep-alive connections to the n8n container), with
+per-call timeouts and a semaphore bounding how many calls are in flight.
+A slow n8n therefore only delays the request that triggered it instead of
+stalling the uvicorn event loop for all other traffic.
+"""
+import asyncio
+import os
+from typing import Optional
+
+import httpx
+
+from dashboard import metrics
+
+# URL of the n8n container in the docker network
+N8N_BASE_URL = os.environ.get("N8N_BASE_URL", "http://taxfix-n8n-factory:5678")
+
+# Production webhooks (without /test/)
+WEBHOOK_TRIGGER = "/webhook/trigger"
+WEBHOOK_GENERATE_SCRIPT = "/webhook/generate-script"
+WEBHOOK_RENDER_VIDEO = "/webhook/render-video"
+WEBHOOK_PUBLISH_VIDEO = "/webhook/publish-video"
+# Batch variants: {"jobs": [{id, ...}, ...]}, fanned out inside n8n
+WEBHOOK_GENERATE_SCRIPT_BATCH = "/webhook/generate-script-batch"
+WEBHOOK_RENDER_VIDEO_BATCH = "/webhook/render-video-batch"
+WEBHOOK_PUBLISH_VIDEO_BATCH = "/webhook/publish-video-batch"
+# Content Processor includes the Workflow ID (11) as per User verification
+WEBHOOK_PROCESS_CONTENT = "/webhook/11/webhook/process-content"
+
+# Tuning (seconds / counts)
+N8N_TIMEOUT = float(os.environ.get("N8N_TIMEOUT", "30"))
+N8N_CONNECT_TIMEOUT = float(os.environ.get("N8N_CONNECT_TIMEOUT", "5"))
+N8N_MAX_CONNECTIONS = int(os.environ.get("N8N_MAX_CONNECTIONS", "20"))
+N8N_MAX_KEEPALIVE = int(os.environ.get("N8N_MAX_KEEPALIVE", "10"))
+N8N_MAX_CONCURRENCY = int(os.environ.get("N8N_MAX_CONCURRENCY", "10"))
+
+_client: Optional[httpx.AsyncClient] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+async def startup():
+    """Creates the shared client. Called from the app lifespan."""
+    global _client, _slots
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=N8N_BASE_URL,
+            timeout=httpx.Timeout(N8N_TIMEOUT, connect=N8N_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=N8N_MAX_CONNECTIONS,
+                max_keepalive_connections=N8N_MAX_KEEPALIVE,
+            ),
+        )
+    if _slots is None:
+        _slots = asyncio.Semaphore(N8N_MAX_CONCURRENCY)
+
+
+async def shutdown():
+    """Closes pooled connections. Called from the app lifespan."""
+    global _client, _slots
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _slots = None
+
+
+async def post_webhook(path: str, payload: dict, timeout: Optional[float] = None) -> httpx.Response:
+    """
+    POSTs `payload` to the n8n webhook at `path`.
+
+    Waits for a free concurrency slot, then sends over the shared pool.
+    `timeout` overrides the default read timeout for this call only.
+    Raises httpx.HTTPError on connection errors and timeouts.
+    """
+    if _client is None:
+        await startup()
+
+    kwargs = {}
+    if timeout is not None:
+        kwargs["timeout"] = httpx.Timeout(timeout, connect=N8N_CONNECT_TIMEOUT)
+
+    async with _slots:
+        with metrics.time_webhook(path) as result:
+            res = await _client.post(path, json=payload, **kwargs)
+            if res.status_code >= 400:
+                result["outcome"] = f"http_{res.status_code}"
+            return res
@@ -0,0 +1,169 @@
+"""
+Dispatcher for the workflow trigger outbox (migration 011).
+
+Endpoints no longer call n8n after writing a job. They set
+content_queue.workflow_trigger (see request()) in the same write, the
+database copies it into workflow_outbox, and this dispatcher delivers it:
+
+* Due rows are claimed per target with a lease (workflow_outbox_claim), so
+  several API workers can run dispatchers side by side.
+* Claimed rows are coalesced into batched webhooks of up to
+  OUTBOX_BATCH_SIZE jobs ({"jobs": [...]}, the *-batch webhooks).
+* At most OUTBOX_MAX_IN_FLIGHT batches per target are outstanding, and
+  no more jobs are claimed than the stage has free slots (admission).
+* Failures are retried with exponential backoff up to OUTBOX_MAX_ATTEMPTS.
+  content_queue.retry_count / error_log record every failed attempt, and
+  the job goes to ERROR after the last one (workflow_outbox_complete).
+
+Writers call dispatcher.notify() after committing so delivery starts
+without waiting for the next poll.
+"""
+import asyncio
+import os
+import uuid
+from typing import Dict, List, Optional
+
+from admin_api import admission, db, n8n
+
+OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_COALESCE_WINDOW = float(os.environ.get("OUTBOX_COALESCE_WINDOW", "0.05"))
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_MAX_IN_FLIGHT = int(os.environ.get("OUTBOX_MAX_IN_FLIGHT", "2"))  # batches per target
+# 1 attempt + 3 retries: content_queue.retry_count is constrained to <= 3
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "4"))
+OUTBOX_BACKOFF_BASE = float(os.environ.get("OUTBOX_BACKOFF_BASE", "2"))
+OUTBOX_BACKOFF_MAX = float(os.environ.get("OUTBOX_BACKOFF_MAX", "300"))
+# Must outlive a webhook call; an expired lease is claimed again
+OUTBOX_LEASE_SECONDS = int(os.environ.get("OUTBOX_LEASE_SECONDS", str(int(n8n.N8N_TIMEOUT * 4))))
+
+# Outbox target -> batched n8n webhook
+TARGETS = {
+    "generate": n8n.WEBHOOK_GENERATE_SCRIPT_BATCH,
+    "render": n8n.WEBHOOK_RENDER_VIDEO_BATCH,
+    "publish": n8n.WEBHOOK_PUBLISH_VIDEO_BATCH,
+}
+
+
+def request(target: str, payload: Optional[dict] = None) -> dict:
+    """
+    Value for content_queue.workflow_trigger. The job id is added to the
+    payload by the database; the request_id makes repeated requests for
+    the same job enqueue again.
+    """
+    if target not in TARGETS:
+        raise ValueError(f"Unknown workflow target: {target}")
+    return {"target": target, "payload": payload or {}, "request_id": uuid.uuid4().hex}
+
+
+class Dispatcher:
+    def __init__(self):
+        self.in_flight: Dict[str, int] = {t: 0 for t in TARGETS}
+        self.peak_in_flight: Dict[str, int] = {t: 0 for t in TARGETS}
+        self.counters = {"claimed": 0, "delivered": 0, "failed_attempts": 0, "batches": 0,
+                         "batch_errors": 0, "complete_errors": 0}
+        self.last_error: Optional[str] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._deliveries = set()
+
+    def notify(self):
+        """Wakes the dispatcher (new outbox rows were committed)."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def dispatch_once(self) -> int:
+        """Claims due rows for every target with free capacity and starts delivering them."""
+        claimed = 0
+        for target in TARGETS:
+            free = OUTBOX_MAX_IN_FLIGHT - self.in_flight[target]
+            if free <= 0:
+                continue
+            rows = await db.claim_outbox(target, free * OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS,
+                                         admission.limit(target), admission.STAGE_TIMEOUT)
+            claimed += len(rows)
+            self.counters["claimed"] += len(rows)
+            for row in rows:
+                if row["attempts"] == 1:  # retries waited for their backoff, not for a slot
+                    admission.observe_wait(target, row["queued_seconds"])
+            for i in range(0, len(rows), OUTBOX_BATCH_SIZE):
+                self._start(target, rows[i:i + OUTBOX_BATCH_SIZE])
+        return claimed
+
+    def _start(self, target: str, rows: List[dict]):
+        self.in_flight[target] += 1
+        self.peak_in_flight[target] = max(self.peak_in_flight[target], self.in_flight[target])
+        task = asyncio.create_task(self._deliver(target, rows))
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, target: str, rows: List[dict]):
+        error = None
+        try:
+            res = await n8n.post_webhook(TARGETS[target], {"jobs": [r["payload"] for r in rows]})
+            if res.status_code >= 400:
+                error = f"HTTP {res.status_code}: {res.text[:200]}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        self.counters["batches"] += 1
+        if error is None:
+            self.counters["delivered"] += len(rows)
+        else:
+            self.counters["batch_errors"] += 1
+            self.counters["failed_attempts"] += len(rows)
+            self.last_error = error
+        try:
+            await db.complete_outbox([r["id"] for r in rows], error, OUTBOX_MAX_ATTEMPTS,
+                                     OUTBOX_BACKOFF_BASE, OUTBOX_BACKOFF_MAX)
+        except Exception as e:
+            # Rows stay IN_FLIGHT and are claimed again once the lease expires
+            self.counters["complete_errors"] += 1
+            print(f"WARNING: outbox complete failed for {len(rows)} {target} rows: {e}")
+        finally:
+            self.in_flight[target] -= 1
+            self.notify()  # capacity freed; more rows may be due
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await self.dispatch_once()
+            except Exception as e:
+                claimed = 0
+                print(f"WARNING: outbox dispatch failed: {e}")
+            if claimed:
+                continue  # there may be more due rows
+            try:
+                await asyncio.wait_for(self._wake.wait(), OUTBOX_POLL_INTERVAL)
+                # Let a burst of writes land so it goes out as one batch
+                await asyncio.sleep(OUTBOX_COALESCE_WINDOW)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        if db.configured():
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        # Let running deliveries record their outcome; anything left is
+        # reclaimed after its lease expires.
+        if self._deliveries:
+            await asyncio.wait(list(self._deliveries), timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": dict(self.in_flight),
+            "peak_in_flight": dict(self.peak_in_flight),
+            "max_in_flight_per_target": OUTBOX_MAX_IN_FLIGHT,
+            "batch_size": OUTBOX_BATCH_SIZE,
+            "max_attempts": OUTBOX_MAX_ATTEMPTS,
+            "last_error": self.last_error,
+            **self.counters,
+        }
+
+
+dispatcher = Dispatcher()
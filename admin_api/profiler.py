@@ -0,0 +1,226 @@
+"""
+Opt-in sampling profiler for single Admin API requests.
+
+A request is profiled when it carries `X-Profile: 1` (or the value of
+PROFILE_TOKEN, when set) or is picked by PROFILE_SAMPLE_RATE (0..1). Other
+requests pay one header lookup, so the middleware can stay installed.
+
+While profiled requests are in flight a daemon thread samples them every
+PROFILE_INTERVAL seconds (wall clock). Each sample is the stack of the
+request's asyncio task:
+
+* running on the event loop: the real thread stack from the task's
+  outermost coroutine down (JSON encoding, validation, ...);
+* suspended: the coroutine await chain, ending in "[await <Future type>]"
+  (a Supabase query, an n8n webhook, a thread-pool hop).
+
+Stacks are aggregated in the collapsed "frame;frame;frame count" format
+read by flamegraph.pl, speedscope and inferno. The slowest PROFILE_KEEP
+profiles are kept in memory (/profiles).
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.005"))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "20"))
+PROFILE_MAX_DEPTH = int(os.environ.get("PROFILE_MAX_DEPTH", "128"))
+
+_ids = itertools.count(1)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(parts[-2:])}:{code.co_firstlineno})"
+
+
+def _await_chain(coro) -> List[str]:
+    """Frames of a suspended coroutine chain, outermost first, plus what it waits on."""
+    labels = []
+    obj = coro
+    while obj is not None and len(labels) < PROFILE_MAX_DEPTH:
+        frame = getattr(obj, "cr_frame", None) or getattr(obj, "gi_frame", None)
+        if frame is None:
+            labels.append(f"[await {type(obj).__name__}]")
+            break
+        labels.append(_frame_label(frame))
+        obj = getattr(obj, "cr_await", None) or getattr(obj, "gi_yieldfrom", None)
+    return labels
+
+
+class Profile:
+    def __init__(self, method: str, path: str, task: asyncio.Task, thread_id: int):
+        self.id = next(_ids)
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.task = task
+        self.thread_id = thread_id
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.duration = 0.0
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def sample(self, thread_frame):
+        task = self.task
+        if task is None:
+            return
+        coro = task.get_coro()
+        root = getattr(coro, "cr_frame", None)
+        if root is None:
+            return
+        stack = []
+        frame = thread_frame
+        while frame is not None:
+            stack.append(frame)
+            if frame is root:
+                break
+            frame = frame.f_back
+        if frame is root:
+            labels = [_frame_label(f) for f in reversed(stack[-PROFILE_MAX_DEPTH:])]
+        else:
+            labels = _await_chain(coro)
+        self.stacks[";".join(labels)] += 1
+        self.samples += 1
+
+    def finish(self, status: Optional[int], route: Optional[str]):
+        self.duration = time.perf_counter() - self._t0
+        self.status = status
+        self.route = route
+        self.task = None
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 2),
+            "samples": self.samples,
+            "interval_ms": PROFILE_INTERVAL * 1000,
+            "started_at": self.started_at,
+        }
+
+
+class Profiler:
+    def __init__(self, keep: int = PROFILE_KEEP):
+        self.keep = keep
+        self._active: Dict[int, Profile] = {}
+        self._slowest: List[tuple] = []  # min-heap of (duration, id, Profile)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.counters = {"profiled": 0, "samples": 0}
+
+    def wants(self, headers: List[tuple]) -> bool:
+        for key, value in headers:
+            if key == PROFILE_HEADER:
+                return value.decode("latin-1") == PROFILE_TOKEN if PROFILE_TOKEN else value not in (b"", b"0")
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    def begin(self, method: str, path: str) -> Profile:
+        profile = Profile(method, path, asyncio.current_task(), threading.get_ident())
+        with self._lock:
+            self._active[profile.id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sampler, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return profile
+
+    def end(self, profile: Profile, status: Optional[int], route: Optional[str]):
+        with self._lock:
+            self._active.pop(profile.id, None)
+            profile.finish(status, route)
+            self.counters["profiled"] += 1
+            entry = (profile.duration, profile.id, profile)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            elif entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def _sampler(self):
+        while True:
+            self._wake.wait()
+            with self._lock:
+                active = list(self._active.values())
+                if not active:
+                    self._wake.clear()
+                    continue
+            frames = sys._current_frames()
+            for profile in active:
+                frame = frames.get(profile.thread_id)
+                if frame is not None:
+                    try:
+                        profile.sample(frame)
+                    except Exception as e:  # the task finished underneath us
+                        print(f"WARNING: profiler sample failed: {e}")
+            self.counters["samples"] += len(active)
+            del frames
+            time.sleep(PROFILE_INTERVAL)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [p.summary() for _, _, p in sorted(self._slowest, reverse=True)]
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        with self._lock:
+            for _, pid, profile in self._slowest:
+                if pid == profile_id:
+                    return profile
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._slowest = []
+
+    def stats(self) -> dict:
+        return {"active": len(self._active), "stored": len(self._slowest), "keep": self.keep,
+                "sample_rate": PROFILE_SAMPLE_RATE, **self.counters}
+
+
+profiler = Profiler()
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware; profiled responses carry X-Profile-Id."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.wants(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        profile = profiler.begin(scope["method"], scope["path"])
+        status = [None]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-profile-id", str(profile.id).encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.end(profile, status[0], getattr(scope.get("route"), "path", None))
@@ -0,0 +1,316 @@
+"""
+Retrieval over the tax-law knowledge base (POST /rag/search).
+
+A search embeds the query and returns the nearest tax_laws rows through
+match_tax_laws (migrations 003 / 015), so n8n does not have to embed and
+call the RPC itself.
+
+Query embeddings are cached per worker, keyed by model and cache_key():
+the normalized text (NFKC, whitespace collapsed) case folded, so "Home
+Office Pauschale" and "home office  pauschale" share one entry. What gets
+embedded is the normalized text with its case and spelling intact
+(casefold() turns "Außergewöhnliche" into "aussergewöhnliche", which
+embeds differently against the German corpus); an entry holds the
+embedding of the first spelling that missed. Entries expire after QUERY_EMBEDDING_CACHE_TTL and are
+evicted LRU beyond QUERY_EMBEDDING_CACHE_SIZE. Concurrent misses for the
+same key share one embeddings call.
+
+RAG_BACKEND=index answers unfiltered searches from an in-process
+VectorIndex (dashboard/vector_index.py) instead of the RPC. It is loaded
+on the first search and synced with tax_laws in the background at most
+every RAG_INDEX_SYNC_SECONDS. A sync only sees added and deleted rows, so
+the index is also rebuilt every RAG_INDEX_RELOAD_SECONDS and after each
+seed job in this process (rows changed in place, e.g. new metadata).
+Searches with a metadata filter always use the RPC.
+
+stats(): cache hits / misses / coalesced lookups and the embeddings calls
+made and saved (also on /metrics as taxfix_rag_*).
+"""
+import asyncio
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from admin_api import db
+from dashboard import metrics
+# Shared with seed_knowledge: query vectors are encoded like the stored ones
+from dashboard.embedding_format import decode_embedding, vector_literal
+
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+# Must be the model tax_laws was seeded with (dashboard/seed_knowledge.py)
+EMBEDDING_MODEL = os.environ.get("RAG_EMBEDDING_MODEL", "text-embedding-3-small")
+RAG_EMBEDDING_TIMEOUT = float(os.environ.get("RAG_EMBEDDING_TIMEOUT", "10"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", "1024"))  # ~6 KB each
+QUERY_EMBEDDING_CACHE_TTL = float(os.environ.get("QUERY_EMBEDDING_CACHE_TTL", "86400"))
+RAG_MAX_QUERY_CHARS = int(os.environ.get("RAG_MAX_QUERY_CHARS", "2000"))
+RAG_MATCH_THRESHOLD = float(os.environ.get("RAG_MATCH_THRESHOLD", "0.3"))
+RAG_MATCH_COUNT = int(os.environ.get("RAG_MATCH_COUNT", "5"))
+RAG_MAX_MATCH_COUNT = int(os.environ.get("RAG_MAX_MATCH_COUNT", "50"))
+RAG_BACKEND = os.environ.get("RAG_BACKEND", "rpc")  # rpc | index
+RAG_INDEX_SYNC_SECONDS = float(os.environ.get("RAG_INDEX_SYNC_SECONDS", "60"))
+# Full rebuilds: the only way rows updated in place reach the index
+RAG_INDEX_RELOAD_SECONDS = float(os.environ.get("RAG_INDEX_RELOAD_SECONDS", "3600"))
+
+
+class InvalidSearch(ValueError):
+    pass
+
+
+class EmbeddingsNotConfigured(RuntimeError):
+    pass
+
+
+def normalize(text: str) -> str:
+    """The embeddings input for a query: NFKC, whitespace collapsed, case kept."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(text: str) -> str:
+    """The cache key for a normalize()d query."""
+    return text.casefold()
+
+
+_openai = None
+
+
+def openai_client():
+    """AsyncOpenAI, created on first use (keeps openai out of API startup)."""
+    global _openai
+    if _openai is None:
+        if not OPENAI_API_KEY:
+            raise EmbeddingsNotConfigured("OpenAI credentials not configured")
+        from openai import AsyncOpenAI
+        _openai = AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=RAG_EMBEDDING_TIMEOUT)
+    return _openai
+
+
+async def embed(text: str, model: str = EMBEDDING_MODEL) -> List[float]:
+    """One embeddings request for `text`."""
+    with metrics.time_embedding(model):
+        # base64: parsing a float list into the client's response models is slow
+        response = await openai_client().embeddings.create(input=[text], model=model, encoding_format="base64")
+    return decode_embedding(response.data[0].embedding)
+
+
+class Entry:
+    __slots__ = ("vector", "literal", "expires")
+
+    def __init__(self, vector: List[float], ttl: float):
+        self.vector = vector
+        self.literal = vector_literal(vector)
+        self.expires = time.monotonic() + ttl
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int = QUERY_EMBEDDING_CACHE_SIZE, ttl: float = QUERY_EMBEDDING_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Entry]" = OrderedDict()
+        self._loading: Dict[Tuple[str, str], asyncio.Future] = {}
+        # misses: embeddings calls made; hits + coalesced: calls saved
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "evictions": 0,
+                         "embedding_errors": 0}
+
+    def get(self, key: Tuple[str, str]) -> Optional[Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            del self._entries[key]
+            self.counters["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Tuple[str, str], entry: Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    async def get_or_embed(self, text: str, model: str = EMBEDDING_MODEL) -> Tuple[Entry, str]:
+        """
+        (entry, outcome) for the normalized `text`: outcome is "hit",
+        "coalesced" (waited for a concurrent miss) or "miss" (embedded).
+        """
+        key = (model, cache_key(text))
+        entry = self.get(key)
+        if entry is not None:
+            self.counters["hits"] += 1
+            return entry, "hit"
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(pending), "coalesced"
+
+        self.counters["misses"] += 1
+        # Its own task, so cancelling this request does not fail the waiters
+        task = asyncio.ensure_future(self._embed(key, text))
+        self._loading[key] = task
+        task.add_done_callback(lambda t: self._embedded(key, t))
+        return await asyncio.shield(task), "miss"
+
+    async def _embed(self, key: Tuple[str, str], text: str) -> Entry:
+        try:
+            entry = Entry(await embed(text, key[0]), self.ttl)
+        except Exception:
+            self.counters["embedding_errors"] += 1
+            raise
+        self.put(key, entry)
+        return entry
+
+    def _embedded(self, key: Tuple[str, str], task: asyncio.Future):
+        if self._loading.get(key) is task:
+            del self._loading[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when nobody else is waiting
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        c = self.counters
+        lookups = c["hits"] + c["misses"] + c["coalesced"]
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hit_ratio": round((c["hits"] + c["coalesced"]) / lookups, 4) if lookups else 0.0,
+            "embedding_calls_saved": c["hits"] + c["coalesced"],
+            **c,
+        }
+
+
+class IndexBackend:
+    """A VectorIndex over tax_laws, kept in sync by a background task."""
+
+    def __init__(self, sync_seconds: float = RAG_INDEX_SYNC_SECONDS,
+                 reload_seconds: float = RAG_INDEX_RELOAD_SECONDS):
+        self.sync_seconds = sync_seconds
+        self.reload_seconds = reload_seconds
+        self._index = None
+        self._client = None
+        self._loaded: Optional[asyncio.Future] = None
+        self._syncing: Optional[asyncio.Task] = None
+        self._reload_requested = False
+        self.reloaded_at: Optional[float] = None
+        self.last_sync: dict = {}
+
+    def _sync(self, reload: bool = False) -> dict:
+        from dashboard import vector_index
+        if self._client is None:
+            self._client = db.client_library().create_client(db.SUPABASE_URL, db.SUPABASE_KEY)
+        started = time.time()
+        if self._index is None:
+            self._index = vector_index.VectorIndex()
+            result = self._index.sync(self._client)  # a first load is a full one
+        elif reload:
+            result = self._index.reload(self._client)
+        else:
+            return self._index.sync(self._client)
+        self.reloaded_at = started
+        return result
+
+    async def _run_sync(self, reload: bool):
+        try:
+            self.last_sync = await asyncio.to_thread(self._sync, reload)
+        except Exception as e:
+            if reload:
+                self._reload_requested = True  # retried by the next search
+            print(f"WARNING: RAG index {'reload' if reload else 'sync'} failed: {e}")
+
+    def request_reload(self):
+        """Rebuild on the next search (tax_laws rows may have changed in place)."""
+        self._reload_requested = True
+
+    async def index(self):
+        """The index: loaded on first use, re-synced in the background once stale."""
+        if self._loaded is None:
+            if not db.configured():
+                raise db.DatabaseNotConfigured("Supabase credentials not configured")
+            self._loaded = asyncio.ensure_future(asyncio.to_thread(self._sync))
+        try:
+            self.last_sync = await asyncio.shield(self._loaded)
+        except Exception:
+            self._loaded = None  # retried by the next search
+            raise
+        if self._syncing is None or self._syncing.done():
+            now = time.time()
+            reload = self._reload_requested or now - (self.reloaded_at or 0) > self.reload_seconds
+            if reload or now - (self._index.synced_at or 0) > self.sync_seconds:
+                self._reload_requested = False
+                self._syncing = asyncio.ensure_future(self._run_sync(reload))
+        return self._index
+
+    def stats(self) -> dict:
+        if self._index is None:
+            return {}
+        index = self._index.stats()
+        return {"index_rows": index["rows"], "index_synced_at": index["synced_at"],
+                "index_reloaded_at": self.reloaded_at, "index_matrix_bytes": index["matrix_bytes"]}
+
+
+embeddings = QueryEmbeddingCache()
+index_backend = IndexBackend() if RAG_BACKEND == "index" else None
+_searches = {"rpc": 0, "index": 0}
+
+
+async def search(query: str, match_count: Optional[int] = None, match_threshold: Optional[float] = None,
+                 filter: Optional[dict] = None, ef_search: Optional[int] = None) -> dict:
+    """
+    Embeds `query` (through the cache) and returns the matching tax_laws
+    rows ({id, content, metadata, similarity}, best first) with timings.
+    """
+    text = normalize(query or "")
+    if not text:
+        raise InvalidSearch("query must not be empty")
+    if len(text) > RAG_MAX_QUERY_CHARS:
+        raise InvalidSearch(f"query is longer than {RAG_MAX_QUERY_CHARS} characters")
+    count = RAG_MATCH_COUNT if match_count is None else match_count
+    if not 1 <= count <= RAG_MAX_MATCH_COUNT:
+        raise InvalidSearch(f"match_count must be between 1 and {RAG_MAX_MATCH_COUNT}")
+    threshold = RAG_MATCH_THRESHOLD if match_threshold is None else match_threshold
+    if filter is not None and not isinstance(filter, dict):
+        raise InvalidSearch("filter must be an object")
+
+    t0 = time.perf_counter()
+    entry, outcome = await embeddings.get_or_embed(text)
+    t1 = time.perf_counter()
+    if index_backend is not None and not filter:
+        backend = "index"
+        index = await index_backend.index()
+        rows = await asyncio.to_thread(index.search, entry.vector, threshold, count)
+    else:
+        backend = "rpc"
+        rows = await db.match_tax_laws(entry.literal, threshold, count, filter=filter, ef_search=ef_search)
+    _searches[backend] += 1
+    return {
+        "query": text,
+        "model": EMBEDDING_MODEL,
+        "embedding": outcome,
+        "backend": backend,
+        "embedding_ms": round(1000 * (t1 - t0), 2),
+        "search_ms": round(1000 * (time.perf_counter() - t1), 2),
+        "results": rows,
+    }
+
+
+async def shutdown():
+    global _openai
+    if _openai is not None:
+        await _openai.close()
+    _openai = None
+
+
+def stats() -> dict:
+    return {
+        "backend": RAG_BACKEND,
+        "model": EMBEDDING_MODEL,
+        "searches": dict(_searches),
+        **embeddings.stats(),
+        **(index_backend.stats() if index_backend is not None else {}),
+    }
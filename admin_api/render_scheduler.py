@@ -0,0 +1,308 @@
+"""
+Render scheduler: renders PENDING_RENDER jobs with editly (migration 013).
+
+    python -m admin_api.render_scheduler
+
+Takes over from the n8n Rendering Workflow when the API runs with
+RENDER_BACKEND=scheduler (approvals then queue no render webhook). Each
+process:
+
+* runs up to RENDER_CONCURRENCY renders at once, by default as many as
+  the cores (RENDER_CPUS_PER_JOB each) and available memory
+  (RENDER_MEMORY_PER_JOB_MB each) of its container allow;
+* leases jobs from content_queue (render_claim, FOR UPDATE SKIP LOCKED),
+  highest render_priority first, then longest waiting, so schedulers on
+  several hosts share one queue;
+* renews its leases every RENDER_LEASE_SECONDS / 3 and kills a render
+  whose lease it lost. Jobs of a process that died are claimed again once
+  their lease expires, with retry_count + 1; a job goes to ERROR after
+  RENDER_MAX_RETRIES retries (content_queue.retry_count <= 3);
+* writes the video under a temporary name in RENDER_OUTPUT_DIR, renames
+  it into place and sets READY_TO_PUBLISH + video_url.
+
+SIGTERM stops claiming, lets running renders finish for up to
+RENDER_DRAIN_TIMEOUT seconds, then kills the rest and gives their leases
+back. Metrics are served on METRICS_PORT.
+"""
+import asyncio
+import json
+import os
+import shlex
+import signal
+import socket
+import sys
+import tempfile
+from typing import Dict, Optional
+
+from admin_api import db, serving
+from dashboard import metrics
+
+# "scheduler": approvals leave rendering to this process instead of n8n
+RENDER_BACKEND = os.environ.get("RENDER_BACKEND", "n8n")
+RENDER_CONCURRENCY = int(os.environ.get("RENDER_CONCURRENCY", "0"))  # 0 = from cores and memory
+RENDER_CPUS_PER_JOB = float(os.environ.get("RENDER_CPUS_PER_JOB", "2"))  # editly + the ffmpeg encode
+RENDER_MEMORY_PER_JOB_MB = int(os.environ.get("RENDER_MEMORY_PER_JOB_MB", "1024"))
+RENDER_LEASE_SECONDS = int(os.environ.get("RENDER_LEASE_SECONDS", "120"))
+RENDER_POLL_INTERVAL = float(os.environ.get("RENDER_POLL_INTERVAL", "5"))
+RENDER_TIMEOUT = float(os.environ.get("RENDER_TIMEOUT", "900"))  # one editly run
+RENDER_MAX_RETRIES = int(os.environ.get("RENDER_MAX_RETRIES", "3"))
+RENDER_BACKOFF_BASE = float(os.environ.get("RENDER_BACKOFF_BASE", "30"))
+RENDER_DRAIN_TIMEOUT = float(os.environ.get("RENDER_DRAIN_TIMEOUT", "60"))
+# {spec} is replaced by the path of the editly JSON spec
+RENDER_COMMAND = os.environ.get("RENDER_COMMAND", "editly --json {spec}")
+RENDER_OUTPUT_DIR = os.environ.get("RENDER_OUTPUT_DIR", "/data/files")
+# Where the API serves RENDER_OUTPUT_DIR, as publishers and browsers reach it
+# (stored in video_url); required
+RENDER_VIDEO_BASE_URL = os.environ.get("RENDER_VIDEO_BASE_URL", "").rstrip("/")
+
+
+def available_memory() -> Optional[int]:
+    """Bytes available for new processes: MemAvailable, capped by a cgroup memory limit."""
+    available = None
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+    for limit_path, usage_path in (("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+                                   ("/sys/fs/cgroup/memory/memory.limit_in_bytes",
+                                    "/sys/fs/cgroup/memory/memory.usage_in_bytes")):
+        try:
+            with open(limit_path) as f:
+                limit = f.read().strip()
+            with open(usage_path) as f:
+                usage = int(f.read().strip())
+        except (OSError, ValueError):
+            continue
+        if limit != "max" and int(limit) < 2 ** 60:  # cgroup v1 reports "unlimited" as a huge number
+            free = max(0, int(limit) - usage)
+            available = free if available is None else min(available, free)
+        break
+    return available
+
+
+def render_slots() -> int:
+    """RENDER_CONCURRENCY if set, else what the cores and the memory allow (at least 1)."""
+    if RENDER_CONCURRENCY > 0:
+        return RENDER_CONCURRENCY
+    slots = max(1, int(serving.cpu_limit() // RENDER_CPUS_PER_JOB))
+    memory = available_memory()
+    if memory is not None:
+        slots = min(slots, max(1, memory // (RENDER_MEMORY_PER_JOB_MB * 2 ** 20)))
+    return slots
+
+
+def editly_spec(job: db.Job, out_path: str) -> dict:
+    """The edit spec of the n8n "Config: Editly" node."""
+    script = job.get("script_content") or {}
+    if not script.get("hook"):  # approved with a script_structure edit only
+        script = job.get("script_structure") or script
+    return {
+        "width": 720,
+        "height": 1280,
+        "fps": 30,
+        "outPath": out_path,
+        "clips": [
+            {"duration": 3, "layers": [{"type": "title", "text": script.get("hook") or "", "background": "#16a34a"}]},
+            {"duration": 6, "layers": [{"type": "title", "text": (script.get("body") or "")[:100],
+                                        "background": "#000000"}]},
+            {"duration": 3, "layers": [{"type": "title", "text": script.get("cta") or "", "background": "#3b82f6"}]},
+        ],
+    }
+
+
+async def run_render(spec_path: str, timeout: float) -> Optional[str]:
+    """Runs RENDER_COMMAND on `spec_path`; returns None on success, else the error."""
+    argv = [arg.replace("{spec}", spec_path) for arg in shlex.split(RENDER_COMMAND)]
+    # Own process group: editly starts ffmpeg, and both must go on a kill
+    proc = await asyncio.create_subprocess_exec(*argv, stdout=asyncio.subprocess.DEVNULL,
+                                                stderr=asyncio.subprocess.PIPE, start_new_session=True)
+    try:
+        _, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        return f"timed out after {timeout:.0f}s"
+    if proc.returncode != 0:
+        return f"exit code {proc.returncode}: {stderr.decode(errors='replace').strip()[-500:]}"
+    return None
+
+
+class RenderScheduler:
+    def __init__(self, slots: Optional[int] = None, worker: Optional[str] = None):
+        self.slots = slots or render_slots()
+        self.worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        self.running: Dict[str, asyncio.Task] = {}
+        self.rendering = set()  # ids whose editly is running (may be killed on a lost lease)
+        self.peak_running = 0
+        self.counters = {"claimed": 0, "rendered": 0, "failed_attempts": 0, "lost_leases": 0,
+                         "released": 0, "complete_errors": 0}
+        self.last_error: Optional[str] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    async def claim(self) -> int:
+        """Leases as many jobs as there are free slots and starts rendering them."""
+        free = self.slots - len(self.running)
+        if free <= 0 or self._stopping:
+            return 0
+        rows = await db.claim_renders(self.worker, free, RENDER_LEASE_SECONDS, RENDER_MAX_RETRIES)
+        for job in rows:
+            self.counters["claimed"] += 1
+            if job["retry_count"] == 0:  # retries waited for their backoff or a lease
+                metrics.observe_queue_wait("render", job["queued_seconds"])
+            task = asyncio.create_task(self._render(job))
+            self.running[job["id"]] = task
+            task.add_done_callback(lambda _, job_id=job["id"]: self._done(job_id))
+        self.peak_running = max(self.peak_running, len(self.running))
+        return len(rows)
+
+    def _done(self, job_id: str):
+        self.running.pop(job_id, None)
+        self._wake.set()  # a slot is free
+
+    async def _render(self, job: db.Job):
+        job_id = job["id"]
+        filename = f"video_{job_id}.mp4"
+        part_path = os.path.join(RENDER_OUTPUT_DIR, f".video_{job_id}.{os.getpid()}.mp4")
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(editly_spec(job, part_path), f)
+        self.rendering.add(job_id)
+        try:
+            with metrics.time_render() as result:
+                error = await run_render(f.name, RENDER_TIMEOUT)
+                if error is not None:
+                    result["outcome"] = "failed"
+            if error is None:
+                os.replace(part_path, os.path.join(RENDER_OUTPUT_DIR, filename))
+        except asyncio.CancelledError:
+            raise  # lease lost or shutting down: not this attempt's outcome
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            self.rendering.discard(job_id)
+            for path in (f.name, part_path):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+        if error is not None:
+            self.counters["failed_attempts"] += 1
+            self.last_error = error
+            print(f"WARNING: render of {job_id} failed (retry_count {job['retry_count']}): {error}")
+        try:
+            rows = await db.complete_render(self.worker, job_id,
+                                            None if error else f"{RENDER_VIDEO_BASE_URL}/{filename}", error,
+                                            RENDER_MAX_RETRIES, RENDER_BACKOFF_BASE)
+        except Exception as e:
+            # The lease expires and the job is rendered again
+            self.counters["complete_errors"] += 1
+            print(f"WARNING: recording the render of {job_id} failed: {e}")
+            return
+        if not rows:
+            self.counters["lost_leases"] += 1
+        elif error is None:
+            self.counters["rendered"] += 1
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(RENDER_LEASE_SECONDS / 3)
+            ids = list(self.rendering)
+            if not ids:
+                continue
+            try:
+                held = set(await db.renew_renders(self.worker, ids, RENDER_LEASE_SECONDS))
+            except Exception as e:
+                print(f"WARNING: render lease renewal failed: {e}")
+                continue
+            for job_id in ids:
+                # Taken over after our lease expired, or moved out of PENDING_RENDER
+                if job_id not in held and job_id in self.rendering:
+                    self.counters["lost_leases"] += 1
+                    print(f"WARNING: lost the render lease of {job_id}; stopping its render")
+                    self.running[job_id].cancel()
+
+    async def run(self):
+        """Claims and renders until stop(), then drains."""
+        self._wake = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        print(f"Render scheduler {self.worker}: {self.slots} slot(s)", flush=True)
+        try:
+            while not self._stopping:
+                try:
+                    claimed = await self.claim()
+                except Exception as e:
+                    claimed = 0
+                    print(f"WARNING: render claim failed: {e}")
+                if claimed and len(self.running) < self.slots:
+                    continue  # there may be more jobs
+                try:
+                    await asyncio.wait_for(self._wake.wait(), RENDER_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+            await self._drain()
+        finally:
+            heartbeat.cancel()
+
+    def stop(self):
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _drain(self):
+        if self.running:
+            print(f"Draining {len(self.running)} render(s) for up to {RENDER_DRAIN_TIMEOUT:g}s", flush=True)
+            await asyncio.wait(list(self.running.values()), timeout=RENDER_DRAIN_TIMEOUT)
+        left = list(self.running)
+        if not left:
+            return
+        tasks = list(self.running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        released = await db.release_renders(self.worker, left)
+        self.counters["released"] += len(released)
+        print(f"Released {len(released)} unfinished render(s)", flush=True)
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "running": len(self.running),
+            "peak_running": self.peak_running,
+            "lease_seconds": RENDER_LEASE_SECONDS,
+            "last_error": self.last_error,
+            **self.counters,
+        }
+
+
+async def main():
+    await db.startup()
+    metrics.serve()  # scrape endpoint, if METRICS_PORT is set
+    scheduler = RenderScheduler()
+    metrics.register_stats("render", scheduler.stats)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, scheduler.stop)
+    try:
+        await scheduler.run()
+    finally:
+        await db.shutdown()
+
+
+if __name__ == "__main__":
+    if not db.configured():
+        print("Error: Missing Environment Variables (SUPABASE_URL, SUPABASE_KEY)")
+        sys.exit(1)
+    if not RENDER_VIDEO_BASE_URL:
+        print("Error: Missing Environment Variable RENDER_VIDEO_BASE_URL (e.g. https://admin.example.com/files)")
+        sys.exit(1)
+    os.makedirs(RENDER_OUTPUT_DIR, exist_ok=True)
+    asyncio.run(main())
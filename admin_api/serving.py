@@ -0,0 +1,137 @@
+"""
+Process-level serving helpers: worker sizing, drain hooks and per-worker
+boot / memory figures.
+
+Production runs the API under gunicorn (admin_api/gunicorn_conf.py) with
+one uvicorn worker per available core. The app is imported once in the
+master and forked, so workers start warm and share its read-only pages;
+clients, pools and background tasks are created per worker by the app
+lifespan. This module does not import gunicorn, so the app can use it
+under plain uvicorn too.
+"""
+import os
+from typing import Callable, List, Optional
+
+# Seconds a draining worker waits for in-flight requests before cancelling them
+DRAIN_TIMEOUT = float(os.environ.get("DRAIN_TIMEOUT", "25"))
+
+_drain_callbacks: List[Callable[[], None]] = []
+_draining = False
+_boot = {"import_seconds": None, "ready_seconds": None}
+
+
+def cpu_limit() -> int:
+    """
+    CPUs this process may use: the affinity mask, capped by a cgroup CPU
+    quota (docker --cpus / Kubernetes limits), at least 1.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not Linux
+        cpus = os.cpu_count() or 1
+    for path in ("/sys/fs/cgroup/cpu.max", "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"):
+        try:
+            with open(path) as f:
+                fields = f.read().split()
+        except OSError:
+            continue
+        if path.endswith("cpu.max"):
+            quota, period = fields[0], (fields[1] if len(fields) > 1 else "100000")
+        else:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                quota, period = fields[0], f.read().strip()
+        if quota not in ("max", "-1"):
+            cpus = min(cpus, max(1, int(-(-int(quota) // int(period)))))
+        break
+    return max(1, cpus)
+
+
+def worker_count() -> int:
+    """WEB_CONCURRENCY if set, else one async worker per available core."""
+    configured = os.environ.get("WEB_CONCURRENCY")
+    return max(1, int(configured)) if configured else cpu_limit()
+
+
+# ---------------------------------------------------------------------------
+# Draining
+# ---------------------------------------------------------------------------
+
+def on_drain(callback: Callable[[], None]):
+    """Registers `callback()`, called once when the worker starts draining."""
+    _drain_callbacks.append(callback)
+
+
+def begin_drain():
+    """
+    Called by the server when it stops accepting connections, before it
+    waits for in-flight requests: ends responses that would never finish
+    on their own (SSE streams).
+    """
+    global _draining
+    if _draining:
+        return
+    _draining = True
+    for callback in _drain_callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print(f"WARNING: drain callback failed: {e}")
+
+
+def draining() -> bool:
+    return _draining
+
+
+# ---------------------------------------------------------------------------
+# Boot time and memory
+# ---------------------------------------------------------------------------
+
+def process_age() -> Optional[float]:
+    """Seconds since this process was started (forked), from /proc; None elsewhere."""
+    try:
+        with open("/proc/self/stat") as f:
+            started = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - started / os.sysconf("SC_CLK_TCK")
+
+
+def mark_imported(seconds: float):
+    _boot["import_seconds"] = round(seconds, 3)
+
+
+def mark_ready():
+    """Records (and logs) how long this process took to be ready for requests."""
+    age = process_age()
+    _boot["ready_seconds"] = round(age, 3) if age is not None else None
+    print(f"Worker {os.getpid()} ready in {_boot['ready_seconds']}s "
+          f"(app import {_boot['import_seconds']}s, rss {memory()['rss_bytes'] // 2**20} MiB)", flush=True)
+
+
+def memory() -> dict:
+    """
+    Resident memory of this process. pss/uss (Linux) count pages shared
+    with the master and the other workers proportionally / not at all, so
+    they are what a worker actually adds.
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if value.rstrip().endswith("kB"):
+                    fields[key] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return {
+        "rss_bytes": fields.get("Rss", 0),
+        "pss_bytes": fields.get("Pss"),
+        "uss_bytes": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0) if fields else None,
+    }
+
+
+def stats() -> dict:
+    return {"pid": os.getpid(), "draining": _draining, "cpu_limit": cpu_limit(),
+            **_boot, **memory()}
@@ -0,0 +1,272 @@
+"""
+Streaming reader and chunker for the tax-law knowledge base corpus.
+
+Law texts (EStG, LStR, ...) live on disk as JSONL, Markdown or HTML files.
+iter_chunks() reads them lazily and yields {"content", "metadata"} laws
+ready for seed_knowledge.seed_db(), one chunk at a time, so only the
+current paragraph window is held in memory however large the corpus is.
+
+- JSONL: one {"content" (or "text"), "metadata"} record per line, each
+  record chunked on its own; its metadata (including "section") is kept.
+- Markdown / HTML: headings (#.., <h1>..<h6>) open sections. A chunk
+  never spans two sections; metadata.section is the innermost heading and
+  the content starts with the heading trail ("EStG > § 9 Werbungskosten")
+  so the embedding sees where the text comes from.
+
+Chunks are packed from whole paragraphs (falling back to sentences, then
+words, for long ones) up to CHUNK_MAX_CHARS, and each chunk repeats up to
+CHUNK_OVERLAP_CHARS of the end of the previous one from the same section.
+"""
+import json
+import os
+import re
+from html.parser import HTMLParser
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+CHUNK_MAX_CHARS = int(os.environ.get("CHUNK_MAX_CHARS", "1500"))  # ~400-500 tokens
+CHUNK_OVERLAP_CHARS = int(os.environ.get("CHUNK_OVERLAP_CHARS", "200"))
+# Bytes handed to the HTML parser at a time
+READ_SIZE = 64 * 1024
+
+EXTENSIONS = {".jsonl": "jsonl", ".md": "markdown", ".markdown": "markdown", ".html": "html", ".htm": "html"}
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+_SPACE = re.compile(r"\s+")
+
+
+class Section(NamedTuple):
+    heading: str    # heading trail, "" for JSONL records
+    metadata: dict
+
+
+# A paragraph of text in a section. Consecutive blocks of the same Section
+# object are chunked together.
+Block = Tuple[Section, str]
+
+
+def iter_files(paths: Iterable[str]) -> Iterator[str]:
+    """Corpus files under `paths` (files or directories), in name order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in EXTENSIONS:
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+class _Headings:
+    """Heading trail of a Markdown / HTML document."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.stack: List[Tuple[int, str]] = []
+        self.section = Section("", {"source": source, "section": None})
+
+    def open(self, level: int, title: str) -> Section:
+        while self.stack and self.stack[-1][0] >= level:
+            self.stack.pop()
+        self.stack.append((level, title))
+        trail = " > ".join(t for _, t in self.stack)
+        self.section = Section(trail, {"source": self.source, "section": title})
+        return self.section
+
+
+def read_jsonl(path: str) -> Iterator[Block]:
+    source = os.path.basename(path)
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                print(f"WARNING: {path}:{number}: skipped, not JSON ({e})")
+                continue
+            text = record.get("content") or record.get("text") or ""
+            section = Section("", {"source": source, **(record.get("metadata") or {})})
+            for paragraph in re.split(r"\n\s*\n", text):
+                yield section, paragraph
+
+
+def read_markdown(path: str) -> Iterator[Block]:
+    headings = _Headings(os.path.basename(path))
+    paragraph: List[str] = []
+    fence = False
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.lstrip().startswith("```"):
+                fence = not fence
+            match = None if fence else _HEADING.match(line.rstrip())
+            if match or not line.strip():
+                if paragraph:
+                    yield headings.section, " ".join(paragraph)
+                    paragraph = []
+                if match:
+                    headings.open(len(match.group(1)), match.group(2))
+            else:
+                paragraph.append(line.strip())
+    if paragraph:
+        yield headings.section, " ".join(paragraph)
+
+
+class _HTMLBlocks(HTMLParser):
+    BREAKS = {"p", "div", "li", "tr", "td", "th", "dd", "dt", "blockquote", "pre", "br", "table",
+              "ul", "ol", "dl", "section", "article"}
+    SKIP = {"script", "style", "head", "nav", "footer"}
+
+    def __init__(self, source: str):
+        super().__init__()
+        self.headings = _Headings(source)
+        self.blocks: List[Block] = []
+        self._text: List[str] = []
+        self._heading: Optional[int] = None
+        self._skip = 0
+
+    def _flush(self):
+        text = "".join(self._text)
+        self._text = []
+        if self._heading is not None:
+            self.headings.open(self._heading, _SPACE.sub(" ", text).strip())
+        elif text.strip():
+            self.blocks.append((self.headings.section, text))
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif re.fullmatch(r"h[1-6]", tag):
+            self._flush()
+            self._heading = int(tag[1])
+        elif tag in self.BREAKS and self._heading is None:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif re.fullmatch(r"h[1-6]", tag):
+            self._flush()
+            self._heading = None
+        elif tag in self.BREAKS and self._heading is None:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._text.append(data)
+
+
+def read_html(path: str) -> Iterator[Block]:
+    parser = _HTMLBlocks(os.path.basename(path))
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            data = f.read(READ_SIZE)
+            if not data:
+                break
+            parser.feed(data)
+            yield from parser.blocks
+            parser.blocks = []
+    parser.close()
+    parser._flush()
+    yield from parser.blocks
+
+
+READERS = {"jsonl": read_jsonl, "markdown": read_markdown, "html": read_html}
+
+
+def iter_blocks(paths: Iterable[str]) -> Iterator[Block]:
+    for path in iter_files(paths):
+        kind = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if kind is None:
+            print(f"WARNING: {path}: skipped, not one of {', '.join(EXTENSIONS)}")
+            continue
+        yield from READERS[kind](path)
+
+
+def _pieces(paragraph: str, max_chars: int) -> Iterator[Tuple[str, str]]:
+    """(separator, text) pieces of at most max_chars: the paragraph, or its sentences, or word runs."""
+    paragraph = _SPACE.sub(" ", paragraph).strip()
+    if not paragraph:
+        return
+    if len(paragraph) <= max_chars:
+        yield "\n\n", paragraph
+        return
+    separator = "\n\n"
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars + 1)
+            cut = cut if cut > 0 else max_chars
+            yield separator, sentence[:cut]
+            separator, sentence = " ", sentence[cut:].lstrip()
+        if sentence:
+            yield separator, sentence
+            separator = " "
+
+
+def _join(pieces: List[Tuple[str, str]]) -> str:
+    return "".join(sep + text for sep, text in pieces)[len(pieces[0][0]):] if pieces else ""
+
+
+def _overlap(pieces: List[Tuple[str, str]], overlap: int) -> List[Tuple[str, str]]:
+    """The trailing pieces within `overlap` characters (or the tail of the last one, cut at a word)."""
+    kept: List[Tuple[str, str]] = []
+    size = 0
+    for sep, text in reversed(pieces):
+        if size + len(text) + len(sep) > overlap:
+            if not kept and overlap > 0:
+                tail = text[-overlap:]
+                space = tail.find(" ")
+                if 0 <= space < len(tail) - 1:
+                    kept.append((" ", tail[space + 1:]))
+            break
+        kept.append((sep, text))
+        size += len(text) + len(sep)
+    return kept[::-1]
+
+
+def chunk_blocks(blocks: Iterable[Block], max_chars: int = CHUNK_MAX_CHARS,
+                 overlap: int = CHUNK_OVERLAP_CHARS) -> Iterator[dict]:
+    """
+    Packs consecutive blocks of one section into chunks of at most
+    `max_chars` characters of body text, each starting with up to `overlap`
+    characters from the end of the previous chunk of that section.
+    """
+    section: Optional[Section] = None
+    pieces: List[Tuple[str, str]] = []
+    size = fresh = index = 0
+
+    def emit() -> dict:
+        body = _join(pieces)
+        content = f"{section.heading}\n\n{body}" if section.heading else body
+        return {"content": content, "metadata": {**section.metadata, "chunk": index}}
+
+    for block_section, paragraph in blocks:
+        if block_section is not section:
+            if fresh:
+                yield emit()
+            section, pieces, size, fresh, index = block_section, [], 0, 0, 0
+        for piece in _pieces(paragraph, max_chars):
+            added = len(piece[1]) + (len(piece[0]) if pieces else 0)
+            if pieces and size + added > max_chars:
+                if fresh:
+                    yield emit()
+                    index += 1
+                pieces = _overlap(pieces, overlap)
+                size = len(_join(pieces))
+                while pieces and size + len(piece[0]) + len(piece[1]) > max_chars:
+                    pieces.pop(0)
+                    size = len(_join(pieces))
+                fresh = 0
+                added = len(piece[1]) + (len(piece[0]) if pieces else 0)
+            pieces.append(piece)
+            size += added
+            fresh += 1
+    if fresh:
+        yield emit()
+
+
+def iter_chunks(paths: Iterable[str], max_chars: int = CHUNK_MAX_CHARS,
+                overlap: int = CHUNK_OVERLAP_CHARS) -> Iterator[dict]:
+    """Laws ({"content", "metadata"}) for seed_knowledge.seed_db() from the corpus files under `paths`."""
+    return chunk_blocks(iter_blocks(paths), max_chars, overlap)
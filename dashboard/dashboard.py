@@ -13,6 +13,8 @@ import json
 from pathlib import Path
 from typing import Optional, Dict, List
 
+import metrics
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -88,6 +90,9 @@ def init_supabase() -> Optional[Client]:
 
 supabase = init_supabase()
 
+# Prometheus scrape endpoint for the dashboard's query timings (METRICS_PORT)
+metrics.serve()
+
 # ============================================================================
 # SESSION STATE
 # ============================================================================
@@ -112,31 +117,27 @@ def get_dashboard_metrics() -> Dict:
     
     try:
         # Count by status using simple queries
-        pending = supabase.table(VIDEO_QUEUE_TABLE)\
+        pending = metrics.execute(supabase.table(VIDEO_QUEUE_TABLE)\
             .select('id', count='exact')\
-            .eq('status', 'PENDING_REVIEW')\
-            .execute()
+            .eq('status', 'PENDING_REVIEW'))
         
-        approved = supabase.table(VIDEO_QUEUE_TABLE)\
+        approved = metrics.execute(supabase.table(VIDEO_QUEUE_TABLE)\
             .select('id', count='exact')\
-            .eq('status', 'APPROVED')\
-            .execute()
+            .eq('status', 'APPROVED'))
         
-        errors = supabase.table(VIDEO_QUEUE_TABLE)\
+        errors = metrics.execute(supabase.table(VIDEO_QUEUE_TABLE)\
             .select('id', count='exact')\
-            .eq('status', 'ERROR')\
-            .execute()
+            .eq('status', 'ERROR'))
         
         # Try to get average compliance score (will fail gracefully if function doesn't exist)
         try:
-            avg_score_result = supabase.rpc('avg_compliance_score').execute()
+            avg_score_result = metrics.execute(supabase.rpc('avg_compliance_score'))
             avg_score = float(avg_score_result.data) if avg_score_result.data else 0.00
         except:
             # Fallback: Calculate manually
-            all_records = supabase.table(VIDEO_QUEUE_TABLE)\
+            all_records = metrics.execute(supabase.table(VIDEO_QUEUE_TABLE)\
                 .select('compliance_score')\
-                .not_.is_('compliance_score', 'null')\
-                .execute()
+                .not_.is_('compliance_score', 'null'))
             
             if all_records.data:
                 scores = [r['compliance_score'] for r in all_records.data if r.get('compliance_score')]
@@ -144,6 +145,12 @@ def get_dashboard_metrics() -> Dict:
             else:
                 avg_score = 0.00
         
+        metrics.set_queue_depth({
+            'PENDING_REVIEW': pending.count or 0,
+            'APPROVED': approved.count or 0,
+            'ERROR': errors.count or 0
+        }, complete=False)
+        
         return {
             'pending': pending.count or 0,
             'approved': approved.count or 0,
@@ -171,7 +178,7 @@ def get_videos(status_filter: str = "PENDING_REVIEW", platform_filter: str = "AL
         if platform_filter != "ALL":
             query = query.eq('platform', platform_filter)
         
-        response = query.order('created_at', desc=True).limit(50).execute()
+        response = metrics.execute(query.order('created_at', desc=True).limit(50))
         return response.data or []
     
     except Exception as e:
@@ -184,48 +191,35 @@ def update_video_status(
     notes: Optional[str] = None
 ) -> bool:
     """Update video status and create audit log"""
-    if not supabase:
-        return False
+    return update_video_statuses([video_id], new_status, notes) == 1
+
+def update_video_statuses(
+    video_ids: List[str],
+    new_status: str,
+    notes: Optional[str] = None
+) -> int:
+    """
+    Update the status of many videos and write their audit logs in one
+    round-trip (content_queue_bulk_transition, migration 010).
+    Returns the number of videos updated.
+    """
+    if not supabase or not video_ids:
+        return 0
     
     try:
-        # 1. Get current status for audit log
-        current = supabase.table(VIDEO_QUEUE_TABLE)\
-            .select('status')\
-            .eq('id', video_id)\
-            .execute()
-        
-        old_status = current.data[0]['status'] if current.data else 'UNKNOWN'
-        
-        # 2. Update content_queue
-        update_data = {
-            'status': new_status,
-            'reviewed_by': st.session_state.user_name,
-            'reviewed_at': datetime.utcnow().isoformat()
-        }
-        
-        if notes:
-            update_data['review_notes'] = notes
-        
-        supabase.table(VIDEO_QUEUE_TABLE)\
-            .update(update_data)\
-            .eq('id', video_id)\
-            .execute()
+        result = metrics.execute(supabase.rpc('content_queue_bulk_transition', {
+            'job_ids': video_ids,
+            'to_status': new_status,
+            'actor': st.session_state.user_name,
+            'audit_note': notes,
+            'mark_reviewed': True
+        }))
         
-        # 3. Create audit log
-        supabase.table(AUDIT_TABLE).insert({
-            'asset_id': video_id,
-            'old_status': old_status,
-            'new_status': new_status,
-            'changed_by': st.session_state.user_name,
-            'note': notes or f'Status changed from {old_status} to {new_status}',
-            'timestamp': datetime.utcnow().isoformat()
-        }).execute()
-        
-        return True
+        return sum(1 for row in (result.data or []) if row.get('updated'))
     
     except Exception as e:
         st.error(f"Failed to update status: {e}")
-        return False
+        return 0
 
 def format_timestamp(timestamp: Optional[str]) -> str:
     """Format ISO timestamp to readable string"""
@@ -378,6 +372,22 @@ selected_idx = st.selectbox(
     key="video_selector"
 )
 
+pending = [i for i, v in enumerate(videos) if v.get('status') == 'PENDING_REVIEW']
+if len(pending) > 1:
+    with st.expander(f"✅ Bulk Approve ({len(pending)} pending)"):
+        bulk_selection = st.multiselect(
+            "Videos to approve:",
+            pending,
+            default=pending,
+            format_func=lambda i: video_options[i],
+            key="bulk_approve_selection"
+        )
+        if st.button("APPROVE SELECTED", type="primary", key="bulk_approve_btn", disabled=not bulk_selection):
+            approved = update_video_statuses([videos[i]['id'] for i in bulk_selection], 'APPROVED')
+            st.success(f"✅ Approved {approved} of {len(bulk_selection)} videos.")
+            st.cache_data.clear()
+            st.rerun()
+
 row = videos[selected_idx]
 st.session_state.selected_video_id = row['id']
 
@@ -657,11 +667,10 @@ with tab3:
     # Fetch audit logs for this video
     if supabase:
         try:
-            audit_response = supabase.table(AUDIT_TABLE)\
+            audit_response = metrics.execute(supabase.table(AUDIT_TABLE)\
                 .select('*')\
                 .eq('asset_id', row['id'])\
-                .order('timestamp', desc=True)\
-                .execute()
+                .order('timestamp', desc=True))
             
             audit_logs = audit_response.data or []
         except Exception as e:
@@ -799,7 +808,7 @@ with st.sidebar:
     
     if supabase:
         try:
-            test = supabase.table(VIDEO_QUEUE_TABLE).select('id', count='exact').limit(1).execute()
+            test = metrics.execute(supabase.table(VIDEO_QUEUE_TABLE).select('id', count='exact').limit(1))
             st.success(f"✅ Connected")
             st.caption(f"Total records: {test.count or 'Unknown'}")
         except Exception as e:
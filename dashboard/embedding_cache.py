@@ -0,0 +1,127 @@
+"""
+Persistent local cache of embeddings, keyed by (model, sha256 of the text).
+
+Seeding the knowledge base looks every law up here before calling the
+embeddings API, so re-seeding after a reset (or on a fresh database) only
+pays for texts that were never embedded with that model.
+
+Vectors are stored as little-endian blobs in a SQLite file
+(EMBEDDING_CACHE_PATH, WAL mode, so several processes can share it);
+an empty EMBEDDING_CACHE_PATH disables the cache. Entries are float32 by
+default; a cache opened with storage="float16" or "int8" (see
+quantization) writes compact entries instead. Each row records its
+encoding, and get_many(exact=True) treats compact entries as misses:
+seeding writes cached vectors to tax_laws, so it only takes float32 ones.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from dashboard import quantization
+    from dashboard.embedding_format import pack, unpack
+except ImportError:  # run as a script from dashboard/
+    import quantization
+    from embedding_format import pack, unpack
+
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH", os.path.expanduser("~/.cache/taxfix/embeddings.sqlite3"))
+# Keys per SELECT ... IN (...) (SQLite's default variable limit is 999)
+LOOKUP_CHUNK_SIZE = 500
+
+
+def content_hash(text: str) -> str:
+    """sha256 of `text` (hex); also tax_laws.content_hash."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def encode(vector: List[float], storage: str) -> bytes:
+    if storage == "float32":
+        return pack(vector)
+    return quantization.to_bytes(vector, storage)
+
+
+def decode(blob: bytes, storage: str) -> List[float]:
+    if storage == "float32":
+        return unpack(blob)
+    return quantization.from_bytes(blob, storage).tolist()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, storage: str = "float32"):
+        self.path = path
+        self.storage = quantization.check_storage(storage)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " encoding TEXT NOT NULL DEFAULT 'float32',"
+            " PRIMARY KEY (model, content_hash)"
+            ")")  # a rowid table: WITHOUT ROWID spills rows over ~1 KB to overflow pages
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")]
+        if "encoding" not in columns:  # cache written before compact entries: all float32
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN encoding TEXT NOT NULL DEFAULT 'float32'")
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, hashes: Iterable[str], exact: bool = False) -> Dict[str, List[float]]:
+        """
+        Cached vectors for those of `hashes` embedded with `model`; with
+        `exact`, only float32 entries (compact ones count as misses).
+        """
+        hashes = list(hashes)
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for i in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+                chunk = hashes[i:i + LOOKUP_CHUNK_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT content_hash, vector, encoding FROM embeddings WHERE model = ? "
+                    f"AND content_hash IN ({','.join('?' * len(chunk))})"
+                    + (" AND encoding = 'float32'" if exact else ""), [model, *chunk])
+                found.update((key, decode(blob, encoding)) for key, blob, encoding in rows)
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, content_hash, vector, created_at, encoding) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(model, key, encode(vector, self.storage), now, self.storage)
+                     for key, vector in vectors.items()])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self, model: Optional[str] = None) -> int:
+        with self._lock:
+            if model is None:
+                return self._conn.execute("DELETE FROM embeddings").rowcount
+            return self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model,)).rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+            return {"path": self.path, "storage": self.storage, "entries": entries, "vector_bytes": size,
+                    "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,46 @@
+"""
+How embeddings are encoded on their way between the embeddings API,
+tax_laws and the local cache. The seeder (seed_knowledge) and the query
+path (admin_api/rag.py) both use these, so stored and query vectors are
+encoded the same way. Standard library only: the Admin API imports it
+at startup.
+
+- decode_embedding(): an API embedding, requested with
+  encoding_format="base64" (little-endian float32), as a float list
+- vector_literal(): pgvector text form for tax_laws / match_tax_laws
+- pack() / unpack(): little-endian float32 blobs (embedding_cache)
+"""
+import base64
+import sys
+from array import array
+from typing import List, Union
+
+
+def pack(vector: List[float]) -> bytes:
+    packed = array("f", vector)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    if sys.byteorder == "big":
+        vector.byteswap()
+    return vector.tolist()
+
+
+def decode_embedding(value: Union[str, List[float]]) -> List[float]:
+    """An embedding as returned with encoding_format="base64" (or already a float list)."""
+    if isinstance(value, list):
+        return value
+    return unpack(base64.b64decode(value))
+
+
+def vector_literal(embedding: List[float]) -> str:
+    """
+    pgvector text form of `embedding`. 9 significant digits round-trip the
+    float32 values exactly, at ~60% of the size of a JSON float list.
+    """
+    return "[%s]" % ",".join(["%.9g" % x for x in embedding])
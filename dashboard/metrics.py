@@ -0,0 +1,304 @@
+"""
+Prometheus instrumentation shared by the Admin API, the dashboard and the
+seeding script.
+
+    taxfix_http_request_duration_seconds{method,route,status}
+    taxfix_supabase_query_duration_seconds{table,op,outcome}
+    taxfix_n8n_webhook_duration_seconds{target,outcome}
+    taxfix_openai_embedding_duration_seconds{model,outcome}
+    taxfix_render_duration_seconds{outcome}    editly runs of the render scheduler
+    taxfix_content_queue_jobs{status}
+    taxfix_stage_queue_wait_seconds{stage}     workflow trigger enqueue -> dispatch
+    taxfix_admission_rejected_total{stage}     429s from admission control
+    taxfix_<component>_<key>{key}  component stats() dicts (register_stats)
+
+The Admin API serves them at /metrics. The dashboard, the seeding script
+and the render scheduler have no HTTP app of their own; serve() starts a scrape endpoint on
+METRICS_PORT when it is set.
+
+Import as `from dashboard import metrics` from the Admin API and as
+`import metrics` from scripts in this directory, never both in one process
+(the metrics would be registered twice).
+"""
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, start_http_server)
+from prometheus_client.core import GaugeMetricFamily
+
+NAMESPACE = "taxfix"
+METRICS_PORT = os.environ.get("METRICS_PORT")
+# Set (with gunicorn and several workers) to aggregate over all workers
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Requests and queries: 5ms .. 1min; webhooks and embeddings are slower
+FAST_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+SLOW_BUCKETS = (.05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Renders: 10s .. 20min
+RENDER_BUCKETS = (10, 20, 30, 45, 60, 90, 120, 180, 300, 450, 600, 900, 1200)
+# Jobs waiting for a stage slot: up to an hour
+QUEUE_BUCKETS = (.1, .5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency until the response body is complete",
+    ["method", "route", "status"], namespace=NAMESPACE, buckets=FAST_BUCKETS)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being handled", namespace=NAMESPACE, multiprocess_mode="livesum")
+SUPABASE_QUERY_SECONDS = Histogram(
+    "supabase_query_duration_seconds", "PostgREST query latency by table (rpc:<name> for RPCs) and operation",
+    ["table", "op", "outcome"], namespace=NAMESPACE, buckets=FAST_BUCKETS)
+N8N_WEBHOOK_SECONDS = Histogram(
+    "n8n_webhook_duration_seconds", "n8n webhook call latency by target",
+    ["target", "outcome"], namespace=NAMESPACE, buckets=SLOW_BUCKETS)
+EMBEDDING_SECONDS = Histogram(
+    "openai_embedding_duration_seconds", "OpenAI embeddings call latency",
+    ["model", "outcome"], namespace=NAMESPACE, buckets=SLOW_BUCKETS)
+EMBEDDING_INPUTS = Counter(
+    "openai_embedding_inputs", "Texts sent to the embeddings API", ["model"], namespace=NAMESPACE)
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "embedding_cache_lookups", "Embedding cache lookups when seeding, by result (hit/miss)",
+    ["model", "result"], namespace=NAMESPACE)
+RENDER_SECONDS = Histogram(
+    "render_duration_seconds", "editly render time (render scheduler)",
+    ["outcome"], namespace=NAMESPACE, buckets=RENDER_BUCKETS)
+STAGE_QUEUE_WAIT_SECONDS = Histogram(
+    "stage_queue_wait_seconds", "Time a workflow trigger waited for a free stage slot",
+    ["stage"], namespace=NAMESPACE, buckets=QUEUE_BUCKETS)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected", "Requests refused with 429 because their stage was saturated",
+    ["stage"], namespace=NAMESPACE)
+QUEUE_DEPTH = Gauge(
+    "content_queue_jobs", "content_queue rows per status", ["status"], namespace=NAMESPACE,
+    multiprocess_mode="mostrecent")
+
+_METHODS = {"GET": "select", "PATCH": "update", "DELETE": "delete", "HEAD": "select"}
+_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels: str) -> Iterator[dict]:
+    """
+    Observes the duration of the block with outcome="ok", or "error" if it
+    raised. The block may set result["outcome"] itself (e.g. "http_502").
+    """
+    start = time.perf_counter()
+    result = {"outcome": None}
+    try:
+        yield result
+    except BaseException:
+        result["outcome"] = "error"
+        raise
+    finally:
+        histogram.labels(outcome=result["outcome"] or "ok", **labels).observe(time.perf_counter() - start)
+
+
+# ---------------------------------------------------------------------------
+# Supabase / PostgREST
+# ---------------------------------------------------------------------------
+
+def describe_query(query: Any) -> Tuple[str, str]:
+    """(table, op) of a postgrest request builder, e.g. ("content_queue", "upsert")."""
+    path = getattr(query, "path", "") or ""
+    method = getattr(query, "http_method", "") or ""
+    name = path.rsplit("/", 1)[-1] or "unknown"
+    if path.startswith("/rpc/"):
+        return f"rpc:{name}", "rpc"
+    if method == "POST":
+        prefer = (getattr(query, "headers", None) or {}).get("prefer", "")
+        return name, "upsert" if "resolution=" in prefer else "insert"
+    return name, _METHODS.get(method, method.lower() or "unknown")
+
+
+@contextmanager
+def time_query(query: Any) -> Iterator[dict]:
+    table, op = describe_query(query)
+    with timed(SUPABASE_QUERY_SECONDS, table=table, op=op) as result:
+        yield result
+
+
+def execute(query: Any) -> Any:
+    """query.execute(), timed (for the sync client in the dashboard and scripts)."""
+    with time_query(query):
+        return query.execute()
+
+
+# ---------------------------------------------------------------------------
+# n8n / OpenAI
+# ---------------------------------------------------------------------------
+
+def webhook_target(path: str) -> str:
+    """Label for a webhook path: "/webhook/render-video-batch" -> "render-video-batch"."""
+    return path.rstrip("/").rsplit("/", 1)[-1] or path
+
+
+@contextmanager
+def time_webhook(path: str) -> Iterator[dict]:
+    with timed(N8N_WEBHOOK_SECONDS, target=webhook_target(path)) as result:
+        yield result
+
+
+@contextmanager
+def time_embedding(model: str, inputs: int = 1) -> Iterator[dict]:
+    EMBEDDING_INPUTS.labels(model=model).inc(inputs)
+    with timed(EMBEDDING_SECONDS, model=model) as result:
+        yield result
+
+
+def count_embedding_cache(model: str, hits: int, misses: int):
+    EMBEDDING_CACHE_LOOKUPS.labels(model=model, result="hit").inc(hits)
+    EMBEDDING_CACHE_LOOKUPS.labels(model=model, result="miss").inc(misses)
+
+
+@contextmanager
+def time_render() -> Iterator[dict]:
+    with timed(RENDER_SECONDS) as result:
+        yield result
+
+
+# ---------------------------------------------------------------------------
+# Queue depth and stage admission
+# ---------------------------------------------------------------------------
+
+def observe_queue_wait(stage: str, seconds: float):
+    STAGE_QUEUE_WAIT_SECONDS.labels(stage=stage).observe(seconds)
+
+
+def count_admission_rejected(stage: str):
+    ADMISSION_REJECTED.labels(stage=stage).inc()
+
+
+def set_queue_depth(status_counts: Dict[str, int], complete: bool = True):
+    """
+    Updates the per-status gauges. With complete=True statuses missing from
+    `status_counts` are dropped (they have no rows any more).
+    """
+    if complete:
+        QUEUE_DEPTH.clear()
+    for status, count in status_counts.items():
+        QUEUE_DEPTH.labels(status=status).set(count)
+
+
+# ---------------------------------------------------------------------------
+# Component stats() dicts
+# ---------------------------------------------------------------------------
+
+class StatsCollector:
+    """
+    Exposes the numeric values of registered stats() callables as gauges:
+    {"in_flight": 2} -> taxfix_<component>_in_flight 2, and one level of
+    nesting as a label: {"peak": {"render": 1}} -> taxfix_<component>_peak{key="render"} 1.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], dict]] = {}
+
+    def register(self, component: str, stats: Callable[[], dict]):
+        self._sources[component] = stats
+
+    def collect(self):
+        for component, source in list(self._sources.items()):
+            try:
+                values = source()
+            except Exception as e:
+                print(f"WARNING: stats for {component} failed: {e}")
+                continue
+            for key, value in values.items():
+                name = _NAME.sub("_", f"{NAMESPACE}_{component}_{key}")
+                if isinstance(value, bool) or value is None:
+                    continue
+                if isinstance(value, (int, float)):
+                    yield GaugeMetricFamily(name, f"{component} {key}", value=value)
+                elif isinstance(value, dict):
+                    family = GaugeMetricFamily(name, f"{component} {key}", labels=["key"])
+                    for label, v in value.items():
+                        if isinstance(v, (int, float)) and not isinstance(v, bool):
+                            family.add_metric([str(label)], v)
+                    yield family
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def register_stats(component: str, stats: Callable[[], dict]):
+    stats_collector.register(component, stats)
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware and exposition
+# ---------------------------------------------------------------------------
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware (does not buffer streaming responses) recording
+    taxfix_http_request_duration_seconds. The route label is the matched
+    path template ("/jobs/{job_id}"), "<unmatched>" otherwise, so label
+    cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            HTTP_REQUEST_SECONDS.labels(method=scope["method"], route=route,
+                                        status=str(status[0])).observe(time.perf_counter() - start)
+
+
+def render() -> Tuple[bytes, str]:
+    """(body, content type) of the text exposition format."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        # Component stats are per process: report this worker's
+        registry.register(stats_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+_server_lock = threading.Lock()
+_server_started = False
+
+
+def serve(port: Optional[int] = None) -> bool:
+    """
+    Starts a background scrape endpoint on `port` (default METRICS_PORT).
+    Safe to call repeatedly (Streamlit reruns the script); returns whether
+    an endpoint is running.
+    """
+    global _server_started
+    port = port or (int(METRICS_PORT) if METRICS_PORT else None)
+    if port is None:
+        return False
+    with _server_lock:
+        if not _server_started:
+            try:
+                start_http_server(port)
+                _server_started = True
+            except OSError as e:
+                print(f"WARNING: metrics endpoint on :{port} not started: {e}")
+        return _server_started
@@ -1,7 +1,24 @@
 import os
 import json
+import hashlib
+import itertools
+import sqlite3
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from openai import OpenAI
 from supabase import create_client, Client
+from postgrest.types import ReturnMethod
+
+try:
+    from dashboard import corpus, embedding_cache, metrics
+    from dashboard.embedding_format import decode_embedding, vector_literal
+except ImportError:  # run as a script from dashboard/
+    import corpus
+    import embedding_cache
+    import metrics
+    from embedding_format import decode_embedding, vector_literal
 
 # Initialize Clients
 # Uses local environment variables (assumes .env is loaded or vars are set)
@@ -9,12 +26,40 @@ SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
-if not all([SUPABASE_URL, SUPABASE_KEY, OPENAI_API_KEY]):
-    print("❌ Error: Missing Environment Variables (SUPABASE_URL, SUPABASE_KEY, OPENAI_API_KEY)")
-    exit(1)
+# Created lazily so the Admin API can import this module (seeding runs as a
+# background job there) without needing the keys at import time.
+_supabase: Optional[Client] = None
+_openai_client: Optional[OpenAI] = None
+_cache: Optional[embedding_cache.EmbeddingCache] = None
+
+
+class SeedCancelled(Exception):
+    pass
+
+
+def env_configured() -> bool:
+    return all([SUPABASE_URL, SUPABASE_KEY, OPENAI_API_KEY])
+
+
+def get_clients():
+    global _supabase, _openai_client
+    if _supabase is None:
+        if not env_configured():
+            raise RuntimeError("Missing Environment Variables (SUPABASE_URL, SUPABASE_KEY, OPENAI_API_KEY)")
+        _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        _openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    return _supabase, _openai_client
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+
+def get_cache() -> Optional[embedding_cache.EmbeddingCache]:
+    """The local embedding cache, or None when disabled or unavailable."""
+    global _cache
+    if _cache is None and embedding_cache.EMBEDDING_CACHE_PATH:
+        try:
+            _cache = embedding_cache.EmbeddingCache()
+        except (OSError, sqlite3.Error) as e:
+            print(f"WARNING: embedding cache {embedding_cache.EMBEDDING_CACHE_PATH} unavailable: {e}")
+    return _cache
 
 # ---------------------------------------------------------
 # german_tax_laws_seed.json
@@ -43,33 +88,305 @@ TAX_LAWS = [
     }
 ]
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Embeddings requests: at most this many texts (API limit 2048) and roughly
+# this many tokens (API limit 300k) each, EMBED_CONCURRENCY of them at a time
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "256"))
+EMBED_BATCH_TOKENS = int(os.environ.get("EMBED_BATCH_TOKENS", "100000"))
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "4"))
+# Rows per tax_laws upsert statement, ids per delete statement (they go in the URL)
+INSERT_CHUNK_SIZE = int(os.environ.get("INSERT_CHUNK_SIZE", "500"))
+DELETE_CHUNK_SIZE = int(os.environ.get("DELETE_CHUNK_SIZE", "200"))
+# Rows per page when reading the keys already in tax_laws
+FETCH_PAGE_SIZE = int(os.environ.get("FETCH_PAGE_SIZE", "1000"))
+
+# JSONL / Markdown / HTML law files or directories (comma-separated) seeded
+# after TAX_LAWS, see corpus.py
+KNOWLEDGE_CORPUS = [p for p in os.environ.get("KNOWLEDGE_CORPUS", "").split(",") if p]
+
+# Unique key of a tax_laws row (migration 014)
+CONFLICT_KEY = "content_hash,embedding_model"
+
+
+def estimate_tokens(text: str) -> int:
+    """Upper estimate for batching (German legal text runs ~3-4 characters per token)."""
+    return len(text) // 3 + 1
+
+
+def batches(laws: Iterable[dict], max_items: int = EMBED_BATCH_SIZE,
+            max_tokens: int = EMBED_BATCH_TOKENS) -> Iterator[List[dict]]:
+    """Groups laws into embeddings requests bounded by count and estimated tokens."""
+    batch, tokens = [], 0
+    for law in laws:
+        cost = estimate_tokens(law["content"])
+        if batch and (len(batch) >= max_items or tokens + cost > max_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(law)
+        tokens += cost
+    if batch:
+        yield batch
+
+
+def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """One embeddings request for all of `texts`, in input order."""
+    _, openai_client = get_clients()
+    with metrics.time_embedding(EMBEDDING_MODEL, inputs=len(texts)):
+        # base64: parsing a float list into the client's response models
+        # costs ~10ms per embedding
+        response = openai_client.embeddings.create(
+            input=texts,
+            model=EMBEDDING_MODEL,
+            encoding_format="base64"
+        )
+    return [decode_embedding(item.embedding) for item in sorted(response.data, key=lambda item: item.index)]
+
 def generate_embedding(text):
-    response = openai_client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    return response.data[0].embedding
-
-def seed_db():
-    print(f"📚 Seeding Knowledge Base with {len(TAX_LAWS)} laws...")
-    
-    # 1. Clear existing (Optional - for clean state)
-    # supabase.table("tax_laws").delete().neq("id", 0).execute() 
-    
-    for law in TAX_LAWS:
-        print(f"   🔹 Processing: {law['metadata']['topic']}...")
-        embedding = generate_embedding(law['content'])
-        
-        data = {
-            "content": law['content'],
-            "metadata": law['metadata'],
-            "embedding": embedding
-        }
-        
-        # Insert into Supabase
-        supabase.table("tax_laws").insert(data).execute()
-        
+    return generate_embeddings([text])[0]
+
+
+def law_row(law: dict, embedding: Optional[List[float]] = None) -> dict:
+    """tax_laws row for `law` (keyed by its content_hash); without `embedding` for metadata-only upserts."""
+    row = {"content": law["content"], "metadata": law["metadata"],
+           "content_hash": law["content_hash"], "embedding_model": EMBEDDING_MODEL}
+    if embedding is not None:
+        row["embedding"] = vector_literal(embedding)
+    return row
+
+
+def embed_batch(batch: List[dict]) -> Tuple[List[dict], int]:
+    """
+    tax_laws rows for `batch`, and how many of their embeddings came from
+    the local cache; the rest are requested in one call and cached.
+    """
+    cache = get_cache()
+    vectors: Dict[str, List[float]] = {}
+    if cache is not None:
+        # exact: these vectors go to tax_laws, a compact (float16 / int8) entry would degrade them
+        vectors = cache.get_many(EMBEDDING_MODEL, [law["content_hash"] for law in batch], exact=True)
+        metrics.count_embedding_cache(EMBEDDING_MODEL, hits=len(vectors), misses=len(batch) - len(vectors))
+    missing = [law for law in batch if law["content_hash"] not in vectors]
+    if missing:
+        fresh = dict(zip([law["content_hash"] for law in missing],
+                         generate_embeddings([law["content"] for law in missing])))
+        if cache is not None:
+            try:
+                cache.put_many(EMBEDDING_MODEL, fresh)
+            except sqlite3.Error as e:
+                print(f"WARNING: could not write the embedding cache: {e}")
+        vectors.update(fresh)
+    return [law_row(law, vectors[law["content_hash"]]) for law in batch], len(batch) - len(missing)
+
+
+def fetch_keys() -> Iterator[dict]:
+    """id, content_hash, embedding_model and metadata of every tax_laws row, a page at a time."""
+    supabase, _ = get_clients()
+    last_id = None
+    while True:
+        query = (supabase.table("tax_laws")
+                 .select("id,content_hash,embedding_model,metadata")
+                 .order("id")
+                 .limit(FETCH_PAGE_SIZE))
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = metrics.execute(query).data
+        yield from page
+        if len(page) < FETCH_PAGE_SIZE:
+            return
+        last_id = page[-1]["id"]
+
+
+def law_source(law: dict) -> Optional[str]:
+    """metadata.source of a law or tax_laws row (the corpus file it came from)."""
+    source = (law.get("metadata") or {}).get("source")
+    return source if isinstance(source, str) else None
+
+
+def metadata_digest(metadata: Optional[dict]) -> bytes:
+    return hashlib.blake2b(json.dumps(metadata, sort_keys=True).encode("utf-8"), digest_size=16).digest()
+
+
+class LawDiff:
+    """
+    What it takes to turn the existing tax_laws rows (see fetch_keys())
+    into a stream of laws, computed while the laws stream past. Only row
+    keys are held, never texts or embeddings.
+
+    new_laws(laws) yields the laws (with content_hash) whose text has no
+    row for EMBEDDING_MODEL yet. Along the way, rows of laws whose text is
+    unchanged but metadata is not collect in `changed` (the caller upserts
+    and clears them), and unchanged rows are counted. Once the stream is
+    consumed, stale() lists the ids of rows no law has any more (removed or
+    edited laws, other models, duplicates, rows from before migration 014).
+
+    Only rows from the sources the laws came from (metadata.source: a corpus
+    file name, none for TAX_LAWS) are stale, so seeding TAX_LAWS alone keeps
+    the rows of corpus files seeded earlier; stale(prune=True) lists every
+    row no law has.
+    """
+
+    def __init__(self, existing: Iterable[dict]):
+        self.rows: Dict[str, Tuple[Any, bytes, Optional[str]]] = {}
+        self._stale: List[Tuple[Any, Optional[str]]] = []
+        for row in existing:
+            key = row["content_hash"]
+            source = law_source(row)
+            if key and row["embedding_model"] == EMBEDDING_MODEL and key not in self.rows:
+                self.rows[key] = (row["id"], metadata_digest(row["metadata"]), source)
+            else:
+                self._stale.append((row["id"], source))
+        self.sources: Set[Optional[str]] = set()
+        self.seen: Set[str] = set()
+        self.changed: List[dict] = []
+        self.total = self.new = self.updated = self.unchanged = self.duplicates = 0
+
+    def new_laws(self, laws: Iterable[dict]) -> Iterator[dict]:
+        for law in laws:
+            self.total += 1
+            self.sources.add(law_source(law))
+            key = embedding_cache.content_hash(law["content"])
+            if key in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(key)
+            law = {**law, "content_hash": key}
+            row = self.rows.pop(key, None)
+            if row is None:
+                self.new += 1
+                yield law
+            elif row[1] != metadata_digest(law["metadata"]):
+                self.updated += 1
+                self.changed.append(law_row(law))
+            else:
+                self.unchanged += 1
+
+    def stale(self, prune: bool = False) -> List[Any]:
+        rows = self._stale + [(row_id, source) for row_id, _, source in self.rows.values()]
+        return [row_id for row_id, source in rows if prune or source in self.sources]
+
+
+def upsert_rows(rows: List[dict], chunk_size: int = INSERT_CHUNK_SIZE) -> int:
+    """Upserts `rows` into tax_laws on their content key, `chunk_size` rows per statement."""
+    supabase, _ = get_clients()
+    for i in range(0, len(rows), chunk_size):
+        metrics.execute(supabase.table("tax_laws").upsert(
+            rows[i:i + chunk_size], on_conflict=CONFLICT_KEY, returning=ReturnMethod.minimal))
+    return len(rows)
+
+
+def delete_rows(ids: List[Any], chunk_size: int = DELETE_CHUNK_SIZE) -> int:
+    supabase, _ = get_clients()
+    for i in range(0, len(ids), chunk_size):
+        metrics.execute(supabase.table("tax_laws").delete(returning=ReturnMethod.minimal)
+                        .in_("id", ids[i:i + chunk_size]))
+    return len(ids)
+
+
+def default_laws() -> Iterable[dict]:
+    """TAX_LAWS, followed by the chunks of the KNOWLEDGE_CORPUS files when set."""
+    if not KNOWLEDGE_CORPUS:
+        return TAX_LAWS
+    return itertools.chain(TAX_LAWS, corpus.iter_chunks(KNOWLEDGE_CORPUS))
+
+
+def seed_db(
+    on_progress: Optional[Callable[[int, int, int], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    laws: Optional[Iterable[dict]] = None,
+    prune: bool = False,
+) -> dict:
+    """
+    Brings tax_laws in line with `laws` (default: default_laws()), which
+    may be any iterable, e.g. corpus.iter_chunks() over the full law texts.
+    It is consumed once, lazily: memory stays flat however many laws it
+    yields.
+
+    Rows are keyed by content hash + EMBEDDING_MODEL (see LawDiff): only
+    laws without a row are embedded and upserted, metadata edits are
+    upserted without re-embedding, and rows of removed or edited laws are
+    deleted: only rows from the sources `laws` came from, unless `prune`,
+    which deletes every row not among `laws` (e.g. of a corpus file no
+    longer seeded). Embeddings come from the local cache (embedding_cache) when
+    the text was embedded before; the rest go to the API in batches (see
+    batches()), up to EMBED_CONCURRENCY requests at a time, and rows are
+    upserted INSERT_CHUNK_SIZE at a time while later batches are still
+    embedding. Re-running with unchanged laws reads the keys and writes
+    nothing.
+
+    on_progress(embedded, inserted, total) is called after every batch and
+    upsert (total: laws to insert found so far); setting cancel_event stops
+    the run between batches (raises SeedCancelled).
+    """
+    laws = default_laws() if laws is None else laws
+    get_clients()
+    print("📚 Seeding Knowledge Base...")
+    diff = LawDiff(fetch_keys())
+    embedded = cached = inserted = updated = 0
+    ready: List[dict] = []
+
+    def report():
+        if on_progress:
+            on_progress(embedded, inserted, diff.new)
+        if cancel_event is not None and cancel_event.is_set():
+            raise SeedCancelled(f"Cancelled after {inserted}/{diff.new} laws")
+
+    def collect(done):
+        nonlocal embedded, cached, inserted
+        for future in done:
+            rows, from_cache = future.result()
+            embedded += len(rows)
+            cached += from_cache
+            ready.extend(rows)
+        report()
+        while len(ready) >= INSERT_CHUNK_SIZE:
+            inserted += upsert_rows(ready[:INSERT_CHUNK_SIZE])
+            del ready[:INSERT_CHUNK_SIZE]
+            report()
+
+    report()
+    with ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY, thread_name_prefix="embed") as pool:
+        pending = set()
+        try:
+            for batch in batches(diff.new_laws(laws)):
+                if len(pending) >= EMBED_CONCURRENCY:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                if len(diff.changed) >= INSERT_CHUNK_SIZE:
+                    updated += upsert_rows(diff.changed)
+                    diff.changed.clear()
+                print(f"   🔹 Embedding {len(batch)} laws ({embedded + len(ready)}/{diff.new} done)...")
+                pending.add(pool.submit(embed_batch, batch))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    if ready:
+        inserted += upsert_rows(ready)
+        report()
+    updated += upsert_rows(diff.changed)
+    diff.changed.clear()
+
+    # Last, so searches keep finding the old version of an edited law until the new one is in
+    stale = diff.stale(prune)
+    print(f"   🔹 {diff.unchanged} unchanged, {inserted} new, {updated} with new metadata, {len(stale)} to delete")
+    deleted = delete_rows(stale)
+
     print("✅ Seed Complete! Knowledge Base is now active.")
+    return {"total": diff.total, "unchanged": diff.unchanged, "duplicates": diff.duplicates,
+            "embedded": embedded - cached, "cached": cached, "inserted": inserted, "updated": updated,
+            "deleted": deleted}
 
 if __name__ == "__main__":
-    seed_db()
+    if not env_configured():
+        print("❌ Error: Missing Environment Variables (SUPABASE_URL, SUPABASE_KEY, OPENAI_API_KEY)")
+        exit(1)
+    metrics.serve()  # scrape endpoint while seeding, if METRICS_PORT is set
+    # Corpus files or directories on the command line replace KNOWLEDGE_CORPUS;
+    # --prune also deletes the rows of sources not seeded by this run
+    paths = [arg for arg in sys.argv[1:] if arg != "--prune"]
+    seed_db(laws=itertools.chain(TAX_LAWS, corpus.iter_chunks(paths)) if paths else None,
+            prune="--prune" in sys.argv[1:])
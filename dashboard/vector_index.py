@@ -0,0 +1,383 @@
+"""
+In-process vector index over tax_laws: match_tax_laws without the round
+trip to PostgREST.
+
+The embeddings live in one contiguous float32 matrix (a row per tax_laws
+row, freed rows are reused), searched with a single matrix-vector product
+and a partial sort. With VECTOR_INDEX_ANN=hnsw (needs hnswlib) an HNSW
+graph over the same rows proposes the candidates instead of the full scan.
+
+search() follows match_tax_laws (migration 003): similarity is cosine
+similarity (1 - pgvector's <=> distance), only rows with similarity >
+match_threshold are returned, best first, at most match_count of them,
+and rows without an embedding (or with a zero vector) never match. The
+candidates are re-scored in float64 before the threshold is applied, so
+results agree with Postgres to ~1e-7.
+
+With EMBEDDING_STORAGE=float16 or int8 (see quantization) the matrix
+holds compact codes instead: half or a quarter of the memory. The scan
+then keeps VECTOR_INDEX_OVERSAMPLE x match_count candidates, and those
+are re-ranked exactly against float32 copies of the embeddings, kept in a
+file under VECTOR_INDEX_RERANK_DIR (memory-mapped: only the candidates'
+pages are read). Results are then the same as with float32 storage
+whenever the true top match_count are among the candidates. An empty
+VECTOR_INDEX_RERANK_DIR skips the copies: similarities are then computed
+from the codes (off by ~1e-3 for int8). With VECTOR_INDEX_ANN=hnsw the
+graph keeps its own float32 copy of every row, so compact storage saves
+less there.
+
+sync() keeps the index current by id: rows above the highest id loaded are
+fetched, and when the table's row count no longer matches, the id lists
+are compared to drop deleted rows and load missed ones. Rows that change
+in place (metadata-only upserts) are picked up by reload().
+"""
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from postgrest.types import CountMethod
+
+try:
+    import hnswlib
+except ImportError:  # exact search only
+    hnswlib = None
+
+try:
+    from dashboard import quantization
+except ImportError:  # run as a script from dashboard/
+    import quantization
+
+EMBEDDING_DIM = int(os.environ.get("EMBEDDING_DIM", "1536"))
+# "exact": full scan, "hnsw": candidates from an hnswlib graph
+VECTOR_INDEX_ANN = os.environ.get("VECTOR_INDEX_ANN", "exact")
+HNSW_M = int(os.environ.get("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", "200"))
+# Candidates the graph search keeps (at least match_count); higher: better recall, slower
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", "100"))
+# Candidates per result re-ranked in float32 when the matrix holds float16 / int8 codes
+VECTOR_INDEX_OVERSAMPLE = int(os.environ.get("VECTOR_INDEX_OVERSAMPLE", "4"))
+# Where the float32 copies for re-ranking go ("": no copies, scores from the codes)
+VECTOR_INDEX_RERANK_DIR = os.environ.get("VECTOR_INDEX_RERANK_DIR", tempfile.gettempdir())
+# Rows per block when scanning float16 / int8 codes (converted to float32 a block at a time)
+SCAN_BLOCK_ROWS = 1024
+# Rows per page when loading (a 1536-d embedding is ~20 KB of JSON)
+SYNC_PAGE_SIZE = int(os.environ.get("VECTOR_INDEX_PAGE_SIZE", "500"))
+ID_PAGE_SIZE = 10000
+FETCH_IDS_CHUNK = 200  # ids per in.(...) filter (they go in the URL)
+
+# Scan scores within this of the threshold are re-scored before being dropped
+_SLACK = {"float32": 1e-4, "float16": 1e-3, "int8": 2e-2}
+
+
+def parse_vector(value: Any, dim: int = EMBEDDING_DIM) -> Optional[np.ndarray]:
+    """An embedding as PostgREST returns it ("[0.1,...]") or as a list / array; None stays None."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        vector = np.fromstring(value.strip()[1:-1], sep=",", dtype=np.float32)
+    else:
+        vector = np.asarray(value, dtype=np.float32)
+    if vector.shape != (dim,):
+        raise ValueError(f"Expected a {dim}-dimensional embedding, got shape {vector.shape}")
+    return vector
+
+
+def _rerank_file(capacity: int, dim: int, directory: str) -> np.memmap:
+    """An unlinked, memory-mapped (capacity, dim) float32 matrix on disk."""
+    return np.memmap(tempfile.TemporaryFile(dir=directory), dtype=np.float32, mode="w+",
+                     shape=(capacity, dim))
+
+
+class VectorIndex:
+    def __init__(self, dim: int = EMBEDDING_DIM, ann: str = VECTOR_INDEX_ANN, capacity: int = 1024,
+                 storage: str = quantization.EMBEDDING_STORAGE, rerank_dir: str = VECTOR_INDEX_RERANK_DIR):
+        if ann == "hnsw" and hnswlib is None:
+            print("WARNING: VECTOR_INDEX_ANN=hnsw but hnswlib is not installed, using exact search")
+            ann = "exact"
+        if ann not in ("exact", "hnsw"):
+            raise ValueError(f"Unknown VECTOR_INDEX_ANN {ann!r} (exact or hnsw)")
+        self.dim = dim
+        self.ann = ann
+        self.storage = quantization.check_storage(storage)
+        self.rerank_dir = rerank_dir
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((capacity, dim), dtype=quantization.code_dtype(storage))
+        # similarity = (codes . unit query) * factor: 1 / norm, times the int8 scale; 0 never matches
+        self._factors = np.zeros(capacity, dtype=np.float32)
+        self._scales = np.ones(capacity, dtype=np.float32)
+        # float32 copies to re-rank against: the matrix itself, a file, or None (compact, no copies)
+        if storage == "float32":
+            self._full = self._vectors
+        else:
+            self._full = _rerank_file(capacity, dim, rerank_dir) if rerank_dir else None
+        self._live = np.zeros(capacity, dtype=bool)  # slot holds a searchable row
+        self._ids: List[Any] = [None] * capacity
+        self._docs: List[Optional[tuple]] = [None] * capacity  # (content, metadata)
+        self._slots: Dict[Any, int] = {}
+        self._free: List[int] = []
+        self._used = 0  # slots [0, _used) have been handed out
+        self._graph = None
+        self._in_graph = np.zeros(capacity, dtype=bool)
+        self.max_id: Any = None
+        self.synced_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, row_id: Any) -> bool:
+        return row_id in self._slots
+
+    # -----------------------------------------------------------------
+    # Writes
+    # -----------------------------------------------------------------
+
+    def _grow(self, needed: int):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        extra = capacity - len(self._ids)
+        self._vectors = np.concatenate([self._vectors, np.zeros((extra, self.dim), dtype=self._vectors.dtype)])
+        self._factors = np.concatenate([self._factors, np.zeros(extra, dtype=np.float32)])
+        self._scales = np.concatenate([self._scales, np.ones(extra, dtype=np.float32)])
+        if self.storage == "float32":
+            self._full = self._vectors
+        elif self._full is not None:
+            full = _rerank_file(capacity, self.dim, self.rerank_dir)
+            full[:self._used] = self._full[:self._used]
+            self._full = full
+        self._live = np.concatenate([self._live, np.zeros(extra, dtype=bool)])
+        self._in_graph = np.concatenate([self._in_graph, np.zeros(extra, dtype=bool)])
+        self._ids.extend([None] * extra)
+        self._docs.extend([None] * extra)
+        if self._graph is not None:
+            self._graph.resize_index(capacity)
+
+    def _ensure_graph(self):
+        if self.ann != "hnsw" or self._graph is not None:
+            return
+        self._graph = hnswlib.Index(space="cosine", dim=self.dim)
+        self._graph.init_index(max_elements=len(self._ids), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        live = np.flatnonzero(self._live[:self._used])
+        if len(live):
+            self._graph.add_items(self._float32(live), live)
+            self._in_graph[live] = True
+
+    def _float32(self, slots: np.ndarray) -> np.ndarray:
+        """The rows' embeddings: the float32 copies, or decoded from the codes without them."""
+        if self._full is not None:
+            return np.asarray(self._full[slots])
+        return quantization.dequantize(self._vectors[slots], self._scales[slots])
+
+    def add(self, ids: Sequence[Any], vectors: np.ndarray, contents: Optional[Sequence[str]] = None,
+            metadatas: Optional[Sequence[Any]] = None, live: Optional[np.ndarray] = None):
+        """
+        Inserts or replaces rows by id. `vectors` is (n, dim); rows flagged
+        False in `live` (no embedding) are tracked but never match.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        norms = np.linalg.norm(vectors, axis=1)
+        live = (norms > 0) if live is None else (np.asarray(live, dtype=bool) & (norms > 0))
+        with self._lock:
+            new = sum(1 for row_id in ids if row_id not in self._slots)
+            self._grow(self._used + max(0, new - len(self._free)))
+            self._ensure_graph()
+            slots = np.empty(len(ids), dtype=np.int64)
+            for i, row_id in enumerate(ids):
+                slot = self._slots.get(row_id)
+                if slot is None:
+                    slot = self._free.pop() if self._free else self._used
+                    if slot == self._used:
+                        self._used += 1
+                    self._slots[row_id] = slot
+                    self._ids[slot] = row_id
+                    if self.max_id is None or row_id > self.max_id:
+                        self.max_id = row_id
+                slots[i] = slot
+                self._docs[slot] = (contents[i] if contents is not None else None,
+                                    metadatas[i] if metadatas is not None else None)
+            codes, scales = quantization.quantize(vectors, self.storage)
+            self._vectors[slots] = codes
+            self._scales[slots] = scales
+            if self._full is not None and self._full is not self._vectors:
+                self._full[slots] = vectors
+            self._factors[slots] = np.where(live, scales / np.where(norms > 0, norms, 1), 0)
+            self._live[slots] = live
+            if self._graph is not None:
+                gone = slots[~live & self._in_graph[slots]]
+                for slot in gone:
+                    self._graph.mark_deleted(int(slot))
+                self._in_graph[gone] = False
+                if live.any():
+                    self._graph.add_items(vectors[live], slots[live])
+                    self._in_graph[slots[live]] = True
+
+    def upsert(self, rows: Iterable[dict]):
+        """Inserts or replaces tax_laws rows ({"id", "content", "metadata", "embedding"})."""
+        rows = list(rows)
+        if not rows:
+            return
+        vectors = np.zeros((len(rows), self.dim), dtype=np.float32)
+        live = np.zeros(len(rows), dtype=bool)
+        for i, row in enumerate(rows):
+            vector = parse_vector(row.get("embedding"), self.dim)
+            if vector is not None:
+                vectors[i] = vector
+                live[i] = True
+        self.add([r["id"] for r in rows], vectors, [r.get("content") for r in rows],
+                 [r.get("metadata") for r in rows], live)
+
+    def remove(self, ids: Iterable[Any]) -> int:
+        removed = 0
+        with self._lock:
+            for row_id in ids:
+                slot = self._slots.pop(row_id, None)
+                if slot is None:
+                    continue
+                if self._in_graph[slot]:
+                    self._graph.mark_deleted(slot)
+                    self._in_graph[slot] = False
+                self._live[slot] = False
+                self._factors[slot] = 0
+                self._ids[slot] = self._docs[slot] = None
+                self._free.append(slot)
+                removed += 1
+        return removed
+
+    # -----------------------------------------------------------------
+    # Search
+    # -----------------------------------------------------------------
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate cosine similarity of every slot in use (float32)."""
+        n = self._used
+        if self.storage == "float32":
+            scores = self._vectors[:n] @ query
+        else:
+            # One matrix-vector product per block: the float32 copy of a block stays in cache
+            scores = np.empty(n, dtype=np.float32)
+            for start in range(0, n, SCAN_BLOCK_ROWS):
+                stop = min(n, start + SCAN_BLOCK_ROWS)
+                np.matmul(self._vectors[start:stop].astype(np.float32), query, out=scores[start:stop])
+        scores *= self._factors[:n]
+        scores[~self._live[:n]] = -np.inf
+        return scores
+
+    def _candidates(self, query: np.ndarray, k: int, threshold: float) -> np.ndarray:
+        """Slots of (up to) the k best rows, by approximate score."""
+        if self._graph is not None:
+            self._graph.set_ef(max(HNSW_EF_SEARCH, k))
+            labels, _ = self._graph.knn_query(query, k=min(k, int(self._live.sum())))
+            return labels[0].astype(np.int64)
+        n = self._used
+        scores = self._scores(query)
+        if k < n:
+            candidates = np.argpartition(scores, n - k)[n - k:]
+        else:
+            candidates = np.arange(n)
+        return candidates[scores[candidates] > threshold - _SLACK[self.storage]]
+
+    def search(self, query_embedding: Any, match_threshold: float, match_count: int) -> List[dict]:
+        """match_tax_laws(query_embedding, match_threshold, match_count), in process."""
+        query = parse_vector(query_embedding, self.dim).astype(np.float64)
+        query_norm = float(np.linalg.norm(query))
+        if query_norm == 0 or match_count <= 0:
+            return []
+        with self._lock:
+            if not self._live.any():
+                return []
+            k = match_count if self.storage == "float32" else match_count * VECTOR_INDEX_OVERSAMPLE
+            candidates = self._candidates((query / query_norm).astype(np.float32), k, match_threshold)
+            if not len(candidates):
+                return []
+            candidates = np.sort(candidates)  # in file order for the re-rank reads
+            # Same arithmetic as pgvector: float32 components, double accumulation
+            vectors = self._float32(candidates).astype(np.float64)
+            similarity = (vectors @ query) / (np.linalg.norm(vectors, axis=1) * query_norm)
+            keep = similarity > match_threshold
+            candidates, similarity = candidates[keep], similarity[keep]
+            order = np.argsort(-similarity, kind="stable")[:match_count]
+            results = []
+            for slot, score in zip(candidates[order], similarity[order]):
+                content, metadata = self._docs[slot]
+                results.append({"id": self._ids[slot], "content": content, "metadata": metadata,
+                                "similarity": float(score)})
+            return results
+
+    # -----------------------------------------------------------------
+    # Sync with tax_laws
+    # -----------------------------------------------------------------
+
+    def sync(self, client) -> dict:
+        """
+        Loads tax_laws rows with an id above max_id. When the table's row
+        count then differs from ours, compares ids: drops rows that were
+        deleted and loads rows that were missed. `client` is a supabase Client.
+        """
+        t0 = time.perf_counter()
+        added = 0
+        while True:
+            query = (client.table("tax_laws")
+                     .select("id,content,metadata,embedding")
+                     .order("id")
+                     .limit(SYNC_PAGE_SIZE))
+            if self.max_id is not None:
+                query = query.gt("id", self.max_id)
+            page = query.execute().data
+            self.upsert(page)
+            added += len(page)
+            if len(page) < SYNC_PAGE_SIZE:
+                break
+        removed = 0
+        count = client.table("tax_laws").select("id", count=CountMethod.exact).limit(1).execute().count
+        if count is not None and count != len(self):
+            current = set()
+            last_id = None
+            while True:
+                query = client.table("tax_laws").select("id").order("id").limit(ID_PAGE_SIZE)
+                if last_id is not None:
+                    query = query.gt("id", last_id)
+                page = query.execute().data
+                current.update(r["id"] for r in page)
+                if len(page) < ID_PAGE_SIZE:
+                    break
+                last_id = page[-1]["id"]
+            removed = self.remove([row_id for row_id in list(self._slots) if row_id not in current])
+            # Below max_id but not loaded (committed after a higher id was synced)
+            missing = [row_id for row_id in current if row_id not in self._slots]
+            for i in range(0, len(missing), FETCH_IDS_CHUNK):
+                page = (client.table("tax_laws")
+                        .select("id,content,metadata,embedding")
+                        .in_("id", missing[i:i + FETCH_IDS_CHUNK])
+                        .execute().data)
+                self.upsert(page)
+                added += len(page)
+        self.synced_at = time.time()
+        return {"added": added, "removed": removed, "rows": len(self),
+                "seconds": round(time.perf_counter() - t0, 3)}
+
+    def reload(self, client) -> dict:
+        """Rebuilds the index from scratch (picks up rows changed in place)."""
+        fresh = VectorIndex(self.dim, self.ann, storage=self.storage, rerank_dir=self.rerank_dir)
+        result = fresh.sync(client)
+        with self._lock:
+            self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k != "_lock"})
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows": len(self),
+                "searchable": int(self._live.sum()),
+                "capacity": len(self._ids),
+                "ann": self.ann,
+                "storage": self.storage,
+                "matrix_bytes": int(self._vectors.nbytes + self._factors.nbytes + self._scales.nbytes),
+                "rerank_file_bytes": 0 if self._full is None or self._full is self._vectors else int(self._full.nbytes),
+                "max_id": self.max_id,
+                "synced_at": self.synced_at,
+            }
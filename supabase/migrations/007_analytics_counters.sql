@@ -0,0 +1,141 @@
+-- ============================================================================
+-- TAXFIX MIGRATION 007 - SERVER-SIDE ANALYTICS
+-- Purpose: Serve /analytics from the database instead of scanning every
+--          content_queue row in the API process.
+-- Strategy:
+--   * Status / platform totals are kept as incrementally maintained counters
+--     (statement-level triggers, so bulk inserts/updates cost one upsert).
+--   * The daily series only reads the last N days via idx_content_queue_created_at.
+--   => Payload size and latency stay constant as content_queue grows.
+-- ============================================================================
+
+-- 1. Counter table (one row per status / platform value)
+CREATE TABLE IF NOT EXISTS content_queue_counters (
+  dimension TEXT NOT NULL, -- 'status' | 'platform'
+  key TEXT NOT NULL,
+  count BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (dimension, key)
+);
+
+-- 2. Trigger function: applies the net delta of one statement.
+--    Concurrent writers lock the same few counter rows. Every upsert takes
+--    them in (dimension, key) order, so two statements touching overlapping
+--    keys wait for each other instead of deadlocking.
+CREATE OR REPLACE FUNCTION content_queue_apply_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO content_queue_counters (dimension, key, count)
+    SELECT dimension, key, SUM(delta) FROM (
+      SELECT 'status' AS dimension, COALESCE(status, 'PENDING') AS key, 1 AS delta FROM new_rows
+      UNION ALL
+      SELECT 'platform', COALESCE(platform, 'Unknown'), 1 FROM new_rows
+    ) d
+    GROUP BY dimension, key
+    ORDER BY dimension, key
+    ON CONFLICT (dimension, key) DO UPDATE SET count = content_queue_counters.count + EXCLUDED.count;
+
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO content_queue_counters (dimension, key, count)
+    SELECT dimension, key, SUM(delta) FROM (
+      SELECT 'status' AS dimension, COALESCE(status, 'PENDING') AS key, -1 AS delta FROM old_rows
+      UNION ALL
+      SELECT 'platform', COALESCE(platform, 'Unknown'), -1 FROM old_rows
+    ) d
+    GROUP BY dimension, key
+    ORDER BY dimension, key
+    ON CONFLICT (dimension, key) DO UPDATE SET count = content_queue_counters.count + EXCLUDED.count;
+
+  ELSIF TG_OP = 'UPDATE' THEN
+    -- Only status / platform changes produce a non-zero delta
+    INSERT INTO content_queue_counters (dimension, key, count)
+    SELECT dimension, key, SUM(delta) FROM (
+      SELECT 'status' AS dimension, COALESCE(status, 'PENDING') AS key, 1 AS delta FROM new_rows
+      UNION ALL
+      SELECT 'platform', COALESCE(platform, 'Unknown'), 1 FROM new_rows
+      UNION ALL
+      SELECT 'status', COALESCE(status, 'PENDING'), -1 FROM old_rows
+      UNION ALL
+      SELECT 'platform', COALESCE(platform, 'Unknown'), -1 FROM old_rows
+    ) d
+    GROUP BY dimension, key
+    HAVING SUM(delta) <> 0
+    ORDER BY dimension, key
+    ON CONFLICT (dimension, key) DO UPDATE SET count = content_queue_counters.count + EXCLUDED.count;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS content_queue_counts_insert ON content_queue;
+CREATE TRIGGER content_queue_counts_insert
+  AFTER INSERT ON content_queue
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION content_queue_apply_counts();
+
+DROP TRIGGER IF EXISTS content_queue_counts_update ON content_queue;
+CREATE TRIGGER content_queue_counts_update
+  AFTER UPDATE ON content_queue
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION content_queue_apply_counts();
+
+DROP TRIGGER IF EXISTS content_queue_counts_delete ON content_queue;
+CREATE TRIGGER content_queue_counts_delete
+  AFTER DELETE ON content_queue
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION content_queue_apply_counts();
+
+-- 3. Backfill from the current table contents
+TRUNCATE content_queue_counters;
+INSERT INTO content_queue_counters (dimension, key, count)
+SELECT 'status', COALESCE(status, 'PENDING'), COUNT(*) FROM content_queue GROUP BY 2
+UNION ALL
+SELECT 'platform', COALESCE(platform, 'Unknown'), COUNT(*) FROM content_queue GROUP BY 2;
+
+-- 4. Analytics RPC (called by the Admin API as supabase.rpc('content_queue_stats'))
+-- Returns:
+-- {
+--   "total": 123,
+--   "status_counts": {"PENDING_REVIEW": 10, ...},
+--   "platform_counts": {"TikTok": 50, ...},
+--   "daily": [{"date": "2024-05-01", "total": 7, "platforms": {"TikTok": 4, ...}}, ...]  -- oldest first, zero-padded
+-- }
+CREATE OR REPLACE FUNCTION content_queue_stats(days INT DEFAULT 7)
+RETURNS JSONB AS $$
+  SELECT jsonb_build_object(
+    'total', COALESCE((
+      SELECT SUM(count) FROM content_queue_counters WHERE dimension = 'status'
+    ), 0),
+    'status_counts', COALESCE((
+      SELECT jsonb_object_agg(key, count) FROM content_queue_counters
+      WHERE dimension = 'status' AND count > 0
+    ), '{}'::jsonb),
+    'platform_counts', COALESCE((
+      SELECT jsonb_object_agg(key, count) FROM content_queue_counters
+      WHERE dimension = 'platform' AND count > 0
+    ), '{}'::jsonb),
+    'daily', (
+      SELECT jsonb_agg(
+        jsonb_build_object(
+          'date', d.day::date,
+          'total', COALESCE(t.total, 0),
+          'platforms', COALESCE(t.platforms, '{}'::jsonb)
+        ) ORDER BY d.day
+      )
+      FROM generate_series(current_date - (days - 1), current_date, interval '1 day') AS d(day)
+      LEFT JOIN (
+        SELECT day, SUM(n)::BIGINT AS total, jsonb_object_agg(platform, n) AS platforms
+        FROM (
+          SELECT DATE(created_at) AS day, COALESCE(platform, 'Unknown') AS platform, COUNT(*) AS n
+          FROM content_queue
+          WHERE created_at >= current_date - (days - 1)
+          GROUP BY 1, 2
+        ) g
+        GROUP BY day
+      ) t ON t.day = d.day::date
+    )
+  );
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON TABLE content_queue_counters IS
+  'Incrementally maintained status/platform totals for content_queue (see content_queue_apply_counts)';
@@ -0,0 +1,13 @@
+-- ============================================================================
+-- TAXFIX MIGRATION 008 - KEYSET PAGINATION
+-- Purpose: Index the (created_at, id) order used by /active-queue and /news
+--          so every page is an index range scan, however deep the cursor.
+-- ============================================================================
+
+-- /active-queue: ORDER BY created_at DESC, id DESC with a (created_at, id) cursor
+CREATE INDEX IF NOT EXISTS idx_content_queue_created_at_id
+  ON content_queue(created_at DESC, id DESC);
+
+-- /news (and status-filtered lists): WHERE status = ? ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_content_queue_status_created_at_id
+  ON content_queue(status, created_at DESC, id DESC);
@@ -0,0 +1,9 @@
+-- ============================================================================
+-- TAXFIX MIGRATION 009 - CHANGE FEED
+-- Purpose: The Admin API's queue change feed polls
+--          "WHERE updated_at >= <watermark> ORDER BY updated_at" every few
+--          seconds (one query for all connected reviewers). Index it.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_content_queue_updated_at
+  ON content_queue(updated_at);
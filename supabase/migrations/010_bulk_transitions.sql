@@ -0,0 +1,66 @@
+-- ============================================================================
+-- TAXFIX MIGRATION 010 - BULK STATUS TRANSITIONS
+-- Purpose: Approve / publish / review many content_queue rows at once.
+-- Strategy:
+--   * One statement locks the requested rows, updates the ones whose current
+--     status is allowed, and writes one audit_logs row per updated job
+--     (data-modifying CTEs), instead of select + update + insert per item.
+--   * Every requested id that exists is returned, with `updated` telling the
+--     caller which rows were skipped (status not allowed) for partial-failure
+--     reporting. Ids that are missing are simply absent from the result.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION content_queue_bulk_transition(
+  job_ids UUID[],
+  to_status TEXT DEFAULT NULL,        -- NULL keeps the current status
+  platforms TEXT[] DEFAULT NULL,      -- NULL keeps target_platforms
+  from_statuses TEXT[] DEFAULT NULL,  -- NULL allows any current status
+  actor TEXT DEFAULT 'admin_api',
+  audit_note TEXT DEFAULT NULL,
+  mark_reviewed BOOLEAN DEFAULT FALSE -- also set reviewed_by / reviewed_at / review_notes
+)
+RETURNS TABLE (
+  id UUID,
+  old_status TEXT,
+  updated BOOLEAN,
+  status TEXT,
+  topic TEXT,
+  platform TEXT,
+  target_platforms TEXT[],
+  updated_at TIMESTAMPTZ
+)
+LANGUAGE sql
+AS $$
+  WITH current_rows AS (
+    SELECT q.id, q.status
+    FROM content_queue q
+    WHERE q.id = ANY(job_ids)
+    FOR UPDATE
+  ),
+  changed AS (
+    UPDATE content_queue q
+    SET status = COALESCE(to_status, q.status),
+        target_platforms = COALESCE(platforms, q.target_platforms),
+        reviewed_by = CASE WHEN mark_reviewed THEN actor ELSE q.reviewed_by END,
+        reviewed_at = CASE WHEN mark_reviewed THEN now() ELSE q.reviewed_at END,
+        review_notes = CASE WHEN mark_reviewed AND audit_note IS NOT NULL THEN audit_note ELSE q.review_notes END
+    FROM current_rows c
+    WHERE q.id = c.id
+      AND (from_statuses IS NULL OR c.status = ANY(from_statuses))
+    RETURNING q.id, c.status AS old_status, q.status, q.topic, q.platform, q.target_platforms, q.updated_at
+  ),
+  audited AS (
+    INSERT INTO audit_logs (asset_id, old_status, new_status, changed_by, note, metadata)
+    SELECT ch.id, ch.old_status, ch.status, actor,
+           COALESCE(audit_note, 'Status changed from ' || COALESCE(ch.old_status, 'UNKNOWN') || ' to ' || ch.status),
+           jsonb_build_object('bulk', cardinality(job_ids) > 1, 'target_platforms', ch.target_platforms)
+    FROM changed ch
+  )
+  SELECT c.id, c.status, ch.id IS NOT NULL,
+         COALESCE(ch.status, c.status), ch.topic, ch.platform, ch.target_platforms, ch.updated_at
+  FROM current_rows c
+  LEFT JOIN changed ch ON ch.id = c.id;
+$$;
+
+COMMENT ON FUNCTION content_queue_bulk_transition IS
+  'Bulk status/platform change with one audit_logs row per updated job (Admin API bulk endpoints, dashboard reviews).';
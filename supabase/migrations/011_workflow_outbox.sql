@@ -0,0 +1,202 @@
+-- ============================================================================
+-- TAXFIX MIGRATION 011 - WORKFLOW TRIGGER OUTBOX
+-- Purpose: n8n webhook calls used to be made right after the content_queue
+--          write; if the call failed the job stayed in PENDING_GENERATION /
+--          PENDING_RENDER forever with no record of why.
+-- Strategy:
+--   * Writers set content_queue.workflow_trigger in the same INSERT/UPDATE as
+--     the status change. A row trigger copies it into workflow_outbox, so the
+--     job write and the trigger request commit (or roll back) together.
+--   * The Admin API dispatcher claims due outbox rows per target
+--     (FOR UPDATE SKIP LOCKED + lease, safe with several API workers), sends
+--     them as one batched webhook, and reports the outcome.
+--   * Failures are retried with exponential backoff. Every failed attempt is
+--     written to content_queue.retry_count / error_log; after the last
+--     attempt the job is set to ERROR.
+-- ============================================================================
+
+-- 1. Outbox table
+CREATE TABLE IF NOT EXISTS workflow_outbox (
+  id BIGSERIAL PRIMARY KEY,
+  job_id UUID REFERENCES content_queue(id) ON DELETE CASCADE,
+  target TEXT NOT NULL,                      -- 'generate' | 'render' | 'publish'
+  payload JSONB NOT NULL DEFAULT '{}'::jsonb, -- one item of the batched webhook body
+  status TEXT NOT NULL DEFAULT 'PENDING',    -- PENDING | IN_FLIGHT | DELIVERED | FAILED
+  attempts INT NOT NULL DEFAULT 0,
+  next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  locked_until TIMESTAMPTZ,
+  last_error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  delivered_at TIMESTAMPTZ
+);
+
+-- Only undelivered rows are ever scanned by the dispatcher
+CREATE INDEX IF NOT EXISTS idx_workflow_outbox_due
+  ON workflow_outbox(target, next_attempt_at)
+  WHERE status IN ('PENDING', 'IN_FLIGHT');
+CREATE INDEX IF NOT EXISTS idx_workflow_outbox_job_id
+  ON workflow_outbox(job_id);
+
+-- 2. Trigger request column on content_queue
+--    {"target": "render", "payload": {...}, "request_id": "<uuid>"}; a new
+--    request_id (or value) enqueues again, rewriting the same value does not.
+ALTER TABLE content_queue
+  ADD COLUMN IF NOT EXISTS workflow_trigger JSONB;
+
+COMMENT ON COLUMN content_queue.workflow_trigger IS
+  'Last workflow trigger requested for this job; copied into workflow_outbox by content_queue_enqueue_trigger';
+
+CREATE OR REPLACE FUNCTION content_queue_enqueue_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.workflow_trigger IS NOT NULL
+     AND (TG_OP = 'INSERT' OR NEW.workflow_trigger IS DISTINCT FROM OLD.workflow_trigger) THEN
+    INSERT INTO workflow_outbox (job_id, target, payload)
+    VALUES (
+      NEW.id,
+      NEW.workflow_trigger->>'target',
+      COALESCE(NEW.workflow_trigger->'payload', '{}'::jsonb) || jsonb_build_object('id', NEW.id)
+    );
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- AFTER, so ON CONFLICT DO NOTHING inserts that were skipped enqueue nothing
+DROP TRIGGER IF EXISTS content_queue_enqueue_trigger ON content_queue;
+CREATE TRIGGER content_queue_enqueue_trigger
+  AFTER INSERT OR UPDATE OF workflow_trigger ON content_queue
+  FOR EACH ROW
+  EXECUTE FUNCTION content_queue_enqueue_trigger();
+
+-- 3. Dispatcher RPCs
+CREATE OR REPLACE FUNCTION workflow_outbox_claim(
+  claim_target TEXT,
+  max_rows INT DEFAULT 50,
+  lease_seconds INT DEFAULT 120
+)
+RETURNS SETOF workflow_outbox
+LANGUAGE sql
+AS $$
+  UPDATE workflow_outbox o
+  SET status = 'IN_FLIGHT',
+      attempts = o.attempts + 1,
+      locked_until = now() + make_interval(secs => lease_seconds)
+  WHERE o.id IN (
+    SELECT w.id
+    FROM workflow_outbox w
+    WHERE w.target = claim_target
+      AND ((w.status = 'PENDING' AND w.next_attempt_at <= now())
+           OR (w.status = 'IN_FLIGHT' AND w.locked_until < now()))  -- dispatcher died mid-call
+    ORDER BY w.next_attempt_at, w.id
+    LIMIT max_rows
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING o.*;
+$$;
+
+-- Marks claimed rows delivered (error NULL) or schedules a retry
+-- (base * 2^(attempt-1), capped, with jitter). Returns the content_queue rows
+-- it changed.
+CREATE OR REPLACE FUNCTION workflow_outbox_complete(
+  outbox_ids BIGINT[],
+  error TEXT DEFAULT NULL,
+  max_attempts INT DEFAULT 4,
+  backoff_base_seconds FLOAT DEFAULT 2,
+  backoff_max_seconds FLOAT DEFAULT 300
+)
+RETURNS TABLE (
+  id UUID,
+  status TEXT,
+  retry_count INT,
+  error_log TEXT,
+  updated_at TIMESTAMPTZ
+)
+LANGUAGE sql
+AS $$
+  WITH done AS (
+    UPDATE workflow_outbox o
+    SET status = CASE
+          WHEN error IS NULL THEN 'DELIVERED'
+          WHEN o.attempts >= max_attempts THEN 'FAILED'
+          ELSE 'PENDING' END,
+        delivered_at = CASE WHEN error IS NULL THEN now() END,
+        last_error = error,
+        locked_until = NULL,
+        next_attempt_at = CASE
+          WHEN error IS NULL THEN o.next_attempt_at
+          ELSE now() + make_interval(secs => LEAST(backoff_max_seconds,
+                 backoff_base_seconds * power(2, o.attempts - 1)) * (0.5 + random() / 2)) END
+    WHERE o.id = ANY(outbox_ids)
+      AND o.status = 'IN_FLIGHT'
+    RETURNING o.job_id, o.target, o.status, o.attempts
+  )
+  UPDATE content_queue q
+  SET retry_count = LEAST(d.attempts - 1, 3),
+      error_log = CASE WHEN error IS NULL THEN q.error_log
+                       ELSE d.target || ' trigger failed (attempt ' || d.attempts || '): ' || error END,
+      status = CASE WHEN d.status = 'FAILED' THEN 'ERROR' ELSE q.status END
+  FROM done d
+  WHERE q.id = d.job_id
+    AND (error IS NOT NULL OR d.attempts > 1)  -- first-try successes touch nothing
+  RETURNING q.id, q.status, q.retry_count, q.error_log, q.updated_at;
+$$;
+
+-- 4. Bulk transitions can enqueue in the same statement
+DROP FUNCTION IF EXISTS content_queue_bulk_transition(UUID[], TEXT, TEXT[], TEXT[], TEXT, TEXT, BOOLEAN);
+
+CREATE OR REPLACE FUNCTION content_queue_bulk_transition(
+  job_ids UUID[],
+  to_status TEXT DEFAULT NULL,        -- NULL keeps the current status
+  platforms TEXT[] DEFAULT NULL,      -- NULL keeps target_platforms
+  from_statuses TEXT[] DEFAULT NULL,  -- NULL allows any current status
+  actor TEXT DEFAULT 'admin_api',
+  audit_note TEXT DEFAULT NULL,
+  mark_reviewed BOOLEAN DEFAULT FALSE, -- also set reviewed_by / reviewed_at / review_notes
+  workflow_target TEXT DEFAULT NULL    -- enqueue this workflow for every updated job
+)
+RETURNS TABLE (
+  id UUID,
+  old_status TEXT,
+  updated BOOLEAN,
+  status TEXT,
+  topic TEXT,
+  platform TEXT,
+  target_platforms TEXT[],
+  updated_at TIMESTAMPTZ
+)
+LANGUAGE sql
+AS $$
+  WITH current_rows AS (
+    SELECT q.id, q.status
+    FROM content_queue q
+    WHERE q.id = ANY(job_ids)
+    FOR UPDATE
+  ),
+  changed AS (
+    UPDATE content_queue q
+    SET status = COALESCE(to_status, q.status),
+        target_platforms = COALESCE(platforms, q.target_platforms),
+        reviewed_by = CASE WHEN mark_reviewed THEN actor ELSE q.reviewed_by END,
+        reviewed_at = CASE WHEN mark_reviewed THEN now() ELSE q.reviewed_at END,
+        review_notes = CASE WHEN mark_reviewed AND audit_note IS NOT NULL THEN audit_note ELSE q.review_notes END,
+        workflow_trigger = CASE
+          WHEN workflow_target IS NULL THEN q.workflow_trigger
+          ELSE jsonb_build_object('target', workflow_target, 'request_id', gen_random_uuid()) END
+    FROM current_rows c
+    WHERE q.id = c.id
+      AND (from_statuses IS NULL OR c.status = ANY(from_statuses))
+    RETURNING q.id, c.status AS old_status, q.status, q.topic, q.platform, q.target_platforms, q.updated_at
+  ),
+  audited AS (
+    INSERT INTO audit_logs (asset_id, old_status, new_status, changed_by, note, metadata)
+    SELECT ch.id, ch.old_status, ch.status, actor,
+           COALESCE(audit_note, 'Status changed from ' || COALESCE(ch.old_status, 'UNKNOWN') || ' to ' || ch.status),
+           jsonb_build_object('bulk', cardinality(job_ids) > 1, 'target_platforms', ch.target_platforms)
+    FROM changed ch
+  )
+  SELECT c.id, c.status, ch.id IS NOT NULL,
+         COALESCE(ch.status, c.status), ch.topic, ch.platform, ch.target_platforms, ch.updated_at
+  FROM current_rows c
+  LEFT JOIN changed ch ON ch.id = c.id;
+$$;
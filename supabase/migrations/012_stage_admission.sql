@@ -0,0 +1,170 @@
+-- ============================================================================
+-- TAXFIX MIGRATION 012 - STAGE ADMISSION CONTROL
+-- Purpose: the outbox delivered every due trigger at once. n8n acknowledges
+--          a webhook immediately and does the work afterwards, so a burst
+--          started dozens of OpenAI calls and editly renders on one box until
+--          EXECUTIONS_TIMEOUT killed them.
+-- Strategy:
+--   * A delivered trigger holds a slot of its stage (generate / render /
+--     publish) until the job moves on: content_queue_release_stage frees it
+--     when n8n writes the job's new status (or video_url), or writes
+--     PUBLISHED again after a re-publish. Slots of jobs that never report
+--     back are freed after stage_timeout_seconds.
+--   * workflow_outbox_claim_admitted claims at most (max_running - running)
+--     rows, serialized per stage with an advisory lock, so the limit holds
+--     across all API workers. Waiting jobs stay PENDING in the outbox and in
+--     their PENDING_* status.
+--   * workflow_stage_load reports running / queued / service time per stage
+--     (429 Retry-After estimates, /admission/stats).
+-- ============================================================================
+
+-- 1. Slot release time
+ALTER TABLE workflow_outbox
+  ADD COLUMN IF NOT EXISTS released_at TIMESTAMPTZ;
+
+-- Triggers delivered before this migration do not hold slots
+UPDATE workflow_outbox
+SET released_at = COALESCE(delivered_at, now())
+WHERE status = 'DELIVERED' AND released_at IS NULL;
+
+-- Rows that may hold a slot (counted on every claim)
+CREATE INDEX IF NOT EXISTS idx_workflow_outbox_running
+  ON workflow_outbox(target, delivered_at)
+  WHERE released_at IS NULL AND status IN ('IN_FLIGHT', 'DELIVERED');
+-- Recent releases (service time)
+CREATE INDEX IF NOT EXISTS idx_workflow_outbox_released
+  ON workflow_outbox(target, released_at)
+  WHERE released_at IS NOT NULL;
+
+-- 2. Release on progress: n8n writes the next status (PENDING_REVIEW,
+--    READY_TO_PUBLISH + video_url, PUBLISHED) or the job fails (ERROR).
+--    Re-publishing a PUBLISHED job ends with n8n writing PUBLISHED again,
+--    which changes nothing: a write of status PUBLISHED that does not queue
+--    a new trigger counts as progress too.
+CREATE OR REPLACE FUNCTION content_queue_release_stage()
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE workflow_outbox
+  SET released_at = now()
+  WHERE job_id = NEW.id
+    AND released_at IS NULL
+    AND status IN ('IN_FLIGHT', 'DELIVERED')  -- n8n may finish before the delivery is recorded
+    -- A delivery recorded in this transaction (workflow_outbox_complete rewrites
+    -- the status) cannot have been worked on by n8n yet
+    AND (delivered_at IS NULL OR delivered_at < now());
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS content_queue_release_stage ON content_queue;
+CREATE TRIGGER content_queue_release_stage
+  AFTER UPDATE OF status, video_url, published_url ON content_queue
+  FOR EACH ROW
+  WHEN (OLD.status IS DISTINCT FROM NEW.status
+        OR OLD.video_url IS DISTINCT FROM NEW.video_url
+        OR OLD.published_url IS DISTINCT FROM NEW.published_url
+        OR (NEW.status = 'PUBLISHED' AND OLD.workflow_trigger IS NOT DISTINCT FROM NEW.workflow_trigger))
+  EXECUTE FUNCTION content_queue_release_stage();
+
+-- 3. Slots in use
+CREATE OR REPLACE FUNCTION workflow_stage_running(
+  stage TEXT,
+  stage_timeout_seconds INT DEFAULT 900
+)
+RETURNS INT
+LANGUAGE sql STABLE
+AS $$
+  SELECT count(*)::int
+  FROM workflow_outbox w
+  WHERE w.target = stage
+    AND w.released_at IS NULL
+    AND ((w.status = 'IN_FLIGHT' AND w.locked_until >= now())
+         OR (w.status = 'DELIVERED' AND w.delivered_at > now() - make_interval(secs => stage_timeout_seconds)));
+$$;
+
+-- 4. Admission-aware claim (max_running NULL: no limit, like workflow_outbox_claim)
+CREATE OR REPLACE FUNCTION workflow_outbox_claim_admitted(
+  claim_target TEXT,
+  max_rows INT DEFAULT 50,
+  lease_seconds INT DEFAULT 120,
+  max_running INT DEFAULT NULL,
+  stage_timeout_seconds INT DEFAULT 900
+)
+RETURNS TABLE (
+  id BIGINT,
+  job_id UUID,
+  target TEXT,
+  payload JSONB,
+  attempts INT,
+  queued_seconds FLOAT  -- enqueue to this claim
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+  free INT := max_rows;
+BEGIN
+  IF max_running IS NOT NULL THEN
+    -- One claimer per stage at a time, so two workers cannot both take the last slots
+    PERFORM pg_advisory_xact_lock(hashtext('workflow_outbox_claim:' || claim_target));
+    -- Jobs that never reported back (n8n execution killed) give their slot up
+    UPDATE workflow_outbox w
+    SET released_at = now()
+    WHERE w.target = claim_target
+      AND w.status = 'DELIVERED'
+      AND w.released_at IS NULL
+      AND w.delivered_at <= now() - make_interval(secs => stage_timeout_seconds);
+    free := LEAST(max_rows, max_running - workflow_stage_running(claim_target, stage_timeout_seconds));
+    IF free <= 0 THEN
+      RETURN;
+    END IF;
+  END IF;
+
+  RETURN QUERY
+  UPDATE workflow_outbox o
+  SET status = 'IN_FLIGHT',
+      attempts = o.attempts + 1,
+      locked_until = now() + make_interval(secs => lease_seconds),
+      released_at = NULL
+  WHERE o.id IN (
+    SELECT w.id
+    FROM workflow_outbox w
+    WHERE w.target = claim_target
+      AND ((w.status = 'PENDING' AND w.next_attempt_at <= now())
+           OR (w.status = 'IN_FLIGHT' AND w.locked_until < now()))
+    ORDER BY w.next_attempt_at, w.id
+    LIMIT free
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING o.id, o.job_id, o.target, o.payload, o.attempts,
+            EXTRACT(EPOCH FROM now() - o.created_at)::float8;
+END;
+$$;
+
+-- 5. Per-stage load
+CREATE OR REPLACE FUNCTION workflow_stage_load(
+  stage_timeout_seconds INT DEFAULT 900,
+  window_minutes INT DEFAULT 60
+)
+RETURNS TABLE (
+  stage TEXT,
+  running INT,
+  queued INT,
+  oldest_queued_seconds FLOAT,
+  avg_service_seconds FLOAT  -- delivery to release, over the last window_minutes
+)
+LANGUAGE sql STABLE
+AS $$
+  SELECT s.stage,
+         workflow_stage_running(s.stage, stage_timeout_seconds),
+         (SELECT count(*)::int FROM workflow_outbox w
+          WHERE w.target = s.stage AND w.status = 'PENDING'),
+         (SELECT EXTRACT(EPOCH FROM now() - min(w.created_at))::float8 FROM workflow_outbox w
+          WHERE w.target = s.stage AND w.status = 'PENDING'),
+         (SELECT avg(EXTRACT(EPOCH FROM w.released_at - w.delivered_at))::float8 FROM workflow_outbox w
+          WHERE w.target = s.stage
+            AND w.released_at > now() - make_interval(mins => window_minutes)
+            AND w.delivered_at IS NOT NULL
+            AND w.released_at > w.delivered_at)
+  FROM unnest(ARRAY['generate', 'render', 'publish']) AS s(stage);
+$$;
@@ -0,0 +1,255 @@
+-- ============================================================================
+-- TAXFIX MIGRATION 013 - RENDER SCHEDULER LEASES
+-- Purpose: renders ran inside n8n, one `editly` per webhook, with no limit
+--          on how many ran at once and nothing to pick them up again when
+--          the n8n execution died. admin_api/render_scheduler.py claims
+--          PENDING_RENDER jobs from the database instead.
+-- Strategy:
+--   * A job stays PENDING_RENDER while it renders; the claiming process
+--     holds a lease on the row (render_lease_owner / render_lease_until)
+--     and renews it while editly runs.
+--   * render_claim leases the highest render_priority, longest waiting jobs
+--     (FOR UPDATE SKIP LOCKED), so any number of schedulers on any hosts
+--     share the queue. A lease that expired with its owner still set is a
+--     crashed render: the job is claimed again with retry_count + 1, and
+--     goes to ERROR once retry_count is at max_retries (retry_count <= 3).
+--   * render_complete records the outcome: READY_TO_PUBLISH + video_url, or
+--     a retry after a backoff (lease_until in the future without an owner).
+--   * content_queue_bulk_transition takes the render_priority, so a bulk
+--     approval is claimable only once its priority is set.
+-- ============================================================================
+
+-- 1. Columns
+ALTER TABLE content_queue
+  ADD COLUMN IF NOT EXISTS render_priority INT NOT NULL DEFAULT 0,  -- higher renders first
+  ADD COLUMN IF NOT EXISTS render_queued_at TIMESTAMPTZ,
+  ADD COLUMN IF NOT EXISTS render_lease_owner TEXT,                 -- "<host>:<pid>"
+  ADD COLUMN IF NOT EXISTS render_lease_until TIMESTAMPTZ;
+
+UPDATE content_queue
+SET render_queued_at = COALESCE(reviewed_at, updated_at, created_at)
+WHERE status = 'PENDING_RENDER' AND render_queued_at IS NULL;
+
+-- Claim order
+CREATE INDEX IF NOT EXISTS idx_content_queue_render_claim
+  ON content_queue(render_priority DESC, render_queued_at, id)
+  WHERE status = 'PENDING_RENDER';
+
+-- 2. Entering PENDING_RENDER starts a new render: queue time, no lease, no failed attempts.
+--    Leaving it (rendered, or moved by an admin) drops the lease, so its renderer stops.
+CREATE OR REPLACE FUNCTION content_queue_render_queued()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.status = 'PENDING_RENDER' AND (TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM 'PENDING_RENDER') THEN
+    NEW.render_queued_at := now();
+    NEW.render_lease_owner := NULL;
+    NEW.render_lease_until := NULL;
+    NEW.retry_count := 0;
+  ELSIF TG_OP = 'UPDATE' AND OLD.status = 'PENDING_RENDER' AND NEW.status IS DISTINCT FROM 'PENDING_RENDER' THEN
+    NEW.render_lease_owner := NULL;
+    NEW.render_lease_until := NULL;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS content_queue_render_queued ON content_queue;
+CREATE TRIGGER content_queue_render_queued
+  BEFORE INSERT OR UPDATE OF status ON content_queue
+  FOR EACH ROW
+  EXECUTE FUNCTION content_queue_render_queued();
+
+-- 3. Claim
+CREATE OR REPLACE FUNCTION render_claim(
+  worker TEXT,
+  max_jobs INT DEFAULT 1,
+  lease_seconds INT DEFAULT 120,
+  max_retries INT DEFAULT 3
+)
+RETURNS TABLE (
+  id UUID,
+  topic TEXT,
+  script_content JSONB,
+  script_structure JSONB,
+  render_priority INT,
+  retry_count INT,
+  queued_seconds FLOAT  -- PENDING_RENDER to this claim
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+  -- Crashed on their last allowed attempt
+  UPDATE content_queue q
+  SET status = 'ERROR',
+      error_log = format('Render by %s did not finish (lease expired) after %s attempts',
+                         q.render_lease_owner, q.retry_count + 1)
+  WHERE q.id IN (
+    SELECT c.id FROM content_queue c
+    WHERE c.status = 'PENDING_RENDER'
+      AND c.render_lease_owner IS NOT NULL
+      AND c.render_lease_until < now()
+      AND c.retry_count >= max_retries
+    FOR UPDATE SKIP LOCKED
+  );
+
+  IF max_jobs <= 0 THEN
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  UPDATE content_queue q
+  SET render_lease_owner = worker,
+      render_lease_until = now() + make_interval(secs => lease_seconds),
+      retry_count = CASE WHEN q.render_lease_owner IS NOT NULL THEN q.retry_count + 1 ELSE q.retry_count END,
+      error_log = CASE WHEN q.render_lease_owner IS NOT NULL
+                       THEN format('Render by %s did not finish (lease expired), attempt %s',
+                                   q.render_lease_owner, q.retry_count + 1)
+                       ELSE q.error_log END
+  WHERE q.id IN (
+    SELECT c.id FROM content_queue c
+    WHERE c.status = 'PENDING_RENDER'
+      AND (c.render_lease_until IS NULL OR c.render_lease_until < now())
+      AND (c.render_lease_owner IS NULL OR c.retry_count < max_retries)
+    ORDER BY c.render_priority DESC, c.render_queued_at, c.id
+    LIMIT max_jobs
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING q.id, q.topic, q.script_content, q.script_structure, q.render_priority, q.retry_count,
+            EXTRACT(EPOCH FROM now() - COALESCE(q.render_queued_at, q.updated_at))::float8;
+END;
+$$;
+
+-- 4. Heartbeat: extends the leases `worker` still holds and returns their ids
+--    (a job missing from the result was taken over or moved on: stop rendering it)
+CREATE OR REPLACE FUNCTION render_renew(
+  worker TEXT,
+  job_ids UUID[],
+  lease_seconds INT DEFAULT 120
+)
+RETURNS TABLE (id UUID)
+LANGUAGE sql
+AS $$
+  UPDATE content_queue q
+  SET render_lease_until = now() + make_interval(secs => lease_seconds)
+  WHERE q.id = ANY(job_ids)
+    AND q.status = 'PENDING_RENDER'
+    AND q.render_lease_owner = worker
+  RETURNING q.id;
+$$;
+
+-- 5. Outcome (output_url NULL with an error: failed attempt)
+CREATE OR REPLACE FUNCTION render_complete(
+  worker TEXT,
+  job_id UUID,
+  output_url TEXT DEFAULT NULL,
+  error TEXT DEFAULT NULL,
+  max_retries INT DEFAULT 3,
+  backoff_base_seconds FLOAT DEFAULT 30
+)
+RETURNS TABLE (
+  id UUID,
+  status TEXT,
+  video_url TEXT,
+  retry_count INT,
+  error_log TEXT,
+  updated_at TIMESTAMPTZ
+)
+LANGUAGE sql
+AS $$
+  UPDATE content_queue q
+  SET status = CASE WHEN error IS NULL THEN 'READY_TO_PUBLISH'
+                    WHEN q.retry_count >= max_retries THEN 'ERROR'
+                    ELSE q.status END,
+      video_url = CASE WHEN error IS NULL THEN output_url ELSE q.video_url END,
+      retry_count = CASE WHEN error IS NULL OR q.retry_count >= max_retries THEN q.retry_count
+                         ELSE q.retry_count + 1 END,
+      error_log = CASE WHEN error IS NULL THEN q.error_log
+                       ELSE format('Render failed (attempt %s): %s', q.retry_count + 1, error) END,
+      render_lease_owner = NULL,
+      -- No owner and a future lease: waiting for its retry
+      render_lease_until = CASE WHEN error IS NULL OR q.retry_count >= max_retries THEN NULL
+                                ELSE now() + make_interval(secs => backoff_base_seconds * 2 ^ q.retry_count) END
+  WHERE q.id = job_id
+    AND q.status = 'PENDING_RENDER'
+    AND q.render_lease_owner = worker
+  RETURNING q.id, q.status, q.video_url, q.retry_count, q.error_log, q.updated_at;
+$$;
+
+-- 6. Give leases back without counting an attempt (scheduler shutting down)
+CREATE OR REPLACE FUNCTION render_release(
+  worker TEXT,
+  job_ids UUID[]
+)
+RETURNS TABLE (id UUID)
+LANGUAGE sql
+AS $$
+  UPDATE content_queue q
+  SET render_lease_owner = NULL,
+      render_lease_until = NULL
+  WHERE q.id = ANY(job_ids)
+    AND q.status = 'PENDING_RENDER'
+    AND q.render_lease_owner = worker
+  RETURNING q.id;
+$$;
+
+-- 7. Bulk approvals set render_priority in the same statement as the status
+DROP FUNCTION IF EXISTS content_queue_bulk_transition(UUID[], TEXT, TEXT[], TEXT[], TEXT, TEXT, BOOLEAN, TEXT);
+
+CREATE OR REPLACE FUNCTION content_queue_bulk_transition(
+  job_ids UUID[],
+  to_status TEXT DEFAULT NULL,        -- NULL keeps the current status
+  platforms TEXT[] DEFAULT NULL,      -- NULL keeps target_platforms
+  from_statuses TEXT[] DEFAULT NULL,  -- NULL allows any current status
+  actor TEXT DEFAULT 'admin_api',
+  audit_note TEXT DEFAULT NULL,
+  mark_reviewed BOOLEAN DEFAULT FALSE, -- also set reviewed_by / reviewed_at / review_notes
+  workflow_target TEXT DEFAULT NULL,   -- enqueue this workflow for every updated job
+  priority INT DEFAULT NULL            -- render_priority; NULL keeps it
+)
+RETURNS TABLE (
+  id UUID,
+  old_status TEXT,
+  updated BOOLEAN,
+  status TEXT,
+  topic TEXT,
+  platform TEXT,
+  target_platforms TEXT[],
+  updated_at TIMESTAMPTZ
+)
+LANGUAGE sql
+AS $$
+  WITH current_rows AS (
+    SELECT q.id, q.status
+    FROM content_queue q
+    WHERE q.id = ANY(job_ids)
+    FOR UPDATE
+  ),
+  changed AS (
+    UPDATE content_queue q
+    SET status = COALESCE(to_status, q.status),
+        target_platforms = COALESCE(platforms, q.target_platforms),
+        render_priority = COALESCE(priority, q.render_priority),
+        reviewed_by = CASE WHEN mark_reviewed THEN actor ELSE q.reviewed_by END,
+        reviewed_at = CASE WHEN mark_reviewed THEN now() ELSE q.reviewed_at END,
+        review_notes = CASE WHEN mark_reviewed AND audit_note IS NOT NULL THEN audit_note ELSE q.review_notes END,
+        workflow_trigger = CASE
+          WHEN workflow_target IS NULL THEN q.workflow_trigger
+          ELSE jsonb_build_object('target', workflow_target, 'request_id', gen_random_uuid()) END
+    FROM current_rows c
+    WHERE q.id = c.id
+      AND (from_statuses IS NULL OR c.status = ANY(from_statuses))
+    RETURNING q.id, c.status AS old_status, q.status, q.topic, q.platform, q.target_platforms, q.updated_at
+  ),
+  audited AS (
+    INSERT INTO audit_logs (asset_id, old_status, new_status, changed_by, note, metadata)
+    SELECT ch.id, ch.old_status, ch.status, actor,
+           COALESCE(audit_note, 'Status changed from ' || COALESCE(ch.old_status, 'UNKNOWN') || ' to ' || ch.status),
+           jsonb_build_object('bulk', cardinality(job_ids) > 1, 'target_platforms', ch.target_platforms)
+    FROM changed ch
+  )
+  SELECT c.id, c.status, ch.id IS NOT NULL,
+         COALESCE(ch.status, c.status), ch.topic, ch.platform, ch.target_platforms, ch.updated_at
+  FROM current_rows c
+  LEFT JOIN changed ch ON ch.id = c.id;
+$$;
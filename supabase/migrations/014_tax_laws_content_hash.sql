@@ -0,0 +1,38 @@
+-- ============================================================================
+-- TAXFIX MIGRATION 014 - TAX_LAWS CONTENT KEYS
+-- Purpose: dashboard/seed_knowledge.py inserted every law again on each run
+--          (duplicates, and one embeddings call per law per run). Seeding is
+--          now a diff against the table, which needs a stable key per row.
+-- Strategy:
+--   * content_hash (sha256 of content, hex) + embedding_model identify a
+--     row: the same text embedded with another model is a different row.
+--     Unique, so the seeder upserts on it.
+--   * Existing rows are deduplicated (lowest id kept) and keyed; rows that
+--     were embedded so far used text-embedding-3-small. Rows without an
+--     embedding keep a NULL key and are removed by the next seed run.
+-- ============================================================================
+
+-- 1. Columns
+ALTER TABLE tax_laws
+  ADD COLUMN IF NOT EXISTS content_hash TEXT,     -- encode(sha256(content), 'hex')
+  ADD COLUMN IF NOT EXISTS embedding_model TEXT;
+
+-- 2. Duplicates from repeated seed runs
+DELETE FROM tax_laws t
+USING tax_laws keep
+WHERE t.content = keep.content
+  AND t.embedding IS NOT NULL
+  AND keep.embedding IS NOT NULL
+  AND keep.id < t.id;
+
+-- 3. Backfill
+UPDATE tax_laws
+SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex'),
+    embedding_model = 'text-embedding-3-small'
+WHERE content_hash IS NULL
+  AND content IS NOT NULL
+  AND embedding IS NOT NULL;
+
+-- 4. Key (NULLs are distinct: unkeyed rows do not conflict)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tax_laws_content_key
+  ON tax_laws(content_hash, embedding_model);
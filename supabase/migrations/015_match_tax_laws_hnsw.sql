@@ -0,0 +1,87 @@
+-- ============================================================================
+-- TAXFIX MIGRATION 015 - INDEXED TAX_LAWS RETRIEVAL
+-- Purpose: match_tax_laws (migration 003) filtered on
+--          `1 - (embedding <=> q) > match_threshold`, which no vector index
+--          can answer, and tax_laws had no vector index anyway: every RAG
+--          lookup was a sequential scan over all 1536-d embeddings.
+-- Strategy:
+--   * HNSW index on embedding (cosine). The nearest rows come from
+--     `ORDER BY embedding <=> q LIMIT match_count`, the shape the index
+--     serves; the threshold is applied to those top-k afterwards. Same
+--     result as before whenever the index finds the true top-k.
+--   * ef_search (candidate list size, pgvector default 40) can be raised per
+--     call for recall; it is never below match_count.
+--   * Optional metadata pre-filter (`metadata @> filter`, e.g.
+--     {"year": 2024, "topic": "Home Office"}) with a GIN index, so selective
+--     filters are answered from the metadata index and an exact sort.
+--     pgvector 0.6 filters HNSW results after the scan: with a filter the
+--     candidate list is widened (ef_search x 4) so fewer top-k go missing.
+--   * The old 3-argument function is dropped: an overload with the same
+--     named arguments would make PostgREST calls ambiguous.
+-- Build the index with enough maintenance_work_mem for the graph to fit
+-- (~8 KB per row at 1536 dimensions), e.g. SET maintenance_work_mem = '1GB'.
+-- ============================================================================
+
+-- 1. Indexes
+CREATE INDEX IF NOT EXISTS idx_tax_laws_embedding_hnsw
+  ON tax_laws USING hnsw (embedding vector_cosine_ops)
+  WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX IF NOT EXISTS idx_tax_laws_metadata
+  ON tax_laws USING gin (metadata jsonb_path_ops);
+
+-- 2. Search
+DROP FUNCTION IF EXISTS match_tax_laws(VECTOR(1536), FLOAT, INT);
+
+CREATE OR REPLACE FUNCTION match_tax_laws (
+  query_embedding VECTOR(1536),
+  match_threshold FLOAT,
+  match_count INT,
+  filter JSONB DEFAULT '{}',   -- metadata must contain this
+  ef_search INT DEFAULT NULL   -- NULL: the server's hnsw.ef_search
+)
+RETURNS TABLE (
+  id BIGINT,
+  content TEXT,
+  metadata JSONB,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+  filtered BOOLEAN := filter IS NOT NULL AND filter <> '{}'::jsonb;
+  candidates INT := COALESCE(ef_search, current_setting('hnsw.ef_search', true)::int, 40);
+BEGIN
+  IF filtered THEN
+    candidates := candidates * 4;
+  END IF;
+  -- Transaction-local: one PostgREST request
+  PERFORM set_config('hnsw.ef_search', LEAST(GREATEST(candidates, match_count), 1000)::text, true);
+
+  IF NOT filtered THEN
+    RETURN QUERY
+    SELECT nearest.id, nearest.content, nearest.metadata, 1 - nearest.distance AS similarity
+    FROM (
+      SELECT t.id, t.content, t.metadata, t.embedding <=> query_embedding AS distance
+      FROM tax_laws t
+      ORDER BY t.embedding <=> query_embedding
+      LIMIT match_count
+    ) nearest
+    WHERE 1 - nearest.distance > match_threshold
+    ORDER BY nearest.distance;
+  ELSE
+    RETURN QUERY
+    SELECT nearest.id, nearest.content, nearest.metadata, 1 - nearest.distance AS similarity
+    FROM (
+      SELECT t.id, t.content, t.metadata, t.embedding <=> query_embedding AS distance
+      FROM tax_laws t
+      WHERE t.metadata @> filter
+      ORDER BY t.embedding <=> query_embedding
+      LIMIT match_count
+    ) nearest
+    WHERE 1 - nearest.distance > match_threshold
+    ORDER BY nearest.distance;
+  END IF;
+END;
+$$;
@@ -0,0 +1,187 @@
+"""
+Benchmark: streaming a law corpus from disk into tax_laws (dashboard/corpus.py).
+
+Writes synthetic EStG-like corpora of --sizes paragraphs (a third each as
+Markdown, HTML and JSONL files) to a temporary directory, then, for each,
+seeds it in a fresh process against the PostgREST stand-in and the stub
+embeddings server and reports chunks, chunks/s and the process's peak RSS.
+A second pass only reads and chunks the files (no seeding). Peak memory
+should stay roughly flat while the corpus grows; what does grow is one
+key per chunk (content hash) for the diff.
+
+--check only runs the chunker's assertions (overlap without a space to cut
+at, chunk sizes, headings inside code fences) and exits.
+
+    python -m tests.bench.bench_corpus --sizes 10000,40000,160000
+    python -m tests.bench.bench_corpus --check
+"""
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from tests.bench.bench_seed import WORDS
+from tests.bench.harness import ROOT, STUB_SUPABASE_KEY, serve
+
+FILES_PER_FORMAT = 4
+PARAGRAPHS_PER_SECTION = 6
+
+
+def paragraph(rng: random.Random, number: int) -> str:
+    sentences = []
+    for _ in range(rng.randint(2, 6)):
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))) + ".")
+    return f"({number}) " + " ".join(sentences)
+
+
+def write_corpus(directory: str, paragraphs: int, seed: int = 3) -> int:
+    """Writes `paragraphs` paragraphs in sections across Markdown, HTML and JSONL files; returns bytes."""
+    rng = random.Random(seed)
+    per_file = max(1, paragraphs // (3 * FILES_PER_FORMAT))
+    section = 0
+    for fmt in ("md", "html", "jsonl"):
+        for n in range(FILES_PER_FORMAT):
+            with open(os.path.join(directory, f"law_{fmt}_{n}.{fmt}"), "w", encoding="utf-8") as f:
+                if fmt == "md":
+                    f.write(f"# Gesetz {n}\n\n")
+                elif fmt == "html":
+                    f.write(f"<html><body><h1>Gesetz {n}</h1>\n")
+                for i in range(per_file):
+                    if i % PARAGRAPHS_PER_SECTION == 0:
+                        section += 1
+                        if fmt == "md":
+                            f.write(f"## § {section} Vorschrift\n\n")
+                        elif fmt == "html":
+                            f.write(f"<h2>§ {section} Vorschrift</h2>\n")
+                    text = paragraph(rng, i % PARAGRAPHS_PER_SECTION + 1)
+                    if fmt == "md":
+                        f.write(text + "\n\n")
+                    elif fmt == "html":
+                        f.write(f"<p>{text}</p>\n")
+                    else:
+                        f.write(json.dumps({"content": text, "metadata": {"section": f"§ {section}"}}) + "\n")
+                if fmt == "html":
+                    f.write("</body></html>\n")
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def check():
+    """Assertions on corpus.chunk_blocks / _overlap and the Markdown reader."""
+    from dashboard import corpus
+
+    # Overlap is whole trailing pieces, else the tail of the last one from a word start
+    pieces = [("\n\n", "Erster Satz."), (" ", "Zweiter Satz.")]
+    assert corpus._overlap(pieces, 14) == [(" ", "Zweiter Satz.")]
+    assert corpus._overlap(pieces, 100) == pieces
+    assert corpus._overlap([("\n\n", "aaa bbb ccc")], 5) == [(" ", "ccc")]
+    # No space to cut at: no overlap rather than half a word
+    assert corpus._overlap([("\n\n", "x" * 50)], 10) == []
+    assert corpus._overlap([("\n\n", "x" * 45 + " yyyy")], 4) == []
+    assert corpus._overlap(pieces, 0) == []
+
+    section = corpus.Section("EStG > § 9", {"source": "check.md", "section": "§ 9"})
+    text = " ".join(f"Satz {i} mit Wort{i}." for i in range(60))
+    chunks = list(corpus.chunk_blocks([(section, text)], max_chars=120, overlap=30))
+    bodies = [c["content"].split("\n\n", 1)[1] for c in chunks]
+    assert all(c["content"].startswith("EStG > § 9\n\n") for c in chunks)
+    assert all(len(b) <= 120 for b in bodies), [len(b) for b in bodies]
+    assert [c["metadata"]["chunk"] for c in chunks] == list(range(len(chunks)))
+    for previous, body in zip(bodies, bodies[1:]):
+        # Each chunk starts with up to 30 characters from the end of the previous one
+        shared = max((k for k in range(1, 31) if previous.endswith(body[:k])), default=0)
+        assert shared and body[shared - 1] == ".", (previous, body)
+    assert " ".join(dict.fromkeys(s for b in bodies for s in re.split(r"(?<=\.) ", b))) == text
+
+    # A single word longer than max_chars: cut hard, nothing lost, no overlap
+    long_word = "".join(str(i % 10) for i in range(250))
+    chunks = list(corpus.chunk_blocks([(corpus.Section("", {}), long_word)], max_chars=100, overlap=20))
+    assert [len(c["content"]) for c in chunks] == [100, 100, 50]
+    assert "".join(c["content"] for c in chunks) == long_word
+
+    # Headings inside a code fence are text, not sections
+    directory = tempfile.mkdtemp(prefix="corpus-check-")
+    path = os.path.join(directory, "check.md")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# EStG\n\n## § 9 Werbungskosten\n\nText.\n\n```\n# kein Abschnitt\n```\n\nMehr Text.\n")
+    chunks = list(corpus.iter_chunks([path], max_chars=1000, overlap=0))
+    assert len(chunks) == 1, chunks
+    assert chunks[0]["metadata"] == {"source": "check.md", "section": "§ 9 Werbungskosten", "chunk": 0}
+    assert chunks[0]["content"].startswith("EStG > § 9 Werbungskosten\n\n")
+    assert "# kein Abschnitt" in chunks[0]["content"] and chunks[0]["content"].endswith("Mehr Text.")
+    print("corpus checks OK")
+
+
+def child(args):
+    """One measurement in this (fresh) process; prints a JSON result line."""
+    from dashboard import corpus, seed_knowledge
+
+    t0 = time.perf_counter()
+    if args.chunk_only:
+        chunks = sum(1 for _ in corpus.iter_chunks([args.corpus]))
+        result = {"chunks": chunks}
+    else:
+        result = seed_knowledge.seed_db(laws=corpus.iter_chunks([args.corpus]))
+        chunks = result["total"]
+    elapsed = time.perf_counter() - t0
+    # ru_maxrss is KiB on Linux
+    print(json.dumps({**result, "chunks": chunks, "seconds": elapsed,
+                      "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def run_child(corpus_dir: str, env: dict, chunk_only: bool) -> dict:
+    cmd = [sys.executable, "-m", "tests.bench.bench_corpus", "--child", corpus_dir]
+    if chunk_only:
+        cmd.append("--chunk-only")
+    out = subprocess.run(cmd, cwd=ROOT, env={**os.environ, **env}, check=True,
+                         stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,40000,160000", help="paragraphs per corpus")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per embeddings request")
+    parser.add_argument("--child", dest="corpus", help=argparse.SUPPRESS)
+    parser.add_argument("--chunk-only", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--check", action="store_true", help="run the chunker assertions and exit")
+    args = parser.parse_args()
+    if args.check:
+        return check()
+    if args.corpus:
+        return child(args)
+
+    pg_env = {"STUB_ROWS": "0", "STUB_DROP_COLUMNS": "embedding"}
+    ai_env = {"STUB_OPENAI_LATENCY": str(args.latency)}
+    results = []
+    with serve("tests.bench.stub_postgrest:app", env=pg_env) as pg_url, \
+            serve("tests.bench.stub_openai:app", env=ai_env) as ai_url, \
+            httpx.Client(base_url=pg_url, timeout=120) as pg:
+        for size in (int(s) for s in args.sizes.split(",")):
+            corpus_dir = tempfile.mkdtemp(prefix="corpus-")
+            corpus_bytes = write_corpus(corpus_dir, size)
+            env = {"SUPABASE_URL": pg_url, "SUPABASE_KEY": STUB_SUPABASE_KEY, "OPENAI_API_KEY": "stub",
+                   "OPENAI_BASE_URL": f"{ai_url}/v1", "EMBEDDING_CACHE_PATH": ""}
+            chunked = run_child(corpus_dir, env, chunk_only=True)
+            pg.delete("/rest/v1/tax_laws")
+            seeded = run_child(corpus_dir, env, chunk_only=False)
+            results.append((size, corpus_bytes, chunked, seeded))
+
+    print(f"\n{'paragraphs':>10} {'corpus MB':>10} {'chunks':>8} {'chunk/s':>9} {'RSS MB':>7} "
+          f"{'seeded':>8} {'seed/s':>8} {'RSS MB':>7}")
+    for size, corpus_bytes, chunked, seeded in results:
+        print(f"{size:>10} {corpus_bytes / 2 ** 20:>10.1f} {chunked['chunks']:>8} "
+              f"{chunked['chunks'] / chunked['seconds']:>9.0f} {chunked['peak_rss_mb']:>7.1f} "
+              f"{seeded['inserted']:>8} {seeded['chunks'] / seeded['seconds']:>8.0f} {seeded['peak_rss_mb']:>7.1f}")
+    print("\n(chunk: read + chunk only; seed: chunk, embed and upsert, embedding cache off; RSS: peak of the process)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark: recall vs latency of match_tax_laws (migration 015) on a local
+Postgres with pgvector.
+
+Loads --rows clustered 1536-d embeddings into tax_laws of a SCRATCH
+database (--dsn, migrations applied; its tax_laws table is replaced),
+tagged with metadata {"year": 2022..2025, "topic": "topic-0".."topic-19"},
+builds the HNSW and GIN indexes from migration 015 (timed) and then, for
+each filter and each --ef value, reports p50/p95 latency and recall of
+match_tax_laws against the exact answer (computed in NumPy):
+
+  seqscan   the same query with index scans disabled (exact)
+  003       the function from migration 003 (threshold in the WHERE)
+  hnsw      match_tax_laws(..., filter, ef_search)
+
+Filters: none, {"year": 2024} (~25% of rows), {"year": 2024, "topic":
+"topic-3"} (~1.25%). --no-load reuses the table and indexes of a previous
+run with the same --rows.
+
+    python -m tests.bench.bench_match_tax_laws --dsn postgresql://postgres@localhost/scratch --rows 100000
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from tests.bench.bench_vector_index import clustered, copy_binary, literal, ms, queries, timed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MIGRATION = os.path.join(ROOT, "supabase", "migrations", "015_match_tax_laws_hnsw.sql")
+FILTERS = [{}, {"year": 2024}, {"year": 2024, "topic": "topic-3"}]
+
+# Migration 003's function, under another name
+LEGACY_FUNCTION = """
+CREATE OR REPLACE FUNCTION match_tax_laws_003 (query_embedding VECTOR(1536), match_threshold FLOAT, match_count INT)
+RETURNS TABLE (id BIGINT, content TEXT, metadata JSONB, similarity FLOAT)
+LANGUAGE plpgsql AS $$
+BEGIN
+  RETURN QUERY
+  SELECT tax_laws.id, tax_laws.content, tax_laws.metadata, 1 - (tax_laws.embedding <=> query_embedding) AS similarity
+  FROM tax_laws
+  WHERE 1 - (tax_laws.embedding <=> query_embedding) > match_threshold
+  ORDER BY tax_laws.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
+"""
+
+
+def metadata_for(n: int, rng: np.random.Generator) -> list:
+    years = rng.integers(2022, 2026, n)
+    topics = rng.integers(0, 20, n)
+    return [{"year": int(y), "topic": f"topic-{t}"} for y, t in zip(years, topics)]
+
+
+def matches(metadata: dict, flt: dict) -> bool:
+    return all(metadata.get(k) == v for k, v in flt.items())
+
+
+def exact(vectors: np.ndarray, mask: np.ndarray, query: np.ndarray, threshold: float, count: int) -> list:
+    """Ids (1-based) match_tax_laws should return, by brute force."""
+    candidates = np.flatnonzero(mask)
+    scores = vectors[candidates].astype(np.float64) @ query.astype(np.float64)
+    order = np.argsort(-scores)[:count]
+    return [int(candidates[i]) + 1 for i in order if scores[i] > threshold]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=os.environ.get("BENCH_DATABASE_URL"), required="BENCH_DATABASE_URL" not in os.environ)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--ef", default="10,20,40,80,160,320")
+    parser.add_argument("--slow-queries", type=int, default=10, help="queries for the sequential-scan paths")
+    parser.add_argument("--no-load", action="store_true")
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    args = parser.parse_args()
+
+    import psycopg
+    conn = psycopg.connect(args.dsn, autocommit=True)
+    rng = np.random.default_rng(args.rows)
+    centres, vectors = clustered(args.rows, args.dim, rng)
+    metadatas = metadata_for(args.rows, rng)
+    probe = queries(centres, args.queries, rng)
+
+    if not args.no_load:
+        t0 = time.perf_counter()
+        conn.execute("DROP INDEX IF EXISTS idx_tax_laws_embedding_hnsw")
+        conn.execute("DROP INDEX IF EXISTS idx_tax_laws_metadata")
+        conn.autocommit = False
+        copy_binary(conn, vectors, metadatas)
+        conn.autocommit = True
+        loaded = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        conn.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+        conn.execute(open(MIGRATION).read())
+        print(f"{args.rows} rows loaded in {loaded:.1f}s, migration 015 (index build) {time.perf_counter() - t0:.1f}s")
+    conn.execute(LEGACY_FUNCTION)
+
+    results = []
+    for flt in FILTERS:
+        mask = np.array([matches(m, flt) for m in metadatas])
+        truth = [exact(vectors, mask, q, args.threshold, args.count) for q in probe]
+        slow = probe[:args.slow_queries]
+
+        def recall(found: list, expected: list) -> float:
+            hits = sum(len(set(f) & set(e)) for f, e in zip(found, expected))
+            return hits / max(1, sum(len(e) for e in expected))
+
+        def run(label: str, ef, sql: str, params, items):
+            found, latencies = timed(lambda q: [r[0] for r in conn.execute(sql, params(q)).fetchall()], items)
+            results.append((json.dumps(flt) if flt else "-", label, ef, ms(latencies, 50), ms(latencies, 95),
+                            recall(found, truth[:len(items)]), (mask.mean())))
+
+        where = "AND t.metadata @> %s::jsonb" if flt else ""
+        seqscan = (f"SELECT id FROM (SELECT t.id, t.embedding <=> %s::vector AS d FROM tax_laws t "
+                   f"WHERE true {where} ORDER BY d LIMIT %s) n WHERE 1 - d > %s")
+        conn.execute("SET enable_indexscan = off")
+        run("seqscan", "-", seqscan, lambda q: (literal(q), *([json.dumps(flt)] if flt else []), args.count,
+                                                args.threshold), slow)
+        conn.execute("RESET enable_indexscan")
+        if not flt:
+            run("003", "-", "SELECT id FROM match_tax_laws_003(%s::vector, %s, %s)",
+                lambda q: (literal(q), args.threshold, args.count), slow)
+        for ef in (int(e) for e in args.ef.split(",")):
+            run("hnsw", ef, "SELECT id FROM match_tax_laws(%s::vector, %s, %s, %s::jsonb, %s)",
+                lambda q: (literal(q), args.threshold, args.count, json.dumps(flt), ef), probe)
+        print(results[-1], flush=True)
+
+    print(f"\n{'filter':>34} {'selects':>8} {'path':>8} {'ef':>5} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+    for flt, label, ef, p50, p95, rec, selectivity in results:
+        print(f"{flt:>34} {selectivity:>8.2%} {label:>8} {ef:>5} {p50:>8.2f} {p95:>8.2f} {rec:>7.1%}")
+    print(f"\n({args.rows} rows, dim {args.dim}, match_threshold {args.threshold}, match_count {args.count}; "
+          f"recall: share of the exact top-{args.count} above the threshold that was returned; filtered "
+          f"queries widen ef_search x4)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmark: float16 / int8 embedding storage (dashboard/quantization.py)
+against float32, in the vector index and in the local embedding cache.
+
+Index: for each of --sizes, builds a VectorIndex over clustered 1536-d
+embeddings per storage, with and without the float32 re-rank copies
+(VECTOR_INDEX_RERANK_DIR), and reports the in-memory matrix size, the
+re-rank file size, search p50 and throughput, and recall@k and exact
+agreement (same ids, same order, similarities within 1e-9) against the
+float32 index. --threshold defaults to -1 so recall@k is about the
+ranking alone.
+
+Cache: writes --cache-rows embeddings to a temporary EmbeddingCache per
+storage and reports vector bytes per entry, write and read rates, and
+the worst cosine similarity between a vector and what the cache returns.
+
+--check only runs the assertions on quantize / to_bytes / from_bytes
+(zero vectors, error bounds, little-endian blobs) and exits.
+
+    python -m tests.bench.bench_quantization --sizes 10000,100000
+    python -m tests.bench.bench_quantization --check
+"""
+import argparse
+import os
+import statistics
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from dashboard import embedding_cache, embedding_format, quantization, vector_index
+from tests.bench.bench_vector_index import clustered, ms, queries, timed
+
+CONFIGS = [("float32", True), ("float16", True), ("float16", False), ("int8", True), ("int8", False)]
+
+
+def check():
+    """Assertions on quantization.quantize / to_bytes / from_bytes."""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(8, 64)).astype(np.float32)
+
+    # int8: a zero vector gets scale 1 (not 0, which would make it NaN on the way back)
+    codes, scales = quantization.quantize(np.zeros((2, 4)), "int8")
+    assert codes.dtype == np.int8 and not codes.any() and scales.tolist() == [1.0, 1.0]
+    assert quantization.from_bytes(quantization.to_bytes([0.0] * 4, "int8"), "int8").tolist() == [0.0] * 4
+
+    # int8: symmetric, max|x| maps to +-127, each component within scale / 2
+    codes, scales = quantization.quantize(vectors, "int8")
+    assert np.abs(codes).max(axis=1).tolist() == [127] * len(vectors)
+    error = np.abs(quantization.dequantize(codes, scales) - vectors)
+    assert (error <= scales[:, None] / 2 + 1e-6).all()
+    assert quantization.quantize(vectors[0], "int8")[0].shape == (1, 64)
+
+    for storage, tolerance in (("float32", 0.0), ("float16", 1e-2), ("int8", 0.05)):
+        for vector in vectors:
+            blob = quantization.to_bytes(vector, storage)
+            assert len(blob) == quantization.bytes_per_vector(64, storage)
+            back = quantization.from_bytes(blob, storage)
+            assert back.dtype == np.float32 and np.abs(back - vector).max() <= tolerance, storage
+
+    # Blobs are little-endian whatever the host: float32 matches pack() / struct "<f"
+    vector = vectors[0].tolist()
+    blob = quantization.to_bytes(vector, "float32")
+    assert blob == struct.pack("<64f", *vector) == embedding_format.pack(vector)
+    assert quantization.to_bytes(vector, "float16") == np.asarray(vector, dtype="<f2").tobytes()
+    blob = quantization.to_bytes(vector, "int8")
+    scale = struct.unpack_from("<f", blob)[0]
+    assert abs(scale - np.abs(vectors[0]).max() / 127) < 1e-7
+    assert blob[4:] == quantization.quantize(vectors[0], "int8")[0].tobytes()
+    assert quantization.from_bytes(struct.pack("<2f", 1.5, -2.0), "float32").tolist() == [1.5, -2.0]
+    assert quantization.from_bytes(struct.pack("<f2b", 0.5, 2, -4), "int8").tolist() == [1.0, -2.0]
+
+    try:
+        quantization.check_storage("bfloat16")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown storage accepted")
+    print("quantization checks OK")
+
+
+def bench_index(args, size: int) -> list:
+    rng = np.random.default_rng(size)
+    centres, vectors = clustered(size, args.dim, rng)
+    probe = queries(centres, args.queries, rng)
+    ids = list(range(1, size + 1))
+    rerank_dir = tempfile.mkdtemp(prefix="rerank-")
+    rows, baseline = [], None
+    for storage, rerank in CONFIGS:
+        t0 = time.perf_counter()
+        index = vector_index.VectorIndex(dim=args.dim, ann="exact", capacity=size, storage=storage,
+                                         rerank_dir=rerank_dir if rerank else "")
+        index.add(ids, vectors)
+        build = time.perf_counter() - t0
+        index.search(probe[0], args.threshold, args.count)  # page in
+        t0 = time.perf_counter()
+        found, latencies = timed(lambda q: index.search(q, args.threshold, args.count), probe)
+        elapsed = time.perf_counter() - t0
+        if baseline is None:
+            baseline = found
+        hits = sum(len({r["id"] for r in a} & {r["id"] for r in b}) for a, b in zip(found, baseline))
+        same = sum([r["id"] for r in a] == [r["id"] for r in b]
+                   and all(abs(x["similarity"] - y["similarity"]) < 1e-9 for x, y in zip(a, b))
+                   for a, b in zip(found, baseline))
+        diff = max((abs(x["similarity"] - y["similarity"]) for a, b in zip(found, baseline)
+                    for x, y in zip(a, b) if x["id"] == y["id"]), default=0.0)
+        stats = index.stats()
+        rows.append({"size": size, "storage": storage, "rerank": rerank, "build": build,
+                     "matrix_mb": stats["matrix_bytes"] / 2 ** 20, "file_mb": stats["rerank_file_bytes"] / 2 ** 20,
+                     "p50": ms(latencies, 50), "qps": len(probe) / elapsed,
+                     "recall": hits / max(1, sum(len(b) for b in baseline)), "same": same / len(probe),
+                     "diff": diff})
+        print(rows[-1], flush=True)
+        del index
+    return rows
+
+
+def bench_cache(args) -> list:
+    rng = np.random.default_rng(7)
+    _, vectors = clustered(args.cache_rows, args.dim, rng)
+    entries = {f"{i:064x}": vectors[i].tolist() for i in range(args.cache_rows)}
+    rows = []
+    for storage in ("float32", "float16", "int8"):
+        directory = tempfile.mkdtemp(prefix="embedding-cache-")
+        cache = embedding_cache.EmbeddingCache(os.path.join(directory, "embeddings.sqlite3"), storage=storage)
+        t0 = time.perf_counter()
+        cache.put_many("bench", entries)
+        written = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        found = cache.get_many("bench", entries)
+        read = time.perf_counter() - t0
+        cosines = [float(np.dot(found[key], vectors[i]) / np.linalg.norm(found[key]))
+                   for i, key in enumerate(entries)]
+        stats = cache.stats()
+        cache.close()
+        file_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        rows.append({"storage": storage, "bytes": stats["vector_bytes"] / args.cache_rows,
+                     "file_mb": file_bytes / 2 ** 20, "put_s": args.cache_rows / written,
+                     "get_s": args.cache_rows / read, "min_cos": min(cosines),
+                     "mean_cos": statistics.mean(cosines)})
+        print(rows[-1], flush=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--dim", type=int, default=vector_index.EMBEDDING_DIM)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--threshold", type=float, default=-1.0)
+    parser.add_argument("--count", type=int, default=10, help="k of recall@k")
+    parser.add_argument("--oversample", type=int, default=vector_index.VECTOR_INDEX_OVERSAMPLE)
+    parser.add_argument("--cache-rows", type=int, default=5000)
+    parser.add_argument("--check", action="store_true", help="run the quantization assertions and exit")
+    args = parser.parse_args()
+    if args.check:
+        return check()
+    vector_index.VECTOR_INDEX_OVERSAMPLE = args.oversample
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        results.extend(bench_index(args, size))
+    cache = bench_cache(args)
+
+    print(f"\n{'rows':>8} {'storage':>8} {'rerank':>6} | {'RAM MB':>7} {'file MB':>8} {'build s':>7} | "
+          f"{'p50 ms':>7} {'qps':>6} | {f'recall@{args.count}':>9} {'exact':>6} {'max diff':>9}")
+    for r in results:
+        print(f"{r['size']:>8} {r['storage']:>8} {'yes' if r['rerank'] else 'no':>6} | {r['matrix_mb']:>7.1f} "
+              f"{r['file_mb']:>8.1f} {r['build']:>7.2f} | {r['p50']:>7.2f} {r['qps']:>6.0f} | "
+              f"{r['recall']:>9.1%} {r['same']:>6.0%} {r['diff']:>9.1e}")
+    print(f"\n(exact scan, dim {args.dim}, {args.queries} queries, k {args.count}, oversample {args.oversample}; "
+          f"RAM: codes + per-row factors; file: float32 re-rank copies, memory-mapped; exact: same ids, "
+          f"order and similarities as float32)")
+
+    print(f"\n{'storage':>8} {'B/vector':>9} {'file MB':>8} {'put/s':>8} {'get/s':>8} {'min cos':>9} {'mean cos':>9}")
+    for r in cache:
+        print(f"{r['storage']:>8} {r['bytes']:>9.0f} {r['file_mb']:>8.1f} {r['put_s']:>8.0f} {r['get_s']:>8.0f} "
+              f"{r['min_cos']:>9.6f} {r['mean_cos']:>9.6f}")
+    print(f"\n(embedding cache, {args.cache_rows} entries; cos: similarity of each vector to what the cache returns)")
+
+
+if __name__ == "__main__":
+    main()
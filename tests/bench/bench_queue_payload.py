@@ -0,0 +1,74 @@
+"""
+Benchmark: list payload size and latency, full rows vs the summary projection.
+
+Boots the Admin API against the PostgREST stand-in (STUB_ROWS rows with
+realistic JSONB payloads) and measures /active-queue and /news with
+fields=full (the old select("*") shape) and the default summary shape.
+It also walks the whole queue with keyset cursors and checks that every
+row is reached exactly once. (Per-page latency of the walk reflects the
+stand-in's linear scan; on Postgres each page is an index range scan, see
+migration 008.)
+
+    python -m tests.bench.bench_queue_payload --rows 2000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from tests.bench.harness import api_env, serve, summarize
+
+
+async def measure(client, path, params, repeats):
+    samples, size = [], 0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        r = await client.get(path, params=params)
+        samples.append(time.perf_counter() - t0)
+        r.raise_for_status()
+        size = len(r.content)
+    return size, summarize(samples)
+
+
+async def walk(client, limit):
+    """Pages through /active-queue; returns (rows, unique ids, per-page latency summary)."""
+    samples, rows, ids, cursor = [], 0, set(), None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        t0 = time.perf_counter()
+        r = await client.get("/active-queue", params=params)
+        samples.append(time.perf_counter() - t0)
+        page = r.json()
+        rows += len(page)
+        ids.update(row["id"] for row in page)
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            return rows, len(ids), summarize(samples)
+
+
+async def run(args):
+    with serve("tests.bench.stub_n8n:app") as n8n_url, \
+            serve("tests.bench.stub_postgrest:app", env={"STUB_ROWS": str(args.rows)}) as pg_url, \
+            serve("admin_api.main:app", env=api_env(pg_url, n8n_url)) as api:
+        async with httpx.AsyncClient(base_url=api, timeout=60) as client:
+            print(f"{'endpoint':14} {'shape':8} {'bytes':>10} {'p50ms':>8} {'p95ms':>8}")
+            for path in ("/active-queue", "/news"):
+                for shape in ("full", "summary"):
+                    size, s = await measure(client, path, {"fields": shape}, args.repeats)
+                    print(f"{path:14} {shape:8} {size:>10} {s['p50_ms']:>8} {s['p95_ms']:>8}")
+
+            rows, unique, s = await walk(client, 50)
+            print(f"\nKeyset walk, 50/page: {s['count']} pages, {rows} rows ({unique} unique of {args.rows}), "
+                  f"p50 {s['p50_ms']}ms, p95 {s['p95_ms']}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=30)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
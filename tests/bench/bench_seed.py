@@ -0,0 +1,135 @@
+"""
+Benchmark: seeding the tax_laws knowledge base (dashboard/seed_knowledge.py).
+
+Runs seed_db() in-process against the local PostgREST stand-in and the
+stub embeddings server (tests/bench/stub_openai.py, --latency seconds per
+request) for corpora of synthetic laws of realistic length, and for the
+five built-in TAX_LAWS (size "tax_laws"), with the embedding cache in a
+temporary directory. Per corpus:
+
+  cold     empty table, empty cache
+  repeat   the same laws again (expected: no embeddings requests, no writes)
+  edit     --edit-percent of the laws each edited, re-tagged (metadata
+           only), removed and added
+  rebuild  empty table, warm cache (expected: no embeddings requests)
+
+The old one-request-one-insert-per-law loop runs on the first
+--baseline-max laws of each corpus for comparison with cold.
+
+    python -m tests.bench.bench_seed --sizes tax_laws,5000,100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+from tests.bench.harness import STUB_SUPABASE_KEY, serve
+
+WORDS = ("Steuerpflichtige", "Einkünfte", "Werbungskosten", "Abzug", "Kalenderjahr", "Pauschbetrag",
+         "Aufwendungen", "nach", "Maßgabe", "des", "Absatzes", "sind", "abziehbar", "soweit", "die",
+         "Entfernung", "zwischen", "Wohnung", "erster", "Tätigkeitsstätte", "Euro", "höchstens")
+
+
+def synthetic_laws(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    laws = []
+    for i in range(n):
+        section = f"EStG § {i % 99 + 1}"
+        words = rng.randint(40, 240)  # ~300..1700 characters
+        laws.append({"content": f"{section} Abs. {i}: " + " ".join(rng.choice(WORDS) for _ in range(words)),
+                     "metadata": {"section": section, "topic": f"Topic {i % 50}", "year": 2024}})
+    return laws
+
+
+def edited(laws: list, percent: float, seed: int = 11) -> list:
+    """`laws` with `percent` of them edited, re-tagged, removed and added each."""
+    rng = random.Random(seed)
+    n = max(1, int(len(laws) * percent / 100))
+    picked = rng.sample(range(len(laws)), min(len(laws), 3 * n))
+    edit, retag, remove = set(picked[:n]), set(picked[n:2 * n]), set(picked[2 * n:])
+    result = []
+    for i, law in enumerate(laws):
+        if i in edit:
+            law = {**law, "content": law["content"] + " (geändert)"}
+        elif i in retag:
+            law = {**law, "metadata": {**law["metadata"], "year": 2025}}
+        elif i in remove:
+            continue
+        result.append(law)
+    return result + [{**law, "content": f"Neu {i}: {law['content']}"} for i, law in enumerate(laws[:n])]
+
+
+def sequential_seed(seed_knowledge, laws: list):
+    """The loop seed_db() used to run: one embeddings request and one insert per law."""
+    supabase, _ = seed_knowledge.get_clients()
+    for law in laws:
+        embedding = seed_knowledge.generate_embedding(law["content"])
+        supabase.table("tax_laws").insert({"content": law["content"], "metadata": law["metadata"],
+                                           "embedding": embedding}).execute()
+
+
+def measure(run, laws: list, pg: httpx.Client, ai: httpx.Client, empty: bool = True) -> dict:
+    if empty:
+        pg.delete("/rest/v1/tax_laws")
+    ai.post("/_reset")
+    t0 = time.perf_counter()
+    result = run(laws) or {}
+    elapsed = time.perf_counter() - t0
+    stored = int(pg.get("/rest/v1/tax_laws", params={"select": "id", "limit": "1"})
+                 .headers["Content-Range"].rsplit("/", 1)[1])
+    stats = ai.get("/_stats").json()
+    return {**result, "laws": len(laws), "stored": stored, "seconds": elapsed,
+            "rows_per_s": len(laws) / elapsed, "requests": stats["requests"], "inputs": stats["inputs"],
+            "max_batch": stats["max_batch"], "peak_concurrent": stats["peak_in_flight"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="tax_laws,5000,100000",
+                        help='law counts; "tax_laws": the built-in TAX_LAWS')
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per embeddings request")
+    parser.add_argument("--baseline-max", type=int, default=200)
+    parser.add_argument("--edit-percent", type=float, default=1.0)
+    args = parser.parse_args()
+
+    pg_env = {"STUB_ROWS": "0", "STUB_DROP_COLUMNS": "embedding"}
+    ai_env = {"STUB_OPENAI_LATENCY": str(args.latency)}
+    with serve("tests.bench.stub_postgrest:app", env=pg_env) as pg_url, \
+            serve("tests.bench.stub_openai:app", env=ai_env) as ai_url, \
+            httpx.Client(base_url=pg_url, timeout=120) as pg, httpx.Client(base_url=ai_url) as ai:
+        os.environ.update(SUPABASE_URL=pg_url, SUPABASE_KEY=STUB_SUPABASE_KEY, OPENAI_API_KEY="stub",
+                          OPENAI_BASE_URL=f"{ai_url}/v1",
+                          EMBEDDING_CACHE_PATH=os.path.join(tempfile.mkdtemp(prefix="embeddings-"), "cache.sqlite3"))
+        from dashboard import seed_knowledge
+
+        seed = lambda laws: seed_knowledge.seed_db(laws=laws)
+        print(f"embeddings latency {args.latency}s/request, batch {seed_knowledge.EMBED_BATCH_SIZE} texts / "
+              f"{seed_knowledge.EMBED_BATCH_TOKENS} tokens, {seed_knowledge.EMBED_CONCURRENCY} concurrent, "
+              f"inserts of {seed_knowledge.INSERT_CHUNK_SIZE} rows\n")
+        results = []
+        for size in args.sizes.split(","):
+            laws = list(seed_knowledge.TAX_LAWS) if size == "tax_laws" else synthetic_laws(int(size))
+            seed_knowledge.get_cache().clear()
+            baseline = measure(lambda l: sequential_seed(seed_knowledge, l), laws[:args.baseline_max], pg, ai)
+            runs = {"cold": measure(seed, laws, pg, ai)}
+            runs["repeat"] = measure(seed, laws, pg, ai, empty=False)
+            runs["edit"] = measure(seed, edited(laws, args.edit_percent), pg, ai, empty=False)
+            runs["rebuild"] = measure(seed, laws, pg, ai)
+            results.append((size, baseline, runs))
+
+    print(f"\n{'laws':>8} {'run':>8} {'rows/s':>10} {'vs seq':>8} {'seconds':>8} {'requests':>9} "
+          f"{'embedded':>9} {'cached':>8} {'inserted':>9} {'updated':>8} {'deleted':>8} {'stored':>8}")
+    for size, baseline, runs in results:
+        for name, run in runs.items():
+            print(f"{size:>8} {name:>8} {run['rows_per_s']:>10.1f} {run['rows_per_s'] / baseline['rows_per_s']:>7.1f}x "
+                  f"{run['seconds']:>8.2f} {run['requests']:>9} {run['inputs']:>9} {run['cached']:>8} "
+                  f"{run['inserted']:>9} {run['updated']:>8} {run['deleted']:>8} {run['stored']:>8}")
+    print(f"\n(rows/s: laws in the corpus per second; sequential {baseline['rows_per_s']:.1f} rows/s "
+          f"measured on the first {args.baseline_max} laws of each corpus)")
+
+
+if __name__ == "__main__":
+    main()
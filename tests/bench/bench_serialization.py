@@ -0,0 +1,165 @@
+"""
+Benchmark: JSON encoding and compression of content_queue payloads.
+
+Measures CPU time per response and bytes on the wire for
+  * an /active-queue page of --page-rows full rows and
+  * a single /jobs/{id} row,
+comparing FastAPI's default path (jsonable_encoder + json.dumps), plain
+json.dumps (the old cache path) and admin_api.encoding.dumps (orjson),
+then identity / gzip / brotli as negotiated by the API.
+
+Rows are synthetic but shaped and sized like production output, with
+varied text (repeated filler would compress unrealistically well). Pass
+--rows-file with a JSON array exported from content_queue
+(`select * from content_queue limit 200`) to measure real rows.
+
+    python -m tests.bench.bench_serialization
+    python -m tests.bench.bench_serialization --rows-file rows.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+
+from admin_api import encoding
+
+WORDS = (
+    "Steuer Erklärung Werbungskosten Pauschale Homeoffice Pendlerpauschale Kilometer Arbeitgeber "
+    "Einkommen Freibetrag Kinderfreibetrag Sonderausgaben Rente Versicherung Beleg Finanzamt Frist "
+    "Abzug Kosten Jahr Tage Euro Prozent erstattet berechnet gilt darf kann muss neu bis zu pro "
+    "tax return deduction allowance commute employer income refund receipts deadline insurance "
+    "pension you your can must per year days up to the and of for with from on in is are new rule "
+    "EStG § 9 § 4 § 32d § 35a LStR BMF Schreiben Urteil BFH Grundfreibetrag Solidaritätszuschlag"
+).split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def paragraph(rng: random.Random, chars: int) -> str:
+    parts, size = [], 0
+    while size < chars:
+        s = sentence(rng, rng.randint(8, 20))
+        parts.append(s)
+        size += len(s) + 1
+    return " ".join(parts)
+
+
+def synthetic_row(rng: random.Random, i: int) -> dict:
+    created = datetime.now(timezone.utc) - timedelta(minutes=i)
+    scenes = [{"scene": n, "voiceover": paragraph(rng, 220), "visual": sentence(rng, 10),
+               "duration": rng.randint(3, 8)} for n in range(6)]
+    blog = lambda: {"title": sentence(rng, 8), "intro": paragraph(rng, 400),
+                    "sections": [{"heading": sentence(rng, 5), "body": paragraph(rng, 900)} for _ in range(4)],
+                    "faq": [{"q": sentence(rng, 9), "a": paragraph(rng, 250)} for _ in range(3)],
+                    "tags": [f"#{rng.choice(WORDS).lower()}" for _ in range(6)]}
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "topic": sentence(rng, 7),
+        "source_url": f"https://example.org/news/{i}",
+        "platform": rng.choice(["TikTok", "Instagram", "YouTube", "LinkedIn"]),
+        "status": rng.choice(["PENDING_REVIEW", "READY_TO_PUBLISH", "PUBLISHED"]),
+        "language": "de",
+        "compliance_score": round(rng.uniform(0.7, 1.0), 3),
+        "script_structure": {"hook": sentence(rng, 12), "scenes": scenes, "cta": sentence(rng, 6)},
+        "script_structure_en": {"hook": sentence(rng, 12), "scenes": scenes, "cta": sentence(rng, 6)},
+        "blog_content": blog(),
+        "blog_content_en": blog(),
+        "social_metrics": {"caption": paragraph(rng, 300),
+                           "hashtags": [f"#{rng.choice(WORDS).lower()}" for _ in range(12)],
+                           "predicted_engagement": round(rng.uniform(0, 1), 3)},
+        "validations": {"checks": [sentence(rng, 8) for _ in range(5)], "rag_notes": paragraph(rng, 600)},
+        "video_url": None,
+        "retry_count": 0,
+        "error_log": None,
+        "target_platforms": [],
+        "created_at": created,  # datetimes, as returned by the async client for some paths
+        "updated_at": created,
+    }
+
+
+def cpu_ms(fn, repeat: int) -> float:
+    """Median CPU milliseconds of fn()."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.process_time()
+        fn()
+        times.append((time.process_time() - t0) * 1000)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def fastapi_default(value) -> bytes:
+    return json.dumps(jsonable_encoder(value), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode()
+
+
+def stdlib(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+def measure(name: str, value, repeat: int) -> dict:
+    body = encoding.dumps(value)
+    assert json.loads(body) == json.loads(fastapi_default(value)), "encoding.dumps output differs"
+    print(f"\n{name}: {len(body) / 1024:.1f} KiB JSON")
+    print(f"  {'encoder':34} {'cpu ms':>8}")
+    enc = {}
+    for label, fn in (("fastapi default (jsonable_encoder)", fastapi_default),
+                      ("json.dumps", stdlib),
+                      ("encoding.dumps" + (" (orjson)" if encoding.orjson else " (stdlib)"), encoding.dumps)):
+        enc[label] = cpu_ms(lambda: fn(value), repeat)
+        print(f"  {label:34} {enc[label]:>8.3f}")
+
+    print(f"  {'coding':34} {'cpu ms':>8} {'bytes':>10} {'ratio':>7}")
+    codings = {"identity": (len(body), 0.0)}
+    print(f"  {'identity':34} {0.0:>8.3f} {len(body):>10} {1.0:>7.3f}")
+    variants = [("gzip", "gzip", False)]
+    if encoding.brotli is not None:
+        variants += [("br (per request)", "br", False), ("br (cached entry)", "br", True)]
+    for label, coding, cached in variants:
+        out = encoding.compress(body, coding, cached=cached)
+        ms = cpu_ms(lambda: encoding.compress(body, coding, cached=cached), repeat)
+        codings[label] = (len(out), ms)
+        print(f"  {label:34} {ms:>8.3f} {len(out):>10} {len(out) / len(body):>7.3f}")
+
+    before = enc["fastapi default (jsonable_encoder)"]
+    after_label = next(k for k in enc if k.startswith("encoding.dumps"))
+    best = "br (per request)" if "br (per request)" in codings else "gzip"
+    after = enc[after_label] + codings[best][1]
+    print(f"  => per request: {before:.3f} ms CPU / {len(body)} B before, "
+          f"{after:.3f} ms CPU / {codings[best][0]} B with {after_label.split()[0]} + {best} "
+          f"({(1 - codings[best][0] / len(body)):.0%} fewer bytes)")
+    return {"json_bytes": len(body), "encode_ms": enc, "codings": codings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows-file", help="JSON array of content_queue rows")
+    parser.add_argument("--page-rows", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.rows_file:
+        with open(args.rows_file) as f:
+            rows = json.load(f)
+    else:
+        rng = random.Random(args.seed)
+        rows = [synthetic_row(rng, i) for i in range(args.page_rows)]
+    if not rows:
+        sys.exit("no rows")
+    print(f"orjson: {'yes' if encoding.orjson else 'no'}  brotli: {'yes' if encoding.brotli else 'no'}  "
+          f"rows: {'file' if args.rows_file else 'synthetic'}")
+    measure(f"/active-queue?fields=full page ({len(rows[:args.page_rows])} rows)", rows[:args.page_rows], args.repeat)
+    measure("/jobs/{id} (1 row)", rows[0], args.repeat * 10)
+
+
+if __name__ == "__main__":
+    main()
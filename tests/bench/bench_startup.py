@@ -0,0 +1,157 @@
+"""
+Benchmark: Admin API cold start, per-worker memory and drain.
+
+For each serving mode, against the local PostgREST / n8n stand-ins:
+
+  uvicorn            the single-process dev server
+  gunicorn           admin_api/gunicorn_conf.py, app preloaded in the master
+  gunicorn-nopreload same, GUNICORN_PRELOAD=0 (every worker imports the app)
+
+it reports the time from spawning the server until every worker logged
+"ready" (import, lifespan, database warm-up), each worker's own ready time
+and resident memory (RSS, and PSS / USS, which count pages shared with the
+master and the other workers proportionally / not at all), the latency of
+the first request, and how long SIGTERM takes with an SSE client connected.
+The cold import time of admin_api.main is measured on its own first.
+
+    python -m tests.bench.bench_startup
+    python -m tests.bench.bench_startup --workers 4 --modes gunicorn
+"""
+import argparse
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from tests.bench.harness import ROOT, api_env, free_port, percentile, serve
+
+READY = re.compile(r"Worker (\d+) ready in")
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import admin_api.main; print(time.perf_counter() - t)"
+
+
+def import_seconds(runs: int) -> list:
+    out = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, capture_output=True,
+                                text=True, check=True)
+        out.append(float(result.stdout.strip().splitlines()[-1]))
+    return out
+
+
+def command(mode: str, port: int, workers: int) -> list:
+    if mode == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", "admin_api.main:app", "--host", "127.0.0.1",
+                "--port", str(port), "--log-level", "warning"]
+    return [sys.executable, "-m", "gunicorn", "-c", "admin_api/gunicorn_conf.py", "admin_api.main:app",
+            "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "warning"]
+
+
+def run_mode(mode: str, workers: int, env: dict, timeout: float = 60) -> dict:
+    port = free_port()
+    expected = 1 if mode == "uvicorn" else workers
+    env = {**os.environ, **env}
+    env.pop("WEB_CONCURRENCY", None)  # uvicorn would start that many workers too
+    if mode == "gunicorn-nopreload":
+        env["GUNICORN_PRELOAD"] = "0"
+    ready, lines = [], []
+    all_ready = threading.Event()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(command(mode, port, workers), cwd=ROOT, env=env, text=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    def read():
+        for line in proc.stdout:
+            lines.append(line)
+            match = READY.search(line)
+            if match:
+                ready.append((int(match.group(1)), time.perf_counter() - t0))
+                if len(ready) >= expected:
+                    all_ready.set()
+
+    threading.Thread(target=read, daemon=True).start()
+    url = f"http://127.0.0.1:{port}"
+    try:
+        if not all_ready.wait(timeout):
+            raise RuntimeError(f"{mode}: {len(ready)}/{expected} workers ready\n{''.join(lines[-20:])}")
+        startup = max(t for _, t in ready)
+
+        t1 = time.perf_counter()
+        httpx.get(f"{url}/active-queue?limit=20", timeout=30).raise_for_status()
+        first_request = time.perf_counter() - t1
+
+        # A new connection per request, so requests spread over the workers
+        per_worker = {}
+        for _ in range(expected * 30):
+            if len(per_worker) == expected:
+                break
+            stats = httpx.get(f"{url}/worker/stats", headers={"Connection": "close"}, timeout=10).json()
+            per_worker[stats["pid"]] = stats
+
+        if mode == "uvicorn":
+            # The dev server has no drain hook: an open stream keeps it alive
+            proc.terminate()
+            proc.wait(timeout=30)
+            return {"mode": mode, "workers": expected, "startup_s": startup, "first_request_s": first_request,
+                    "per_worker": list(per_worker.values()), "drain_s": None}
+
+        # Drain with an SSE client connected: should not wait for DRAIN_TIMEOUT
+        with httpx.Client(timeout=None) as client, client.stream("GET", f"{url}/queue/stream") as stream:
+            chunks = stream.iter_bytes()
+            next(chunks)
+            t2 = time.perf_counter()
+            proc.send_signal(signal.SIGTERM)
+            tail = b"".join(chunks)
+            stream_closed = time.perf_counter() - t2
+        proc.wait(timeout=60)
+        drain = time.perf_counter() - t2
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    return {"mode": mode, "workers": expected, "startup_s": startup, "first_request_s": first_request,
+            "per_worker": list(per_worker.values()), "stream_closed_s": stream_closed,
+            "reconnect_hint": b"retry:" in tail, "drain_s": drain, "exit_code": proc.returncode}
+
+
+def mib(value) -> str:
+    return f"{value / 2**20:.1f}" if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", default="uvicorn,gunicorn,gunicorn-nopreload")
+    parser.add_argument("--import-runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = import_seconds(args.import_runs)
+    print(f"import admin_api.main: median {percentile(samples, 50) * 1000:.0f} ms "
+          f"(min {min(samples) * 1000:.0f}, max {max(samples) * 1000:.0f}, {len(samples)} runs)")
+
+    with serve("tests.bench.stub_n8n:app") as n8n_url, serve("tests.bench.stub_postgrest:app") as pg_url:
+        env = api_env(pg_url, n8n_url)
+        for mode in args.modes.split(","):
+            r = run_mode(mode, args.workers, env)
+            print(f"\n{mode}: {r['workers']} worker(s) ready after {r['startup_s']:.2f}s, "
+                  f"first request {r['first_request_s'] * 1000:.0f} ms")
+            print(f"  {'pid':>7} {'import s':>9} {'ready s':>8} {'rss MiB':>8} {'pss MiB':>8} {'uss MiB':>8}")
+            for w in sorted(r["per_worker"], key=lambda w: w["pid"]):
+                print(f"  {w['pid']:>7} {w['import_seconds'] if w['import_seconds'] is not None else '-':>9} "
+                      f"{w['ready_seconds']:>8} {mib(w['rss_bytes']):>8} {mib(w['pss_bytes']):>8} "
+                      f"{mib(w['uss_bytes']):>8}")
+            if len(r["per_worker"]) < r["workers"]:
+                print(f"  ({r['workers'] - len(r['per_worker'])} worker(s) not reached)")
+            if r["drain_s"] is None:
+                continue
+            print(f"  SIGTERM with an open SSE stream: stream closed after {r['stream_closed_s']:.2f}s "
+                  f"(reconnect hint: {'yes' if r['reconnect_hint'] else 'no'}), "
+                  f"exited after {r['drain_s']:.2f}s with code {r['exit_code']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Benchmark: in-process vector index (dashboard/vector_index.py) against
+the match_tax_laws RPC.
+
+For each of --sizes, generates clustered unit embeddings (members of a
+cluster have cosine similarity ~0.5, so --threshold 0.5 cuts through the
+neighbours, the hard case for both agreement and recall), and queries
+near random cluster centres. Then:
+
+  sql    match_tax_laws on Postgres + pgvector (--dsn, a SCRATCH database
+         with the migrations applied: its tax_laws table is replaced);
+         skipped without --dsn
+  exact  VectorIndex full scan; must return the same rows as sql
+  hnsw   VectorIndex with VECTOR_INDEX_ANN=hnsw (if hnswlib is installed);
+         recall against exact
+
+The float32 matrix takes 4 * dim bytes per row (1M x 1536: ~6.2 GB), the
+same again in Postgres.
+
+    python -m tests.bench.bench_vector_index --sizes 10000,1000000 \\
+        --dsn postgresql://postgres@localhost/scratch
+"""
+import argparse
+import json
+import os
+import statistics
+import struct
+import time
+
+import numpy as np
+
+from dashboard import vector_index
+
+CLUSTER_SIZE = 50
+
+
+def clustered(n: int, dim: int, rng: np.random.Generator, chunk: int = 20000):
+    """(centres, vectors): n unit vectors in clusters of CLUSTER_SIZE around unit centres."""
+    centres = rng.standard_normal((max(1, n // CLUSTER_SIZE), dim)).astype(np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk):
+        stop = min(n, start + chunk)
+        members = centres[np.arange(start, stop) % len(centres)]
+        noisy = members + rng.standard_normal((stop - start, dim)).astype(np.float32) / np.sqrt(dim)
+        vectors[start:stop] = noisy / np.linalg.norm(noisy, axis=1, keepdims=True)
+    return centres, vectors
+
+
+def queries(centres: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    picked = centres[rng.integers(0, len(centres), count)]
+    noisy = picked + rng.standard_normal(picked.shape).astype(np.float32) / np.sqrt(picked.shape[1])
+    return noisy / np.linalg.norm(noisy, axis=1, keepdims=True)
+
+
+def literal(vector: np.ndarray) -> str:
+    return "[" + ",".join("%.9g" % x for x in vector) + "]"
+
+
+def copy_binary(conn, vectors: np.ndarray, metadatas: list = None):
+    """Replaces tax_laws with `vectors` (ids 1..n) via COPY ... (FORMAT binary)."""
+    dim = vectors.shape[1]
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE tax_laws")
+        with cur.copy("COPY tax_laws (id, content, metadata, embedding) FROM STDIN (FORMAT binary)") as copy:
+            copy.write(b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0))
+            header = struct.pack("!hh", dim, 0)
+            for i, vector in enumerate(vectors, 1):
+                content = f"law {i}".encode()
+                metadata = json.dumps(metadatas[i - 1] if metadatas else {}).encode()
+                copy.write(struct.pack("!hiq", 4, 8, i)
+                           + struct.pack("!i", len(content)) + content
+                           + struct.pack("!ib", len(metadata) + 1, 1) + metadata  # jsonb binary: version 1 + text
+                           + struct.pack("!i", 4 + 4 * dim) + header + vector.astype(">f4").tobytes())
+            copy.write(struct.pack("!h", -1))
+        cur.execute("ANALYZE tax_laws")
+    conn.commit()
+
+
+def timed(fn, items) -> tuple:
+    results, latencies = [], []
+    for item in items:
+        t0 = time.perf_counter()
+        results.append(fn(item))
+        latencies.append(time.perf_counter() - t0)
+    return results, latencies
+
+
+def ms(latencies: list, q: float) -> float:
+    return 1000 * statistics.quantiles(latencies, n=100)[int(q) - 1] if len(latencies) > 1 else 1000 * latencies[0]
+
+
+def same_rows(a: list, b: list, threshold: float, tolerance: float = 1e-5) -> bool:
+    """
+    Same ids in the same order, allowing swaps among rows whose similarities
+    tie within `tolerance` and a row within `tolerance` of the threshold
+    falling on either side of it.
+    """
+    a_ids, b_ids = {r["id"] for r in a}, {r["id"] for r in b}
+    edge = [r for r in a + b if r["id"] in a_ids ^ b_ids]
+    if any(abs(r["similarity"] - threshold) >= tolerance for r in edge):
+        return False
+    a = [r for r in a if r["id"] in b_ids]
+    b = [r for r in b if r["id"] in a_ids]
+    return all(x["id"] == y["id"] or abs(x["similarity"] - y["similarity"]) < tolerance for x, y in zip(a, b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,1000000")
+    parser.add_argument("--dim", type=int, default=vector_index.EMBEDDING_DIM)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--sql-queries", type=int, default=20, help="queries on the (slow) SQL path")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--dsn", default=os.environ.get("BENCH_DATABASE_URL"),
+                        help="scratch Postgres with pgvector and the migrations (tax_laws is replaced)")
+    parser.add_argument("--no-hnsw", action="store_true")
+    args = parser.parse_args()
+
+    conn = None
+    if args.dsn:
+        import psycopg
+        conn = psycopg.connect(args.dsn)
+
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        rng = np.random.default_rng(size)
+        centres, vectors = clustered(size, args.dim, rng)
+        probe = queries(centres, args.queries, rng)
+        ids = list(range(1, size + 1))
+        row = {"size": size}
+
+        t0 = time.perf_counter()
+        index = vector_index.VectorIndex(dim=args.dim, ann="exact", capacity=size)
+        index.add(ids, vectors)
+        row["exact_build"] = time.perf_counter() - t0
+        exact, latencies = timed(lambda q: index.search(q, args.threshold, args.count), probe)
+        row["exact_p50"], row["exact_p95"] = ms(latencies, 50), ms(latencies, 95)
+        row["hits"] = statistics.mean(len(r) for r in exact)
+
+        if conn is not None:
+            t0 = time.perf_counter()
+            copy_binary(conn, vectors)
+            row["sql_load"] = time.perf_counter() - t0
+
+            def sql(q):
+                cur = conn.execute("SELECT id, similarity FROM match_tax_laws(%s::vector, %s, %s)",
+                                   (literal(q), args.threshold, args.count))
+                return [{"id": i, "similarity": s} for i, s in cur.fetchall()]
+            sql(probe[0])  # warm the cache
+            n_sql = min(args.sql_queries, len(probe))
+            from_sql, latencies = timed(sql, probe[:n_sql])
+            row["sql_p50"], row["sql_p95"] = ms(latencies, 50), ms(latencies, 95)
+            row["agree"] = sum(same_rows(a, b, args.threshold) for a, b in zip(from_sql, exact)) / n_sql
+            row["max_diff"] = max((abs(x["similarity"] - y["similarity"])
+                                   for a, b in zip(from_sql, exact) for x, y in zip(a, b)), default=0.0)
+
+        if not args.no_hnsw and vector_index.hnswlib is not None:
+            t0 = time.perf_counter()
+            graph = vector_index.VectorIndex(dim=args.dim, ann="hnsw", capacity=size)
+            graph.add(ids, vectors)
+            row["hnsw_build"] = time.perf_counter() - t0
+            approx, latencies = timed(lambda q: graph.search(q, args.threshold, args.count), probe)
+            row["hnsw_p50"], row["hnsw_p95"] = ms(latencies, 50), ms(latencies, 95)
+            found = sum(len({r["id"] for r in a} & {r["id"] for r in e}) for a, e in zip(approx, exact))
+            row["recall"] = found / max(1, sum(len(e) for e in exact))
+            del graph
+        del index, vectors
+        rows.append(row)
+        print(row, flush=True)
+
+    print(f"\n{'rows':>8} {'hits':>5} | {'sql p50':>8} {'p95':>7} | {'exact p50':>9} {'p95':>7} {'vs sql':>7} "
+          f"{'agree':>6} {'max diff':>9} | {'hnsw p50':>8} {'p95':>7} {'recall':>7} {'build s':>8}")
+    for r in rows:
+        sql = f"{r['sql_p50']:>8.1f} {r['sql_p95']:>7.1f}" if "sql_p50" in r else f"{'-':>8} {'-':>7}"
+        speedup = f"{r['sql_p50'] / r['exact_p50']:>6.0f}x" if "sql_p50" in r else f"{'-':>7}"
+        agree = f"{r['agree']:>6.0%} {r['max_diff']:>9.1e}" if "agree" in r else f"{'-':>6} {'-':>9}"
+        hnsw = (f"{r['hnsw_p50']:>8.2f} {r['hnsw_p95']:>7.2f} {r['recall']:>7.1%} {r['hnsw_build']:>8.1f}"
+                if "hnsw_p50" in r else f"{'-':>8} {'-':>7} {'-':>7} {'-':>8}")
+        print(f"{r['size']:>8} {r['hits']:>5.1f} | {sql} | {r['exact_p50']:>9.2f} {r['exact_p95']:>7.2f} {speedup} "
+              f"{agree} | {hnsw}")
+    print(f"\n(latencies in ms; match_threshold {args.threshold}, match_count {args.count}, dim {args.dim}; "
+          f"sql: match_tax_laws over a local socket, without the PostgREST hop)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Stand-in for `editly --json <spec>` in the render benchmarks.
+
+Sleeps FAKE_EDITLY_SECONDS, then writes a small file to the spec's outPath.
+FAKE_EDITLY_FAIL_RATE (0..1) makes that share of runs exit 1. Every run
+appends {"tag", "out", "start", "end", "ok"} to FAKE_EDITLY_LOG (JSON lines)
+so a benchmark can check overlaps; FAKE_EDITLY_TAG names the scheduler.
+
+    python -m tests.bench.fake_editly spec.json
+"""
+import json
+import os
+import random
+import sys
+import time
+
+SECONDS = float(os.environ.get("FAKE_EDITLY_SECONDS", "0.5"))
+FAIL_RATE = float(os.environ.get("FAKE_EDITLY_FAIL_RATE", "0"))
+LOG = os.environ.get("FAKE_EDITLY_LOG")
+TAG = os.environ.get("FAKE_EDITLY_TAG", "")
+
+
+def main():
+    with open(sys.argv[-1]) as f:
+        spec = json.load(f)
+    start = time.time()
+    time.sleep(SECONDS)
+    ok = random.random() >= FAIL_RATE
+    if ok:
+        with open(spec["outPath"], "wb") as f:
+            f.write(b"\0" * 1024)
+    if LOG:
+        with open(LOG, "a") as f:
+            f.write(json.dumps({"tag": TAG, "out": os.path.basename(spec["outPath"]), "start": start,
+                                "end": time.time(), "ok": ok}) + "\n")
+    if not ok:
+        print("fake editly failure", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Helpers shared by the load tests and benchmarks in tests/bench.
+
+Boots ASGI apps (the Admin API and the local stand-ins for PostgREST and
+n8n) as uvicorn subprocesses and summarises latency samples.
+Run the scripts from the repository root, e.g.
+
+    python -m tests.bench.load_slow_n8n
+"""
+import asyncio
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Any JWT-shaped string passes supabase-py's key validation
+STUB_SUPABASE_KEY = "stub.stub.stub"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve_process(app_path: str, env: dict = None, port: int = None, workers: int = 1):
+    """
+    Runs `app_path` (module:attr) under uvicorn and yields (base URL, Popen).
+    The process is terminated when the block exits.
+    """
+    port = port or free_port()
+    cmd = [sys.executable, "-m", "uvicorn", app_path,
+           "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    if workers > 1:
+        cmd += ["--workers", str(workers)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env={**os.environ, **(env or {})})
+    try:
+        deadline = time.time() + 20
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{app_path} exited with code {proc.returncode}")
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError(f"{app_path} did not start on port {port}")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}", proc
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+@contextlib.contextmanager
+def serve(app_path: str, env: dict = None, port: int = None, workers: int = 1):
+    """Like serve_process, yielding only the base URL."""
+    with serve_process(app_path, env, port, workers) as (url, _):
+        yield url
+
+
+def _descendants(pid: int) -> list:
+    pids = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids += [int(c) for c in f.read().split()]
+    except OSError:
+        pass
+    return pids + [d for child in pids for d in _descendants(child)]
+
+
+def process_rss(pid: int) -> int:
+    """
+    Resident set size in bytes of `pid` plus its descendants (uvicorn
+    --workers). Linux only; 0 where /proc is not available.
+    """
+    total = 0
+    for p in [pid] + _descendants(pid):
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+    return total
+
+
+def api_env(postgrest_url: str, n8n_url: str, **extra) -> dict:
+    """Environment that points the Admin API at the local stand-ins."""
+    return {
+        "SUPABASE_URL": postgrest_url,
+        "SUPABASE_KEY": STUB_SUPABASE_KEY,
+        "N8N_BASE_URL": n8n_url,
+        **extra,
+    }
+
+
+def percentile(samples: list, p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, int(round(p / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def summarize(samples: list, errors: int = 0, duration: float = None) -> dict:
+    """Latency summary in milliseconds (samples are in seconds)."""
+    out = {
+        "count": len(samples),
+        "errors": errors,
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2) if samples else 0.0,
+    }
+    if duration:
+        out["rps"] = round(len(samples) / duration, 1)
+    return out
+
+
+async def hammer(client: httpx.AsyncClient, method: str, url: str, duration: float,
+                 concurrency: int, body_factory=None, headers: dict = None, think_time: float = 0):
+    """
+    Runs `concurrency` closed-loop workers against `url` for `duration`
+    seconds, each pausing `think_time` seconds between requests.
+    Returns (latencies, error_count).
+    """
+    latencies = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            kwargs = {"headers": headers} if headers else {}
+            if body_factory is not None:
+                kwargs["json"] = body_factory()
+            t0 = time.perf_counter()
+            try:
+                r = await client.request(method, url, **kwargs)
+                if r.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+            if think_time:
+                await asyncio.sleep(think_time)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def burst(client: httpx.AsyncClient, method: str, url: str, duration: float,
+                size: int, interval: float, body_factory=None, headers: dict = None):
+    """
+    Open-loop bursts: every `interval` seconds fires `size` concurrent
+    requests, without waiting for the previous burst. Returns (latencies, error_count).
+    """
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        kwargs = {"headers": headers} if headers else {}
+        if body_factory is not None:
+            kwargs["json"] = body_factory()
+        t0 = time.perf_counter()
+        try:
+            r = await client.request(method, url, **kwargs)
+            if r.status_code >= 400:
+                errors += 1
+        except httpx.HTTPError:
+            errors += 1
+        latencies.append(time.perf_counter() - t0)
+
+    tasks = []
+    stop_at = time.perf_counter() + duration
+    while time.perf_counter() < stop_at:
+        tasks += [asyncio.create_task(one()) for _ in range(size)]
+        await asyncio.sleep(interval)
+    await asyncio.gather(*tasks)
+    return latencies, errors
+
+
+def print_table(title: str, rows: dict):
+    print(f"\n{title}")
+    print(f"{'':28} {'count':>7} {'err':>5} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9} {'maxms':>9}")
+    for name, s in rows.items():
+        print(f"{name:28} {s['count']:>7} {s['errors']:>5} {s['p50_ms']:>9} "
+              f"{s['p95_ms']:>9} {s['p99_ms']:>9} {s['max_ms']:>9}")
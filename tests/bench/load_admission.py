@@ -0,0 +1,156 @@
+"""
+Load test: per-stage admission control (migration 012).
+
+Boots the Admin API against the PostgREST stand-in and a stub n8n that,
+like n8n, acknowledges each webhook at once and then works for
+--work-seconds per job before writing the job's next status back.
+
+  queue mode   --jobs topics go through /generate-script/batch, then every
+               job in review is approved (render). Waits until all of them
+               are READY_TO_PUBLISH and checks that n8n never had more
+               jobs running per stage than the stage limit, and that the
+               wait is recorded in taxfix_stage_queue_wait_seconds.
+  reject mode  ADMISSION_MODE=reject with ADMISSION_MAX_QUEUED=--max-queued:
+               a burst of single /generate-script calls must get 429s with
+               a Retry-After header once the backlog is full.
+
+    python -m tests.bench.load_admission --jobs 60 --generate-limit 4 --render-limit 2
+"""
+import argparse
+import asyncio
+import re
+import sys
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+from tests.bench.harness import api_env, serve
+
+WAIT_METRIC = re.compile(r'^taxfix_stage_queue_wait_seconds_(sum|count)\{stage="(\w+)"\} ([0-9.e+]+)$', re.M)
+
+
+async def wait_for_status(pg: httpx.AsyncClient, ids: set, status: str, timeout: float) -> Counter:
+    deadline = time.perf_counter() + timeout
+    while True:
+        rows = (await pg.get("/rest/v1/content_queue", params={"select": "id,status"})).json()
+        statuses = Counter(r["status"] for r in rows if r["id"] in ids)
+        if statuses[status] == len(ids) or time.perf_counter() > deadline:
+            return statuses
+        await asyncio.sleep(0.2)
+
+
+def queue_wait(metrics_text: str) -> dict:
+    values = {}
+    for kind, stage, value in WAIT_METRIC.findall(metrics_text):
+        values.setdefault(stage, {})[kind] = float(value)
+    return {stage: (v.get("sum", 0) / v["count"] if v.get("count") else None, int(v.get("count", 0)))
+            for stage, v in values.items()}
+
+
+async def queue_mode(args, pg_url: str, n8n_url: str) -> bool:
+    env = api_env(pg_url, n8n_url, OUTBOX_POLL_INTERVAL="0.2",
+                  STAGE_LIMIT_GENERATE=str(args.generate_limit), STAGE_LIMIT_RENDER=str(args.render_limit))
+    with serve("admin_api.main:app", env=env) as api:
+        async with httpx.AsyncClient(base_url=api, timeout=60) as client, \
+                httpx.AsyncClient(base_url=pg_url, timeout=60) as pg, \
+                httpx.AsyncClient(base_url=n8n_url, timeout=30) as n8n:
+            prefix = uuid.uuid4().hex[:6]
+            t0 = time.perf_counter()
+            r = await client.post("/generate-script/batch", json={"items": [
+                {"topic": f"admission-{prefix}-{i}", "source_url": "https://example.org"} for i in range(args.jobs)]})
+            r.raise_for_status()
+            ids = {item["job"]["id"] for item in r.json()["results"] if item["job"]}
+            statuses = await wait_for_status(pg, ids, "PENDING_REVIEW", args.timeout)
+            t_generate = time.perf_counter() - t0
+
+            r = await client.post("/approve-script/batch", json={"ids": sorted(ids)})
+            r.raise_for_status()
+            statuses = await wait_for_status(pg, ids, "READY_TO_PUBLISH", args.timeout)
+            t_total = time.perf_counter() - t0
+
+            n8n_stats = (await n8n.get("/_stats")).json()
+            stats = (await client.get("/admission/stats")).json()
+            waits = queue_wait((await client.get("/metrics")).text)
+
+    peak = n8n_stats["peak_working"]
+    peak_generate = peak.get("generate-script-batch", 0)
+    peak_render = peak.get("render-video-batch", 0)
+    # Lower bound with perfect packing: every slot busy all the time
+    ideal = args.work_seconds * (-(-args.jobs // args.generate_limit) + -(-args.jobs // args.render_limit))
+    print(f"queue mode: {args.jobs} jobs generated in {t_generate:.1f}s, rendered after {t_total:.1f}s "
+          f"(ideal {ideal:.1f}s)")
+    print(f"  peak jobs running in n8n: generate {peak_generate} (limit {args.generate_limit}), "
+          f"render {peak_render} (limit {args.render_limit})")
+    for stage, (mean, count) in sorted(waits.items()):
+        print(f"  queue wait {stage}: mean {mean or 0:.2f}s over {count} triggers")
+    print(f"  /admission/stats: {stats}")
+
+    ok = True
+    if statuses["READY_TO_PUBLISH"] != len(ids) or len(ids) != args.jobs:
+        print(f"FAIL: {dict(statuses)} of {args.jobs} jobs")
+        ok = False
+    if peak_generate > args.generate_limit or peak_render > args.render_limit:
+        print("FAIL: a stage limit was exceeded")
+        ok = False
+    if waits.get("render", (None, 0))[1] != args.jobs:
+        print("FAIL: render queue wait not recorded for every job")
+        ok = False
+    return ok
+
+
+async def reject_mode(args, pg_url: str, n8n_url: str) -> bool:
+    env = api_env(pg_url, n8n_url, OUTBOX_POLL_INTERVAL="0.2", STAGE_LIMIT_GENERATE=str(args.generate_limit),
+                  ADMISSION_MODE="reject", ADMISSION_MAX_QUEUED=str(args.max_queued),
+                  ADMISSION_LOAD_TTL="0.2")
+    with serve("admin_api.main:app", env=env) as api:
+        async with httpx.AsyncClient(base_url=api, timeout=60) as client:
+            results = Counter()
+            retry_after = set()
+            for _ in range(args.burst):
+                r = await client.post("/generate-script", json={
+                    "topic": f"reject-{uuid.uuid4()}", "source_url": "https://example.org"})
+                results[r.status_code] += 1
+                if r.status_code == 429:
+                    retry_after.add(r.headers.get("Retry-After"))
+            stats = (await client.get("/admission/stats")).json()
+
+    print(f"reject mode: {args.burst} single /generate-script calls -> {dict(results)}, "
+          f"Retry-After values {sorted(retry_after)}")
+    print(f"  /admission/stats: rejected {stats['rejected']}, queued {stats['queued']}")
+
+    ok = True
+    if not results[429] or None in retry_after:
+        print("FAIL: no 429 with Retry-After once the backlog was full")
+        ok = False
+    if results[200] < args.max_queued:
+        print("FAIL: requests rejected before the backlog was full")
+        ok = False
+    return ok
+
+
+async def run(args) -> int:
+    with serve("tests.bench.stub_postgrest:app", env={"STUB_ROWS": "50"}) as pg_url, \
+            serve("tests.bench.stub_n8n:app", env={"STUB_N8N_WORK_SECONDS": str(args.work_seconds),
+                                                   "STUB_N8N_POSTGREST_URL": pg_url}) as n8n_url:
+        ok = await queue_mode(args, pg_url, n8n_url)
+        ok = await reject_mode(args, pg_url, n8n_url) and ok
+    print("\nRESULT:", "OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--work-seconds", type=float, default=0.5)
+    parser.add_argument("--generate-limit", type=int, default=4)
+    parser.add_argument("--render-limit", type=int, default=2)
+    parser.add_argument("--max-queued", type=int, default=10)
+    parser.add_argument("--burst", type=int, default=30)
+    parser.add_argument("--timeout", type=float, default=120)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
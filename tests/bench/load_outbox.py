@@ -0,0 +1,152 @@
+"""
+Throughput test for the workflow trigger outbox against a flaky n8n.
+
+Boots the Admin API against the PostgREST stand-in (which emulates the
+migration 011 trigger and RPCs) and a stub n8n that fails --fail-rate of
+its calls. Then:
+  1. queues --jobs new topics through /generate-script/batch (plus a few
+     single /generate-script calls),
+  2. bulk-approves every job in review (render triggers),
+  3. waits until no outbox row is PENDING / IN_FLIGHT.
+It reports delivery throughput, webhook calls vs jobs (batching), retries
+and peak concurrent calls per webhook. Exits non-zero if a row is stuck,
+a per-target cap was exceeded, or a terminally failed job is not ERROR
+with its error_log set.
+
+    python -m tests.bench.load_outbox --jobs 2000 --fail-rate 0.3
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+from tests.bench.harness import api_env, serve
+
+
+async def queue_jobs(client: httpx.AsyncClient, n: int, chunk: int) -> int:
+    prefix = uuid.uuid4().hex[:6]
+    topics = [f"outbox-{prefix}-{i}" for i in range(n)]
+    singles, batched = topics[:20], topics[20:]
+
+    async def batch(items):
+        r = await client.post("/generate-script/batch", json={
+            "items": [{"topic": t, "source_url": "https://example.org"} for t in items]})
+        r.raise_for_status()
+        return r.json()["queued"]
+
+    async def single(topic):
+        r = await client.post("/generate-script", json={"topic": topic, "source_url": "https://example.org"})
+        r.raise_for_status()
+        return 1
+
+    counts = await asyncio.gather(*[batch(batched[i:i + chunk]) for i in range(0, len(batched), chunk)],
+                                  *[single(t) for t in singles])
+    return sum(counts)
+
+
+async def approve_all(client: httpx.AsyncClient, pg: httpx.AsyncClient) -> int:
+    rows = (await pg.get("/rest/v1/content_queue", params={"status": "eq.PENDING_REVIEW", "select": "id"})).json()
+    r = await client.post("/approve-script/batch", json={"ids": [row["id"] for row in rows][:500]})
+    r.raise_for_status()
+    return r.json()["queued"]
+
+
+async def outbox_rows(pg: httpx.AsyncClient) -> list:
+    return (await pg.get("/rest/v1/workflow_outbox")).json()
+
+
+async def run(args) -> int:
+    n8n_env = {"STUB_N8N_FAIL_RATE": str(args.fail_rate), "STUB_N8N_DELAY": str(args.n8n_delay)}
+    api_extra = {
+        "OUTBOX_POLL_INTERVAL": "0.2",
+        "OUTBOX_BACKOFF_BASE": str(args.backoff_base),
+        "OUTBOX_BACKOFF_MAX": "2",
+        "OUTBOX_BATCH_SIZE": str(args.batch_size),
+        "OUTBOX_MAX_IN_FLIGHT": str(args.max_in_flight),
+        # The stub n8n never reports back; stage limits are load_admission's concern
+        "STAGE_LIMIT_GENERATE": "0", "STAGE_LIMIT_RENDER": "0", "STAGE_LIMIT_PUBLISH": "0",
+    }
+    with serve("tests.bench.stub_n8n:app", env=n8n_env) as n8n_url, \
+            serve("tests.bench.stub_postgrest:app", env={"STUB_ROWS": "300"}) as pg_url, \
+            serve("admin_api.main:app", env=api_env(pg_url, n8n_url, **api_extra)) as api:
+        async with httpx.AsyncClient(base_url=api, timeout=120) as client, \
+                httpx.AsyncClient(base_url=pg_url, timeout=120) as pg, \
+                httpx.AsyncClient(base_url=n8n_url, timeout=30) as n8n:
+            t0 = time.perf_counter()
+            queued = await queue_jobs(client, args.jobs, args.chunk)
+            queued += await approve_all(client, pg)
+            t_queued = time.perf_counter() - t0
+
+            deadline = time.perf_counter() + args.timeout
+            while True:
+                rows = await outbox_rows(pg)
+                open_rows = [r for r in rows if r["status"] in ("PENDING", "IN_FLIGHT")]
+                if not open_rows or time.perf_counter() > deadline:
+                    break
+                await asyncio.sleep(0.2)
+            elapsed = time.perf_counter() - t0
+
+            jobs = {r["id"]: r for r in (await pg.get("/rest/v1/content_queue", params={
+                "select": "id,status,retry_count,error_log"})).json()}
+            n8n_stats = (await n8n.get("/_stats")).json()
+            dispatcher = (await client.get("/outbox/stats")).json()
+
+    by_status = Counter(r["status"] for r in rows)
+    attempts = Counter(r["attempts"] for r in rows)
+    failed = [r for r in rows if r["status"] == "FAILED"]
+    bad_failed = [r for r in failed
+                  if jobs[r["job_id"]]["status"] != "ERROR" or not jobs[r["job_id"]]["error_log"]]
+    retried_ok = [r for r in rows if r["status"] == "DELIVERED" and r["attempts"] > 1]
+    bad_retry_count = [r for r in retried_ok if jobs[r["job_id"]]["retry_count"] != r["attempts"] - 1]
+    calls = sum(n8n_stats["calls"].values())
+    peak = n8n_stats["peak_in_flight"]
+
+    print(f"queued {queued} triggers in {t_queued:.2f}s; drained in {elapsed:.2f}s "
+          f"({by_status['DELIVERED'] / elapsed:.0f} delivered/s)")
+    print(f"outbox: {dict(by_status)}  attempts histogram: {dict(sorted(attempts.items()))}")
+    print(f"n8n: {calls} webhook calls for {len(rows)} triggers "
+          f"(avg {n8n_stats and sum(n8n_stats['delivered'].values()) / max(1, calls - sum(n8n_stats['failures'].values())):.1f} jobs/successful call), "
+          f"failures {n8n_stats['failures']}")
+    print(f"peak concurrent calls per webhook: {peak} (cap {args.max_in_flight})")
+    print(f"dispatcher: {dispatcher}")
+    print(f"retried then delivered: {len(retried_ok)}; terminally failed: {len(failed)}")
+
+    ok = True
+    if open_rows:
+        print(f"FAIL: {len(open_rows)} outbox rows still open after {args.timeout}s")
+        ok = False
+    if any(v > args.max_in_flight for v in peak.values()):
+        print("FAIL: per-target in-flight cap exceeded")
+        ok = False
+    if bad_failed:
+        print(f"FAIL: {len(bad_failed)} failed triggers without ERROR status / error_log")
+        ok = False
+    if bad_retry_count:
+        print(f"FAIL: {len(bad_retry_count)} retried jobs with a wrong retry_count")
+        ok = False
+    if len(rows) != queued:
+        print(f"FAIL: {len(rows)} outbox rows for {queued} queued triggers")
+        ok = False
+    print("\nRESULT:", "OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--chunk", type=int, default=200, help="topics per /generate-script/batch call")
+    parser.add_argument("--fail-rate", type=float, default=0.3)
+    parser.add_argument("--n8n-delay", type=float, default=0.05)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--max-in-flight", type=int, default=2)
+    parser.add_argument("--backoff-base", type=float, default=0.1)
+    parser.add_argument("--timeout", type=float, default=120)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Fan-out test for the /queue/stream change feed.
+
+Opens --subscribers SSE connections to the Admin API, then:
+  1. updates --writes jobs through /approve-script (published immediately),
+  2. updates --external jobs directly in the PostgREST stand-in, the way
+     n8n does (picked up by the shared updated_at poller),
+  3. reconnects one client with its last cursor after further writes and
+     checks that the missed changes are replayed.
+It reports the delivery ratio and write-to-receipt latency per path.
+Exits non-zero if any subscriber missed a change.
+
+    python -m tests.bench.load_queue_stream --subscribers 300
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+
+from tests.bench.harness import api_env, serve, summarize
+
+
+class Listener:
+    def __init__(self):
+        self.received = {}  # job id -> first receipt time
+        self.last_cursor = None
+        self.resyncs = 0
+
+    async def run(self, client: httpx.AsyncClient, since: str = None, stop: asyncio.Event = None):
+        params = {"since": since} if since else {}
+        async with client.stream("GET", "/queue/stream", params=params) as r:
+            event, data = None, None
+            async for line in r.aiter_lines():
+                if line.startswith("id: "):
+                    self.last_cursor = line[4:]
+                elif line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: "):
+                    data = line[6:]
+                elif line == "" and event:
+                    if event == "change":
+                        job_id = json.loads(data)["row"]["id"]
+                        self.received.setdefault(job_id, time.perf_counter())
+                    elif event == "resync":
+                        self.resyncs += 1
+                    event, data = None, None
+                if stop is not None and stop.is_set():
+                    return
+
+
+async def wait_for(predicate, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.05)
+    return predicate()
+
+
+def latencies(listeners, written: dict) -> tuple:
+    samples, missed = [], 0
+    for listener in listeners:
+        for job_id, t_write in written.items():
+            if job_id in listener.received:
+                samples.append(listener.received[job_id] - t_write)
+            else:
+                missed += 1
+    return samples, missed
+
+
+async def run(args) -> int:
+    env = {"QUEUE_FEED_POLL_INTERVAL": str(args.poll_interval)}
+    with serve("tests.bench.stub_n8n:app") as n8n_url, \
+            serve("tests.bench.stub_postgrest:app", env={"STUB_ROWS": "500"}) as pg_url, \
+            serve("admin_api.main:app", env=api_env(pg_url, n8n_url, **env)) as api:
+        limits = httpx.Limits(max_connections=args.subscribers + 50)
+        async with httpx.AsyncClient(base_url=api, timeout=None, limits=limits) as client, \
+                httpx.AsyncClient(base_url=pg_url, timeout=30) as pg:
+            jobs = [row["id"] for row in (await client.get("/active-queue", params={"limit": 200})).json()]
+            api_ids = jobs[:args.writes]
+            ext_ids = jobs[args.writes:args.writes + args.external]
+
+            listeners = [Listener() for _ in range(args.subscribers)]
+            tasks = [asyncio.create_task(l.run(client)) for l in listeners]
+            connected = await wait_for(lambda: all(l.last_cursor for l in listeners), 30)
+            print(f"{args.subscribers} subscribers connected: {connected}")
+
+            # 1. Writes through the API
+            written_api = {}
+            for job_id in api_ids:
+                written_api[job_id] = time.perf_counter()
+                await client.post("/approve-script", json={
+                    "id": job_id, "script_structure": {}, "blog_content": {}, "social_metrics": {}})
+
+            # 2. External writes (n8n-style, straight to PostgREST)
+            written_ext = {}
+            for job_id in ext_ids:
+                written_ext[job_id] = time.perf_counter()
+                await pg.patch("/rest/v1/content_queue", params={"id": f"eq.{job_id}"},
+                               json={"status": "READY_TO_PUBLISH"})
+
+            everything = {**written_api, **written_ext}
+            await wait_for(lambda: all(len(l.received) >= len(everything) for l in listeners),
+                           args.poll_interval * 4 + 10)
+
+            # 3. Resume: disconnect one client, write more, reconnect with its cursor
+            probe = listeners[0]
+            tasks[0].cancel()
+            resume_ids = jobs[-5:]
+            for job_id in resume_ids:
+                await client.post("/publish-video", json={"id": job_id})
+            resumed = Listener()
+            stop = asyncio.Event()
+            resume_task = asyncio.create_task(resumed.run(client, since=probe.last_cursor, stop=stop))
+            replayed = await wait_for(lambda: all(i in resumed.received for i in resume_ids), 10)
+            stop.set()
+
+            for t in tasks + [resume_task]:
+                t.cancel()
+            await asyncio.gather(*tasks, resume_task, return_exceptions=True)
+
+    api_lat, api_missed = latencies(listeners[1:], written_api)
+    ext_lat, ext_missed = latencies(listeners[1:], written_ext)
+    for name, lat, missed, n in (("api writes", api_lat, api_missed, len(written_api)),
+                                 ("external writes", ext_lat, ext_missed, len(written_ext))):
+        s = summarize(lat)
+        print(f"{name:16} deliveries {s['count']}/{n * (len(listeners) - 1)} missed={missed} "
+              f"p50 {s['p50_ms']}ms p99 {s['p99_ms']}ms max {s['max_ms']}ms")
+    print(f"resume from cursor replayed {len(resumed.received)} changes "
+          f"(expected {len(resume_ids)}): {'OK' if replayed else 'FAIL'}")
+    print(f"resyncs seen: {sum(l.resyncs for l in listeners)} (initial connect sends one each)")
+
+    ok = api_missed == 0 and ext_missed == 0 and replayed
+    print("\nRESULT:", "OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=300)
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--external", type=int, default=20)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Load test: /rag/search and its query-embedding cache (admin_api/rag.py).
+
+Boots the Admin API against the PostgREST stand-in (with --laws tax_laws
+rows, embedded by the stub) and the stub embeddings server (--latency per
+call), then once each with the cache on, with the cache on and
+RAG_BACKEND=index, and with QUERY_EMBEDDING_CACHE_SIZE=0:
+
+  burst   --burst concurrent searches for one new query: must cost one
+          embeddings call (coalesced), cache or not
+  steady  --concurrency closed-loop clients for --duration seconds; 80%
+          of the searches are recurring queries ("Home Office Pauschale",
+          "Werbungskosten", ... in varying case and spacing), 20% one-offs
+
+and reports latency (overall, and embedding / retrieval time as the API
+reports them), embeddings calls per search (counted by the stub)
+and the hit ratio / calls saved reported by /rag/stats and /metrics.
+
+--check only runs the assertions on rag.normalize / rag.cache_key and exits.
+
+    python -m tests.bench.load_rag_search --duration 20 --concurrency 16
+    python -m tests.bench.load_rag_search --check
+"""
+import argparse
+import asyncio
+import random
+import re
+import sys
+import time
+import uuid
+
+import httpx
+
+from tests.bench.harness import STUB_SUPABASE_KEY, serve, summarize
+
+RECURRING = ["Home Office Pauschale", "Werbungskosten", "Pendlerpauschale", "Kinderfreibetrag",
+             "Arbeitszimmer absetzen", "Handwerkerleistungen", "Riester Rente", "Kirchensteuer",
+             "Sonderausgaben", "Steuerklasse wechseln"]
+HIT_RATIO_METRIC = re.compile(r"^taxfix_rag_hit_ratio ([0-9.e+-]+)$", re.M)
+
+
+def check():
+    """Assertions on rag.normalize (what gets embedded) and rag.cache_key (what shares an entry)."""
+    from admin_api import rag
+
+    key = lambda text: rag.cache_key(rag.normalize(text))
+    # Embedded as typed, up to Unicode form and whitespace
+    assert rag.normalize("  Home   Office\tPauschale\n") == "Home Office Pauschale"
+    assert rag.normalize("Außergewöhnliche Belastungen") == "Außergewöhnliche Belastungen"
+    assert rag.normalize("Steuer\u00a0klasse") == "Steuer klasse"  # no-break space
+    assert rag.normalize("\uff25\uff33\uff54\uff27 \u00a7 9") == "EStG § 9"  # full-width, NFKC
+    assert rag.normalize("\ufb01nanzamt") == "finanzamt"  # ligature
+    assert rag.normalize("Cafe\u0301") == rag.normalize("Caf\u00e9")  # composed
+    assert rag.normalize(" \t\n ") == ""
+    # One cache entry per query regardless of case and spacing
+    assert key("Home Office Pauschale") == key("home office  PAUSCHALE") == "home office pauschale"
+    assert key("Straße") == key("STRASSE") == "strasse"  # casefold, not lower
+    for rng_seed in range(20):
+        rng = random.Random(rng_seed)
+        query = rng.choice(RECURRING)
+        assert key(variant(rng, query)) == query.casefold()
+    print("normalize checks OK")
+
+
+def variant(rng: random.Random, text: str) -> str:
+    """The same query as a user might type it: case and spacing vary."""
+    words = [w.lower() if rng.random() < 0.3 else w for w in text.split()]
+    return (" " if rng.random() < 0.2 else "") + ("  " if rng.random() < 0.2 else " ").join(words)
+
+
+async def seed_laws(pg: httpx.AsyncClient, ai: httpx.AsyncClient, count: int):
+    """tax_laws rows for the recurring queries and filler laws."""
+    texts = list(RECURRING) + [f"§ {i} EStG filler law {i}" for i in range(count - len(RECURRING))]
+    data = (await ai.post("/v1/embeddings", json={"input": texts, "model": "text-embedding-3-small"})).json()["data"]
+    rows = [{"content": text, "metadata": {"source": "load_rag_search", "year": 2024},
+             "embedding": "[%s]" % ",".join("%.9g" % x for x in item["embedding"])}
+            for text, item in zip(texts, data)]
+    await pg.post("/rest/v1/tax_laws", json=rows)
+
+
+async def run_mode(args, label: str, pg_url: str, ai_url: str, ai: httpx.AsyncClient, extra_env: dict) -> dict:
+    env = {"SUPABASE_URL": pg_url, "SUPABASE_KEY": STUB_SUPABASE_KEY, "OPENAI_API_KEY": "stub",
+           "OPENAI_BASE_URL": f"{ai_url}/v1", **extra_env}
+    rng = random.Random(1)
+    with serve("admin_api.main:app", env=env) as api:
+        async with httpx.AsyncClient(base_url=api, timeout=60) as client:
+            calls = lambda: ai.get("/_stats")
+            before = (await calls()).json()["requests"]
+            query = f"Abgeltungsteuer {uuid.uuid4().hex[:6]}"
+            responses = await asyncio.gather(*(client.post("/rag/search", json={"query": query})
+                                               for _ in range(args.burst)))
+            burst_calls = (await calls()).json()["requests"] - before
+            burst_errors = sum(1 for r in responses if r.status_code != 200)
+
+            def body():
+                if rng.random() < 0.8:
+                    return {"query": variant(rng, rng.choice(RECURRING))}
+                return {"query": f"Einmalige Frage {uuid.uuid4().hex[:8]}"}
+
+            before = (await calls()).json()["requests"]
+            latencies, errors = [], 0
+            stop_at = time.perf_counter() + args.duration
+            outcomes, embedding_ms, search_ms = {}, {}, []
+
+            async def worker():
+                nonlocal errors
+                while time.perf_counter() < stop_at:
+                    t0 = time.perf_counter()
+                    r = await client.post("/rag/search", json=body())
+                    latencies.append(time.perf_counter() - t0)
+                    if r.status_code != 200:
+                        errors += 1
+                        continue
+                    result = r.json()
+                    outcomes[result["embedding"]] = outcomes.get(result["embedding"], 0) + 1
+                    embedding_ms.setdefault(result["embedding"], []).append(result["embedding_ms"] / 1000)
+                    search_ms.append(result["search_ms"] / 1000)
+                    if not result["results"]:
+                        errors += 1  # every query has at least its own law or a filler above -1
+
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            steady_calls = (await calls()).json()["requests"] - before
+            stats = (await client.get("/rag/stats")).json()
+            exported = HIT_RATIO_METRIC.search((await client.get("/metrics")).text)
+
+    return {"mode": label, "burst_calls": burst_calls, "burst_errors": burst_errors,
+            **summarize(latencies, errors, args.duration), "searches": len(latencies),
+            "embedding_calls": steady_calls, "outcomes": outcomes, "stats": stats,
+            "embedding_p50": {k: summarize(v)["p50_ms"] for k, v in embedding_ms.items()},
+            "search_p50": summarize(search_ms)["p50_ms"],
+            "metrics_hit_ratio": float(exported.group(1)) if exported else None}
+
+
+async def main_async(args) -> bool:
+    ai_env = {"STUB_OPENAI_LATENCY": str(args.latency)}
+    pg_env = {"STUB_ROWS": "0"}
+    with serve("tests.bench.stub_postgrest:app", env=pg_env) as pg_url, \
+            serve("tests.bench.stub_openai:app", env=ai_env) as ai_url:
+        async with httpx.AsyncClient(base_url=pg_url, timeout=60) as pg, \
+                httpx.AsyncClient(base_url=ai_url, timeout=60) as ai:
+            await seed_laws(pg, ai, args.laws)
+            results = [
+                await run_mode(args, "cache", pg_url, ai_url, ai, {"RAG_MATCH_THRESHOLD": "-1"}),
+                await run_mode(args, "index", pg_url, ai_url, ai,
+                               {"RAG_MATCH_THRESHOLD": "-1", "RAG_BACKEND": "index"}),
+                await run_mode(args, "no-cache", pg_url, ai_url, ai,
+                               {"RAG_MATCH_THRESHOLD": "-1", "QUERY_EMBEDDING_CACHE_SIZE": "0"}),
+            ]
+
+    print(f"\n{'mode':>9} | {'burst':>5} {'calls':>5} | {'searches':>8} {'err':>4} {'rps':>6} {'p50 ms':>7} "
+          f"{'p95 ms':>7} | {'calls':>6} {'per search':>10} {'hit ratio':>9} {'saved':>6} {'/metrics':>8}")
+    ok = True
+    for r in results:
+        stats = r["stats"]
+        print(f"{r['mode']:>9} | {args.burst:>5} {r['burst_calls']:>5} | {r['searches']:>8} {r['errors']:>4} "
+              f"{r['rps']:>6.1f} {r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f} | {r['embedding_calls']:>6} "
+              f"{r['embedding_calls'] / max(1, r['searches']):>10.2f} {stats['hit_ratio']:>9.1%} "
+              f"{stats['embedding_calls_saved']:>6} {r['metrics_hit_ratio'] or 0:>8.1%}")
+        print(f"{'':>9}   searches by embedding outcome {r['outcomes']}, embedding p50 ms "
+              f"{r['embedding_p50']}, retrieval p50 {r['search_p50']} ms")
+        ok &= r["burst_calls"] == 1 and not r["burst_errors"] and not r["errors"]
+    print(f"\n(stub embeddings latency {args.latency}s, {args.laws} tax_laws rows; calls: requests the stub "
+          f"received; saved: hits + coalesced on /rag/stats, burst included)")
+    if not ok:
+        print("FAILED: a burst cost more than one embeddings call, or searches failed")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--laws", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per embeddings call")
+    parser.add_argument("--check", action="store_true", help="run the normalize assertions and exit")
+    args = parser.parse_args()
+    if args.check:
+        return check()
+    sys.exit(0 if asyncio.run(main_async(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
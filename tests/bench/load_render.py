@@ -0,0 +1,177 @@
+"""
+Load test: render scheduler processes sharing one PENDING_RENDER queue.
+
+Fills the PostgREST stand-in with --jobs PENDING_RENDER jobs (a quarter
+of them with render_priority 5), then starts --schedulers
+admin_api.render_scheduler processes with --slots renders each. editly
+is replaced by tests/bench/fake_editly (--render-seconds per render,
+--fail-rate of them failing). While they work, one scheduler is killed
+with SIGKILL (its leases must expire and its jobs be rendered again with
+retry_count + 1) and one is stopped with SIGTERM (it must drain, give its
+leases back and exit 0).
+
+Checks: every job ends READY_TO_PUBLISH with a video_url, no scheduler
+ever ran more than --slots renders, no job was rendered by two live
+schedulers at once, and priority jobs started first.
+
+    python -m tests.bench.load_render --jobs 60 --schedulers 3 --slots 2
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from tests.bench.harness import ROOT, STUB_SUPABASE_KEY, serve
+
+
+def job_rows(n: int) -> list:
+    return [{"topic": f"render-{i}", "status": "PENDING_RENDER", "render_priority": 5 if i % 4 == 0 else 0,
+             "script_content": {"hook": "Hook", "body": "Body " * 40, "cta": "CTA"}} for i in range(n)]
+
+
+def start_scheduler(tag: str, pg_url: str, out_dir: str, log: str, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "SUPABASE_URL": pg_url, "SUPABASE_KEY": STUB_SUPABASE_KEY,
+        "RENDER_CONCURRENCY": str(args.slots),
+        "RENDER_COMMAND": f"{sys.executable} -m tests.bench.fake_editly {{spec}}",
+        "RENDER_OUTPUT_DIR": out_dir,
+        "RENDER_VIDEO_BASE_URL": "http://localhost/files",
+        "RENDER_LEASE_SECONDS": str(args.lease_seconds),
+        "RENDER_POLL_INTERVAL": "0.2",
+        "RENDER_BACKOFF_BASE": "0.2",
+        "RENDER_DRAIN_TIMEOUT": "0.2",
+        "FAKE_EDITLY_SECONDS": str(args.render_seconds),
+        "FAKE_EDITLY_FAIL_RATE": str(args.fail_rate),
+        "FAKE_EDITLY_LOG": log,
+        "FAKE_EDITLY_TAG": tag,
+    }
+    env.pop("METRICS_PORT", None)
+    return subprocess.Popen([sys.executable, "-m", "admin_api.render_scheduler"], cwd=ROOT, env=env)
+
+
+def renders(log: str) -> list:
+    runs = []
+    with open(log) as f:
+        for line in f:
+            run = json.loads(line)
+            run["job"] = run["out"].split(".")[1][len("video_"):]
+            runs.append(run)
+    return runs
+
+
+def peak_concurrency(runs: list) -> int:
+    events = sorted([(r["start"], 1) for r in runs] + [(r["end"], -1) for r in runs])
+    peak = current = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=60)
+    parser.add_argument("--schedulers", type=int, default=3)
+    parser.add_argument("--slots", type=int, default=2)
+    parser.add_argument("--render-seconds", type=float, default=0.5)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    parser.add_argument("--lease-seconds", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=180)
+    args = parser.parse_args()
+    if args.schedulers < 3:
+        parser.error("--schedulers must be at least 3 (one is killed, one stopped)")
+
+    out_dir = tempfile.mkdtemp(prefix="renders-")
+    log = os.path.join(out_dir, "runs.jsonl")
+    with serve("tests.bench.stub_postgrest:app", env={"STUB_ROWS": "0"}) as pg_url, \
+            httpx.Client(base_url=pg_url, timeout=30) as pg:
+        jobs = pg.post("/rest/v1/content_queue", json=job_rows(args.jobs)).json()
+        priority = {j["id"] for j in jobs if j["render_priority"]}
+
+        t0 = time.perf_counter()
+        procs = {f"s{i}": start_scheduler(f"s{i}", pg_url, out_dir, log, args) for i in range(args.schedulers)}
+        try:
+            # Once both hold leases, kill one and stop the other
+            victims = {f":{procs['s0'].pid}", f":{procs['s1'].pid}"}
+            deadline = time.perf_counter() + 60
+            while time.perf_counter() < deadline:
+                owners = {r["render_lease_owner"] for r in pg.get("/rest/v1/content_queue", params={
+                    "select": "render_lease_owner"}).json() if r["render_lease_owner"]}
+                if all(any(o.endswith(v) for o in owners) for v in victims):
+                    break
+                time.sleep(0.05)
+            time.sleep(args.render_seconds / 2)
+            procs["s0"].kill()
+            procs["s1"].send_signal(signal.SIGTERM)
+            s1_exit = procs["s1"].wait(timeout=30)
+
+            deadline = time.perf_counter() + args.timeout
+            while time.perf_counter() < deadline:
+                rows = pg.get("/rest/v1/content_queue", params={
+                    "select": "id,status,retry_count,video_url,error_log"}).json()
+                if all(r["status"] != "PENDING_RENDER" for r in rows):
+                    break
+                time.sleep(0.2)
+            elapsed = time.perf_counter() - t0
+        finally:
+            for proc in procs.values():
+                if proc.poll() is None:
+                    proc.terminate()
+                    proc.wait(timeout=30)
+    time.sleep(args.render_seconds + 0.5)  # fake_editly children of the killed scheduler
+    runs = renders(log)
+
+    by_status = Counter(r["status"] for r in rows)
+    retries = Counter(r["retry_count"] for r in rows)
+    per_tag = {tag: peak_concurrency([r for r in runs if r["tag"] == tag]) for tag in procs}
+    # Two live schedulers rendering the same job at once (s0's orphaned editly may overlap)
+    overlaps = 0
+    live = sorted((r for r in runs if r["tag"] != "s0"), key=lambda r: (r["job"], r["start"]))
+    for a, b in zip(live, live[1:]):
+        if a["job"] == b["job"] and b["start"] < a["end"]:
+            overlaps += 1
+    first = sorted((r for r in runs if r["tag"] != "s0"), key=lambda r: r["start"])
+    order = {job: i for i, job in enumerate(dict.fromkeys(r["job"] for r in first))}
+    rank = lambda ids: sum(order.get(j, len(order)) for j in ids) / max(1, len(ids))
+    normal = {r["id"] for r in rows} - priority
+
+    print(f"{args.jobs} jobs, {args.schedulers} schedulers x {args.slots} slots, "
+          f"{args.render_seconds}s renders, fail rate {args.fail_rate}: done in {elapsed:.1f}s "
+          f"(ideal {args.jobs * args.render_seconds / ((args.schedulers - 2) * args.slots):.1f}s "
+          f"with the surviving schedulers)")
+    print(f"  statuses {dict(by_status)}, retry_count histogram {dict(sorted(retries.items()))}, "
+          f"{len(runs)} editly runs ({sum(not r['ok'] for r in runs)} failed)")
+    print(f"  peak renders per scheduler {per_tag}; SIGTERM'd scheduler exited with {s1_exit}")
+    print(f"  mean start rank: priority jobs {rank(priority):.1f}, others {rank(normal):.1f}")
+
+    ok = True
+    if by_status["READY_TO_PUBLISH"] != args.jobs or any(not r["video_url"] for r in rows
+                                                         if r["status"] == "READY_TO_PUBLISH"):
+        print(f"FAIL: not every job rendered: {dict(by_status)}")
+        ok = False
+    if any(peak > args.slots for peak in per_tag.values()):
+        print("FAIL: a scheduler exceeded its slots")
+        ok = False
+    if overlaps:
+        print(f"FAIL: {overlaps} jobs rendered by two schedulers at once")
+        ok = False
+    if s1_exit != 0:
+        print("FAIL: the SIGTERM'd scheduler did not exit cleanly")
+        ok = False
+    if rank(priority) >= rank(normal):
+        print("FAIL: priority jobs did not start first")
+        ok = False
+    print("\nRESULT:", "OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
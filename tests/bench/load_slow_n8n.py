@@ -0,0 +1,86 @@
+"""
+Load test: read endpoints must stay fast while n8n is slow.
+
+Boots the Admin API against the local PostgREST and n8n stand-ins, with
+n8n answering every webhook after --n8n-delay seconds. It measures p99 of
+/health and /active-queue first on their own and then while a burst of
+/generate-script and /approve-script calls is waiting on n8n.
+Exits non-zero if the loaded p99 is more than --max-ratio times the
+baseline (plus a small absolute allowance for scheduler noise).
+
+Since triggers go through the outbox (migration 011) the write requests
+return before n8n is called, so writers pause --write-think-time between
+requests to keep the write rate realistic instead of saturating the CPU
+the readers share.
+
+    python -m tests.bench.load_slow_n8n --n8n-delay 5 --duration 10
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+
+import httpx
+
+from tests.bench.harness import api_env, hammer, print_table, serve, summarize
+
+
+async def measure_readers(api: str, duration: float, pollers: int) -> dict:
+    async with httpx.AsyncClient(base_url=api, timeout=60) as client:
+        (health, h_err), (queue, q_err) = await asyncio.gather(
+            hammer(client, "GET", "/health", duration, pollers),
+            hammer(client, "GET", "/active-queue", duration, pollers),
+        )
+    return {
+        "/health": summarize(health, h_err, duration),
+        "/active-queue": summarize(queue, q_err, duration),
+    }
+
+
+async def webhook_burst(api: str, duration: float, writers: int, think_time: float):
+    async with httpx.AsyncClient(base_url=api, timeout=120) as client:
+        await asyncio.gather(
+            hammer(client, "POST", "/generate-script", duration, writers, think_time=think_time,
+                   body_factory=lambda: {"topic": f"load-{uuid.uuid4()}", "source_url": "https://example.org"}),
+            hammer(client, "POST", "/approve-script", duration, writers, think_time=think_time,
+                   body_factory=lambda: {"id": str(uuid.uuid4()), "script_structure": {},
+                                         "blog_content": {}, "social_metrics": {}}),
+        )
+
+
+async def run(args) -> int:
+    with serve("tests.bench.stub_n8n:app", env={"STUB_N8N_DELAY": str(args.n8n_delay)}) as n8n_url, \
+            serve("tests.bench.stub_postgrest:app") as pg_url, \
+            serve("admin_api.main:app", env=api_env(pg_url, n8n_url)) as api:
+        baseline = await measure_readers(api, args.duration, args.pollers)
+        _, loaded = await asyncio.gather(
+            webhook_burst(api, args.duration, args.writers, args.write_think_time),
+            measure_readers(api, args.duration, args.pollers),
+        )
+
+    print_table("Baseline (no webhook traffic)", baseline)
+    print_table(f"While n8n answers after {args.n8n_delay}s", loaded)
+
+    failed = False
+    for route in baseline:
+        limit = baseline[route]["p99_ms"] * args.max_ratio + 50
+        if loaded[route]["p99_ms"] > limit:
+            print(f"FAIL {route}: p99 {loaded[route]['p99_ms']}ms > {limit:.1f}ms")
+            failed = True
+    print("\nRESULT:", "FAIL" if failed else "OK (p99 flat under slow n8n)")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--pollers", type=int, default=20)
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--write-think-time", type=float, default=0.5)
+    parser.add_argument("--n8n-delay", type=float, default=5)
+    parser.add_argument("--max-ratio", type=float, default=3.0)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
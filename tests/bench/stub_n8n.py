@@ -0,0 +1,92 @@
+"""
+Local stand-in for the n8n webhook endpoints.
+
+Every POST to /webhook/... is acknowledged after STUB_N8N_DELAY seconds.
+STUB_N8N_FAIL_RATE (0..1) makes that share of calls answer 500.
+/_stats reports calls, failures, jobs delivered (batched bodies count
+each entry of "jobs") and peak concurrent calls per webhook.
+
+Like n8n, a webhook is acknowledged before the workflow runs. With
+STUB_N8N_POSTGREST_URL set, every job of a *-batch call then "works" for
+STUB_N8N_WORK_SECONDS and writes its next status back (generate ->
+PENDING_REVIEW, render -> READY_TO_PUBLISH + video_url, publish ->
+PUBLISHED); /_stats also reports peak concurrent jobs per webhook.
+"""
+import asyncio
+import json
+import os
+import random
+from collections import Counter
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+DELAY = float(os.environ.get("STUB_N8N_DELAY", "0"))
+FAIL_RATE = float(os.environ.get("STUB_N8N_FAIL_RATE", "0"))
+WORK_SECONDS = float(os.environ.get("STUB_N8N_WORK_SECONDS", "0"))
+POSTGREST_URL = os.environ.get("STUB_N8N_POSTGREST_URL")
+
+# Batched webhook -> what the workflow writes when it is done
+NEXT = {
+    "generate-script-batch": lambda job: {"status": "PENDING_REVIEW"},
+    "render-video-batch": lambda job: {"status": "READY_TO_PUBLISH",
+                                       "video_url": f"https://example.org/videos/{job}.mp4"},
+    "publish-video-batch": lambda job: {"status": "PUBLISHED"},
+}
+
+app = FastAPI()
+calls = Counter()
+failures = Counter()
+delivered = Counter()
+in_flight = Counter()
+peak_in_flight = Counter()
+working = Counter()
+peak_working = Counter()
+_tasks = set()
+
+
+async def work(path: str, job_id: str):
+    working[path] += 1
+    peak_working[path] = max(peak_working[path], working[path])
+    try:
+        await asyncio.sleep(WORK_SECONDS)
+        async with httpx.AsyncClient(base_url=POSTGREST_URL, timeout=30) as client:
+            await client.patch("/rest/v1/content_queue", params={"id": f"eq.{job_id}"},
+                               json=NEXT[path](job_id))
+    finally:
+        working[path] -= 1
+
+
+@app.post("/webhook/{path:path}")
+async def webhook(path: str, request: Request):
+    body = await request.body()
+    in_flight[path] += 1
+    peak_in_flight[path] = max(peak_in_flight[path], in_flight[path])
+    try:
+        if DELAY:
+            await asyncio.sleep(DELAY)
+    finally:
+        in_flight[path] -= 1
+    calls[path] += 1
+    if FAIL_RATE and random.random() < FAIL_RATE:
+        failures[path] += 1
+        return JSONResponse({"message": "stub failure"}, status_code=500)
+    try:
+        jobs = json.loads(body or b"{}").get("jobs")
+    except (ValueError, AttributeError):
+        jobs = None
+    delivered[path] += len(jobs) if isinstance(jobs, list) else 1
+    if POSTGREST_URL and path in NEXT and isinstance(jobs, list):
+        for job in jobs:
+            task = asyncio.create_task(work(path, job["id"]))
+            _tasks.add(task)
+            task.add_done_callback(_tasks.discard)
+    return {"message": "Workflow was started"}
+
+
+@app.get("/_stats")
+def stats():
+    return {"calls": dict(calls), "failures": dict(failures), "delivered": dict(delivered),
+            "peak_in_flight": dict(peak_in_flight), "working": dict(working),
+            "peak_working": dict(peak_working)}
@@ -0,0 +1,85 @@
+"""
+Local stand-in for the OpenAI embeddings endpoint (POST /v1/embeddings).
+
+Point the openai client at it with OPENAI_BASE_URL=<url>/v1. Each text
+gets one of STUB_EMBEDDING_POOL fixed unit vectors of STUB_EMBEDDING_DIM
+dimensions (by hash, so the same text always gets the same vector),
+pre-serialized so the stub itself stays cheap at 100k texts. Both
+encoding_format "float" and "base64" are supported.
+
+A request takes STUB_OPENAI_LATENCY seconds plus STUB_OPENAI_PER_INPUT per
+text. Like the real API it refuses more than 2048 inputs per request.
+/_stats reports requests, inputs and peak concurrent requests.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import struct
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+DIM = int(os.environ.get("STUB_EMBEDDING_DIM", "1536"))
+POOL = int(os.environ.get("STUB_EMBEDDING_POOL", "1024"))
+LATENCY = float(os.environ.get("STUB_OPENAI_LATENCY", "0.2"))
+PER_INPUT = float(os.environ.get("STUB_OPENAI_PER_INPUT", "0.0002"))
+MAX_INPUTS = 2048
+
+app = FastAPI()
+stats = {"requests": 0, "inputs": 0, "in_flight": 0, "peak_in_flight": 0, "max_batch": 0}
+
+
+def _unit_vector(rng: random.Random) -> list:
+    v = [rng.gauss(0, 1) for _ in range(DIM)]
+    norm = math.sqrt(sum(x * x for x in v))
+    return [x / norm for x in v]
+
+
+_rng = random.Random(42)
+_vectors = [_unit_vector(_rng) for _ in range(POOL)]
+_as_float = [json.dumps(v) for v in _vectors]
+_as_base64 = [json.dumps(base64.b64encode(struct.pack(f"<{DIM}f", *v)).decode()) for v in _vectors]
+
+
+def vector_index(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little") % POOL
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = json.loads(await request.body())
+    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    if len(texts) > MAX_INPUTS:
+        return JSONResponse({"error": {"message": f"Too many inputs: {len(texts)} > {MAX_INPUTS}"}},
+                            status_code=400)
+    stats["requests"] += 1
+    stats["inputs"] += len(texts)
+    stats["max_batch"] = max(stats["max_batch"], len(texts))
+    stats["in_flight"] += 1
+    stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(LATENCY + PER_INPUT * len(texts))
+    finally:
+        stats["in_flight"] -= 1
+    encoded = _as_base64 if body.get("encoding_format") == "base64" else _as_float
+    items = ",".join(f'{{"object":"embedding","index":{i},"embedding":{encoded[vector_index(t)]}}}'
+                     for i, t in enumerate(texts))
+    tokens = sum(len(t) // 4 + 1 for t in texts)
+    return Response(f'{{"object":"list","data":[{items}],"model":"{body["model"]}",'
+                    f'"usage":{{"prompt_tokens":{tokens},"total_tokens":{tokens}}}}}',
+                    media_type="application/json")
+
+
+@app.get("/_stats")
+def get_stats():
+    return stats
+
+
+@app.post("/_reset")
+def reset():
+    stats.update(requests=0, inputs=0, peak_in_flight=0, max_batch=0)
+    return stats
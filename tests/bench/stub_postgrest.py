@@ -0,0 +1,567 @@
+"""
+Local, in-memory stand-in for the Supabase PostgREST endpoint (/rest/v1).
+
+Implements the subset of PostgREST the Admin API uses: select/projection,
+eq/neq/in/lt/lte/gt/gte/is filters, order, limit/offset, insert, update and
+the RPCs from supabase/migrations (computed in Python over the same rows).
+The content_queue -> workflow_outbox trigger (migration 011), the stage
+slot release (migration 012) and the render lease reset (migration 013)
+are emulated on insert and update. `content_queue` is pre-filled with STUB_ROWS rows of
+realistic size (STUB_BODY_REPEAT scales the text payloads; lower it for
+large tables). Columns listed in STUB_DROP_COLUMNS (e.g. "embedding") are
+accepted but not stored, so large seeding runs fit in memory.
+"""
+import functools
+import itertools
+import json
+import math
+import os
+import random
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+STUB_ROWS = int(os.environ.get("STUB_ROWS", "200"))
+STUB_BODY_REPEAT = int(os.environ.get("STUB_BODY_REPEAT", "40"))
+STUB_DROP_COLUMNS = set(filter(None, os.environ.get("STUB_DROP_COLUMNS", "").split(",")))
+
+STATUSES = ["PENDING_GENERATION", "PENDING_REVIEW", "PENDING_RENDER",
+            "READY_TO_PUBLISH", "PUBLISHED", "ERROR"]
+PLATFORMS = ["TikTok", "Instagram", "YouTube", "LinkedIn"]
+RESERVED = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+app = FastAPI()
+tables = defaultdict(list)
+_outbox_ids = itertools.count(1)
+_UNSET = object()
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def enqueue_trigger(row: dict, old_trigger=_UNSET):
+    """content_queue_enqueue_trigger: copies a new workflow_trigger into workflow_outbox."""
+    trigger = row.get("workflow_trigger")
+    if trigger is None or (old_trigger is not _UNSET and trigger == old_trigger):
+        return
+    now = _now().isoformat()
+    tables["workflow_outbox"].append({
+        "id": next(_outbox_ids), "job_id": row["id"], "target": trigger["target"],
+        "payload": {**(trigger.get("payload") or {}), "id": row["id"]},
+        "status": "PENDING", "attempts": 0, "next_attempt_at": now, "locked_until": None,
+        "last_error": None, "created_at": now, "delivered_at": None, "released_at": None,
+    })
+
+
+def release_stage(row: dict):
+    """content_queue_release_stage (migration 012): the job moved on, its outbox rows give their slot up."""
+    now = _now().isoformat()
+    for o in tables["workflow_outbox"]:
+        if o["job_id"] == row["id"] and o.get("released_at") is None and o["status"] in ("IN_FLIGHT", "DELIVERED"):
+            o["released_at"] = now
+
+
+def render_queued(row: dict, old_status=_UNSET):
+    """content_queue_render_queued: entering PENDING_RENDER starts a render, leaving it drops the lease."""
+    status = row.get("status")
+    if status == "PENDING_RENDER" and (old_status is _UNSET or old_status != "PENDING_RENDER"):
+        row.update(render_queued_at=_now().isoformat(), render_lease_owner=None, render_lease_until=None,
+                   retry_count=0)
+    elif old_status == "PENDING_RENDER" and status != "PENDING_RENDER":
+        row.update(render_lease_owner=None, render_lease_until=None)
+
+
+def make_row(i: int, created_at: datetime = None) -> dict:
+    """A content_queue row with payloads sized like real LLM output."""
+    body = "Lorem ipsum dolor sit amet, steuerliche Hinweise. " * STUB_BODY_REPEAT
+    created = created_at or (_now() - timedelta(minutes=i))
+    return {
+        "id": str(uuid.uuid4()),
+        "topic": f"Stub topic {i}",
+        "source_url": f"https://example.org/news/{i}",
+        "platform": random.choice(PLATFORMS),
+        "status": random.choice(STATUSES),
+        "language": "de",
+        "compliance_score": 0.9,
+        "script_structure": {"hook": "Wusstest du...", "body": body, "cta": "Link in bio"},
+        "script_structure_en": {"hook": "Did you know...", "body": body, "cta": "Link in bio"},
+        "blog_content": {"title": f"Blog {i}", "body": body * 2, "tags": ["#steuern"]},
+        "blog_content_en": {"title": f"Blog {i}", "body": body * 2, "tags": ["#tax"]},
+        "social_metrics": {"caption": "Neue Regeln", "hashtags": ["#Steuertipps"]},
+        "validations": {"checks": ["Cites EStG § 9"], "rag_notes": body},
+        "video_url": None,
+        "retry_count": 0,
+        "error_log": None,
+        "target_platforms": [],
+        "created_at": created.isoformat(),
+        "updated_at": created.isoformat(),
+    }
+
+
+def seed(n: int):
+    tables["content_queue"] = [make_row(i) for i in range(n)]
+
+
+seed(STUB_ROWS)
+
+
+def _coerce(a, b):
+    """Compare numerically when both sides look like numbers."""
+    try:
+        return float(a), float(b)
+    except (TypeError, ValueError):
+        return ("" if a is None else str(a)), str(b)
+
+
+def _match(row: dict, column: str, expr: str) -> bool:
+    op, _, value = expr.partition(".")
+    current = row.get(column)
+    if op == "eq":
+        return str(current) == value if current is not None else False
+    if op == "neq":
+        return str(current) != value
+    if op == "in":
+        return str(current) in _in_values(value)
+    if op == "is":
+        return current is None if value == "null" else str(current).lower() == value
+    if current is None:
+        return False
+    a, b = _coerce(current, value)
+    return {"lt": a < b, "lte": a <= b, "gt": a > b, "gte": a >= b}.get(op, False)
+
+
+def _in_values(value: str) -> list:
+    """Values of an in.(...) list: `(a,"b,c","d \\"e\\"")` -> [a, b,c, d "e"]."""
+    values, current, quoted, escaped = [], "", False, False
+    for ch in value[1:-1]:
+        if escaped:
+            current, escaped = current + ch, False
+        elif quoted and ch == "\\":
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif ch == "," and not quoted:
+            values.append(current)
+            current = ""
+        else:
+            current += ch
+    return values + [current]
+
+
+def _split_top_level(expr: str) -> list:
+    """Splits `a,b(c,d),"e,f"` on commas outside parentheses and quotes."""
+    parts, depth, quoted, current = [], 0, False, ""
+    for ch in expr:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append(current)
+            current = ""
+            continue
+        current += ch
+    return parts + [current]
+
+
+def _match_logic(row: dict, op: str, terms: str) -> bool:
+    """Evaluates or=(...) / and=(...) including nested and(...)/or(...)."""
+    results = []
+    for term in _split_top_level(terms.strip()[1:-1]):
+        if term.startswith(("and(", "or(")):
+            name, _, rest = term.partition("(")
+            results.append(_match_logic(row, name, "(" + rest))
+        else:
+            column, _, expr = term.partition(".")
+            op_name, _, value = expr.partition(".")
+            results.append(_match(row, column, f"{op_name}.{value.strip(chr(34))}"))
+    return any(results) if op == "or" else all(results)
+
+
+def filter_rows(rows: list, params) -> list:
+    for column, expr in params.multi_items():
+        if column in RESERVED:
+            continue
+        if column in ("or", "and"):
+            rows = [r for r in rows if _match_logic(r, column, expr)]
+        else:
+            rows = [r for r in rows if _match(r, column, expr)]
+    return rows
+
+
+def order_rows(rows: list, order: str) -> list:
+    for part in reversed(order.split(",")):
+        column, _, direction = part.partition(".")
+        desc = direction.startswith("desc")
+        rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column) or ""), reverse=desc)
+    return rows
+
+
+def project(rows: list, select: str) -> list:
+    if not select or select == "*":
+        return rows
+    columns = [c.strip() for c in select.split(",")]
+    return [{c: r.get(c) for c in columns} for r in rows]
+
+
+@app.get("/rest/v1/{table}")
+async def select_rows(table: str, request: Request):
+    params = request.query_params
+    rows = filter_rows(tables[table], params)
+    if "order" in params:
+        rows = order_rows(rows, params["order"])
+    offset = int(params.get("offset", 0))
+    limit = int(params["limit"]) if "limit" in params else None
+    total = len(rows)
+    rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+    headers = {"Content-Range": f"{offset}-{offset + len(rows) - 1}/{total}"}
+    return JSONResponse(project(rows, params.get("select", "*")), headers=headers)
+
+
+@app.post("/rest/v1/{table}")
+async def insert_rows(table: str, request: Request):
+    """Insert, or upsert with ?on_conflict=col[,col] and Prefer: resolution=..."""
+    body = json.loads(await request.body() or b"[]")
+    body = body if isinstance(body, list) else [body]
+    conflict = request.query_params.get("on_conflict")
+    prefer = request.headers.get("prefer", "")
+    key = lambda r: tuple(r.get(c) for c in conflict.split(","))
+    by_key = {key(r): r for r in tables[table]} if conflict else {}
+    created = []
+    for item in body:
+        for column in STUB_DROP_COLUMNS.intersection(item):
+            del item[column]
+        now = _now().isoformat()
+        if conflict and key(item) in by_key:
+            if "resolution=merge-duplicates" in prefer:
+                row = by_key[key(item)]
+                old_trigger = row.get("workflow_trigger")
+                row.update(item)
+                row["updated_at"] = now
+                if table == "content_queue":
+                    enqueue_trigger(row, old_trigger)
+                created.append(row)
+            continue  # ignore-duplicates (or a unique violation) returns nothing for it
+        row = {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **item}
+        tables[table].append(row)
+        if table == "content_queue":
+            render_queued(row)
+            enqueue_trigger(row)
+        if conflict:
+            by_key[key(row)] = row
+        created.append(row)
+    return JSONResponse(created, status_code=201)
+
+
+@app.patch("/rest/v1/{table}")
+async def update_rows(table: str, request: Request):
+    changes = json.loads(await request.body() or b"{}")
+    matched = filter_rows(tables[table], request.query_params)
+    for row in matched:
+        old_trigger = row.get("workflow_trigger")
+        old = (row.get("status"), row.get("video_url"), row.get("published_url"))
+        row.update(changes)
+        row["updated_at"] = _now().isoformat()
+        if table == "content_queue":
+            render_queued(row, old[0])
+            republished = (changes.get("status") == "PUBLISHED"
+                           and row.get("workflow_trigger") == old_trigger)
+            if (row.get("status"), row.get("video_url"), row.get("published_url")) != old or republished:
+                release_stage(row)
+            enqueue_trigger(row, old_trigger)
+    return JSONResponse(matched)
+
+
+@app.delete("/rest/v1/{table}")
+async def delete_rows(table: str, request: Request):
+    matched = filter_rows(tables[table], request.query_params)
+    ids = {id(r) for r in matched}
+    tables[table] = [r for r in tables[table] if id(r) not in ids]
+    return JSONResponse(matched)
+
+
+# ---------------------------------------------------------------------------
+# RPCs
+# ---------------------------------------------------------------------------
+
+def content_queue_stats(days: int = 7) -> dict:
+    rows = tables["content_queue"]
+    today = datetime.now(timezone.utc).date()
+    first = today - timedelta(days=days - 1)
+    daily = {first + timedelta(days=i): Counter() for i in range(days)}
+    for r in rows:
+        day = datetime.fromisoformat(r["created_at"]).date()
+        if day in daily:
+            daily[day][r.get("platform") or "Unknown"] += 1
+    return {
+        "total": len(rows),
+        "status_counts": dict(Counter(r.get("status") or "PENDING" for r in rows)),
+        "platform_counts": dict(Counter(r.get("platform") or "Unknown" for r in rows)),
+        "daily": [{"date": d.isoformat(), "total": sum(c.values()), "platforms": dict(c)}
+                  for d, c in sorted(daily.items())],
+    }
+
+
+def content_queue_bulk_transition(job_ids: list, to_status: str = None, platforms: list = None,
+                                  from_statuses: list = None, actor: str = "admin_api",
+                                  audit_note: str = None, mark_reviewed: bool = False,
+                                  workflow_target: str = None, priority: int = None) -> list:
+    """Mirrors migrations 010/011/013: one call updates the allowed rows, audits and enqueues them."""
+    wanted = set(job_ids)
+    result = []
+    for row in tables["content_queue"]:
+        if row["id"] not in wanted:
+            continue
+        old = row.get("status")
+        allowed = from_statuses is None or old in from_statuses
+        if allowed:
+            now = _now().isoformat()
+            row["status"] = to_status or old
+            render_queued(row, old)
+            if row["status"] != old:
+                release_stage(row)
+            if platforms is not None:
+                row["target_platforms"] = platforms
+            if priority is not None:
+                row["render_priority"] = priority
+            if mark_reviewed:
+                row["reviewed_by"], row["reviewed_at"] = actor, now
+                if audit_note is not None:
+                    row["review_notes"] = audit_note
+            row["updated_at"] = now
+            if workflow_target:
+                row["workflow_trigger"] = {"target": workflow_target, "request_id": str(uuid.uuid4())}
+                enqueue_trigger(row)
+            tables["audit_logs"].append({
+                "id": str(uuid.uuid4()), "asset_id": row["id"], "old_status": old,
+                "new_status": row["status"], "changed_by": actor, "timestamp": now,
+                "note": audit_note or f"Status changed from {old or 'UNKNOWN'} to {row['status']}",
+            })
+        result.append({
+            "id": row["id"], "old_status": old, "updated": allowed, "status": row.get("status"),
+            **({c: row.get(c) for c in ("topic", "platform", "target_platforms", "updated_at")}
+               if allowed else {"topic": None, "platform": None, "target_platforms": None, "updated_at": None}),
+        })
+    return result
+
+
+def workflow_outbox_claim(claim_target: str, max_rows: int = 50, lease_seconds: int = 120) -> list:
+    now = _now()
+    due = [o for o in tables["workflow_outbox"] if o["target"] == claim_target and (
+        (o["status"] == "PENDING" and datetime.fromisoformat(o["next_attempt_at"]) <= now)
+        or (o["status"] == "IN_FLIGHT" and datetime.fromisoformat(o["locked_until"]) < now))]
+    due.sort(key=lambda o: (o["next_attempt_at"], o["id"]))
+    for o in due[:max_rows]:
+        o["status"], o["attempts"] = "IN_FLIGHT", o["attempts"] + 1
+        o["locked_until"] = (now + timedelta(seconds=lease_seconds)).isoformat()
+    return due[:max_rows]
+
+
+def _ts(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def workflow_stage_running(stage: str, stage_timeout_seconds: int = 900) -> int:
+    now = _now()
+    cutoff = now - timedelta(seconds=stage_timeout_seconds)
+    return sum(1 for o in tables["workflow_outbox"] if o["target"] == stage and o.get("released_at") is None and (
+        (o["status"] == "IN_FLIGHT" and _ts(o["locked_until"]) >= now)
+        or (o["status"] == "DELIVERED" and _ts(o["delivered_at"]) > cutoff)))
+
+
+def workflow_outbox_claim_admitted(claim_target: str, max_rows: int = 50, lease_seconds: int = 120,
+                                   max_running: int = None, stage_timeout_seconds: int = 900) -> list:
+    """Mirrors migration 012 (one process, so no advisory lock is needed)."""
+    now = _now()
+    free = max_rows
+    if max_running is not None:
+        cutoff = now - timedelta(seconds=stage_timeout_seconds)
+        for o in tables["workflow_outbox"]:
+            if (o["target"] == claim_target and o["status"] == "DELIVERED" and o.get("released_at") is None
+                    and _ts(o["delivered_at"]) <= cutoff):
+                o["released_at"] = now.isoformat()
+        free = min(max_rows, max_running - workflow_stage_running(claim_target, stage_timeout_seconds))
+        if free <= 0:
+            return []
+    rows = workflow_outbox_claim(claim_target, free, lease_seconds)
+    for o in rows:
+        o["released_at"] = None
+    return [{**{c: o[c] for c in ("id", "job_id", "target", "payload", "attempts")},
+             "queued_seconds": (now - _ts(o["created_at"])).total_seconds()} for o in rows]
+
+
+def workflow_stage_load(stage_timeout_seconds: int = 900, window_minutes: int = 60) -> list:
+    now = _now()
+    result = []
+    for stage in ("generate", "render", "publish"):
+        rows = [o for o in tables["workflow_outbox"] if o["target"] == stage]
+        pending = [_ts(o["created_at"]) for o in rows if o["status"] == "PENDING"]
+        service = [(_ts(o["released_at"]) - _ts(o["delivered_at"])).total_seconds() for o in rows
+                   if o.get("released_at") and o["delivered_at"]
+                   and _ts(o["released_at"]) > max(now - timedelta(minutes=window_minutes), _ts(o["delivered_at"]))]
+        result.append({
+            "stage": stage,
+            "running": workflow_stage_running(stage, stage_timeout_seconds),
+            "queued": len(pending),
+            "oldest_queued_seconds": (now - min(pending)).total_seconds() if pending else None,
+            "avg_service_seconds": sum(service) / len(service) if service else None,
+        })
+    return result
+
+
+def workflow_outbox_complete(outbox_ids: list, error: str = None, max_attempts: int = 4,
+                             backoff_base_seconds: float = 2, backoff_max_seconds: float = 300) -> list:
+    now = _now()
+    wanted = set(outbox_ids)
+    jobs = {r["id"]: r for r in tables["content_queue"]}
+    changed = []
+    for o in tables["workflow_outbox"]:
+        if o["id"] not in wanted or o["status"] != "IN_FLIGHT":
+            continue
+        o["locked_until"], o["last_error"] = None, error
+        if error is None:
+            o["status"], o["delivered_at"] = "DELIVERED", now.isoformat()
+        else:
+            o["status"] = "FAILED" if o["attempts"] >= max_attempts else "PENDING"
+            delay = min(backoff_max_seconds, backoff_base_seconds * 2 ** (o["attempts"] - 1))
+            o["next_attempt_at"] = (now + timedelta(seconds=delay * (0.5 + random.random() / 2))).isoformat()
+        job = jobs.get(o["job_id"])
+        if job is None or (error is None and o["attempts"] == 1):
+            continue
+        job["retry_count"] = min(o["attempts"] - 1, 3)
+        if error is not None:
+            job["error_log"] = f"{o['target']} trigger failed (attempt {o['attempts']}): {error}"
+        if o["status"] == "FAILED":
+            job["status"] = "ERROR"
+        job["updated_at"] = now.isoformat()
+        changed.append({c: job.get(c) for c in ("id", "status", "retry_count", "error_log", "updated_at")})
+    return changed
+
+
+def render_claim(worker: str, max_jobs: int = 1, lease_seconds: int = 120, max_retries: int = 3) -> list:
+    """Mirrors migration 013 (one process: no row locks needed)."""
+    now = _now()
+    expired = [r for r in tables["content_queue"] if r.get("status") == "PENDING_RENDER"
+               and r.get("render_lease_owner") and _ts(r["render_lease_until"]) < now]
+    for r in expired:
+        if r.get("retry_count", 0) >= max_retries:
+            r["error_log"] = (f"Render by {r['render_lease_owner']} did not finish (lease expired) "
+                              f"after {r['retry_count'] + 1} attempts")
+            r["status"], r["updated_at"] = "ERROR", now.isoformat()
+            render_queued(r, "PENDING_RENDER")
+    if max_jobs <= 0:
+        return []
+    due = [r for r in tables["content_queue"] if r.get("status") == "PENDING_RENDER"
+           and (not r.get("render_lease_until") or _ts(r["render_lease_until"]) < now)]
+    due.sort(key=lambda r: (-(r.get("render_priority") or 0), r.get("render_queued_at") or r["updated_at"], r["id"]))
+    claimed = []
+    for r in due[:max_jobs]:
+        if r.get("render_lease_owner"):
+            r["retry_count"] = r.get("retry_count", 0) + 1
+            r["error_log"] = (f"Render by {r['render_lease_owner']} did not finish (lease expired), "
+                              f"attempt {r['retry_count']}")
+        r["render_lease_owner"] = worker
+        r["render_lease_until"] = (now + timedelta(seconds=lease_seconds)).isoformat()
+        claimed.append({
+            **{c: r.get(c) for c in ("id", "topic", "script_content", "script_structure", "retry_count")},
+            "render_priority": r.get("render_priority") or 0,
+            "queued_seconds": (now - _ts(r.get("render_queued_at") or r["updated_at"])).total_seconds(),
+        })
+    return claimed
+
+
+def _leased(worker: str, job_ids: list) -> list:
+    wanted = set(job_ids)
+    return [r for r in tables["content_queue"] if r["id"] in wanted and r.get("status") == "PENDING_RENDER"
+            and r.get("render_lease_owner") == worker]
+
+
+def render_renew(worker: str, job_ids: list, lease_seconds: int = 120) -> list:
+    until = (_now() + timedelta(seconds=lease_seconds)).isoformat()
+    for r in _leased(worker, job_ids):
+        r["render_lease_until"] = until
+    return [{"id": r["id"]} for r in _leased(worker, job_ids)]
+
+
+def render_complete(worker: str, job_id: str, output_url: str = None, error: str = None,
+                    max_retries: int = 3, backoff_base_seconds: float = 30) -> list:
+    now = _now()
+    result = []
+    for r in _leased(worker, [job_id]):
+        retries = r.get("retry_count", 0)
+        r["render_lease_owner"], r["render_lease_until"] = None, None
+        if error is None:
+            r["status"], r["video_url"] = "READY_TO_PUBLISH", output_url
+        elif retries >= max_retries:
+            r["status"] = "ERROR"
+        else:
+            r["retry_count"] = retries + 1
+            r["render_lease_until"] = (now + timedelta(seconds=backoff_base_seconds * 2 ** retries)).isoformat()
+        if error is not None:
+            r["error_log"] = f"Render failed (attempt {retries + 1}): {error}"
+        r["updated_at"] = now.isoformat()
+        release_stage(r)
+        result.append({c: r.get(c) for c in ("id", "status", "video_url", "retry_count", "error_log", "updated_at")})
+    return result
+
+
+def render_release(worker: str, job_ids: list) -> list:
+    released = _leased(worker, job_ids)
+    for r in released:
+        r["render_lease_owner"], r["render_lease_until"] = None, None
+    return [{"id": r["id"]} for r in released]
+
+
+@functools.lru_cache(maxsize=100000)
+def _unit_vector(literal: str) -> tuple:
+    vector = json.loads(literal)
+    norm = math.sqrt(sum(x * x for x in vector))
+    return tuple(x / norm for x in vector)
+
+
+def _vector(value) -> tuple:
+    return _unit_vector(value if isinstance(value, str) else json.dumps(value))
+
+
+def match_tax_laws(query_embedding, match_threshold: float, match_count: int, filter: dict = None,
+                   ef_search: int = None) -> list:
+    """Exact cosine search (migration 015 semantics: top match_count, then the threshold)."""
+    query = _vector(query_embedding)
+    scored = []
+    for row in tables["tax_laws"]:
+        if not row.get("embedding") or any((row.get("metadata") or {}).get(k) != v
+                                           for k, v in (filter or {}).items()):
+            continue
+        scored.append((sum(a * b for a, b in zip(_vector(row["embedding"]), query)), row))
+    scored.sort(key=lambda s: -s[0])
+    return [{"id": r["id"], "content": r.get("content"), "metadata": r.get("metadata"), "similarity": score}
+            for score, r in scored[:match_count] if score > match_threshold]
+
+
+RPC = {
+    "content_queue_stats": content_queue_stats,
+    "content_queue_bulk_transition": content_queue_bulk_transition,
+    "workflow_outbox_claim": workflow_outbox_claim,
+    "workflow_outbox_complete": workflow_outbox_complete,
+    "workflow_outbox_claim_admitted": workflow_outbox_claim_admitted,
+    "workflow_stage_load": workflow_stage_load,
+    "render_claim": render_claim,
+    "render_renew": render_renew,
+    "render_complete": render_complete,
+    "render_release": render_release,
+    "match_tax_laws": match_tax_laws,
+}
+
+
+@app.post("/rest/v1/rpc/{fn}")
+async def call_rpc(fn: str, request: Request):
+    if fn not in RPC:
+        return JSONResponse({"message": f"function {fn} does not exist"}, status_code=404)
+    args = json.loads(await request.body() or b"{}")
+    return JSONResponse(RPC[fn](**args))
@@ -0,0 +1,278 @@
+"""
+Reproducible benchmark suite for the Admin API.
+
+Every scenario boots admin_api.main:app against fresh local stand-ins
+(stub_postgrest, stub_n8n), drives a fixed traffic mix for --duration
+seconds after a short warm-up, and records per endpoint RPS, p50/p95/p99,
+max and errors, plus the API process RSS (start / peak / end).
+
+Scenarios:
+  pollers          many dashboards polling /active-queue (full rows and projected)
+  generate_burst   bursts of /generate-script while a few pollers keep reading
+  analytics_large  /analytics and /active-queue over a 50k row content_queue
+  mixed            all of the above at once
+
+Results are written as JSON (default tests/bench/results/<time>-<commit>.json)
+so runs can be compared:
+
+    python -m tests.bench.suite run
+    python -m tests.bench.suite run --scenarios pollers analytics_large --duration 20
+    python -m tests.bench.suite compare tests/bench/results/A.json tests/bench/results/B.json
+
+`compare` exits non-zero when p95 grows or RPS drops by more than
+--max-regression (default 20%), or errors appear. --postgrest-url points
+the API at an already running PostgREST (e.g. `supabase start`) instead of
+the stub; the stub rows settings are ignored then.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+from tests.bench.harness import (ROOT, STUB_SUPABASE_KEY, api_env, burst, hammer, process_rss, serve,
+                                 serve_process, summarize)
+
+RESULTS_DIR = os.path.join(ROOT, "tests", "bench", "results")
+
+
+def new_topic() -> dict:
+    return {"topic": f"bench-{uuid.uuid4()}", "source_url": "https://example.org/bench"}
+
+
+BODIES = {"new_topic": new_topic}
+
+# name -> stub settings + workloads. A workload is closed-loop
+# (concurrency, think_time) or open-loop bursts (burst, interval).
+SCENARIOS = {
+    "pollers": {
+        "stub_env": {"STUB_ROWS": "2000"},
+        "workloads": [
+            {"name": "GET /active-queue", "method": "GET", "url": "/active-queue",
+             "concurrency": 40, "think_time": 0.1},
+            {"name": "GET /active-queue?fields", "method": "GET",
+             "url": "/active-queue?fields=id,topic,status,platform,updated_at&limit=50",
+             "concurrency": 20, "think_time": 0.1},
+        ],
+    },
+    "generate_burst": {
+        "stub_env": {"STUB_ROWS": "2000"},
+        "workloads": [
+            {"name": "POST /generate-script", "method": "POST", "url": "/generate-script",
+             "body": "new_topic", "burst": 25, "interval": 1.0},
+            {"name": "GET /active-queue", "method": "GET", "url": "/active-queue",
+             "concurrency": 10, "think_time": 0.1},
+        ],
+    },
+    "analytics_large": {
+        "stub_env": {"STUB_ROWS": "50000", "STUB_BODY_REPEAT": "2"},
+        "workloads": [
+            {"name": "GET /analytics", "method": "GET", "url": "/analytics", "concurrency": 8},
+            {"name": "GET /active-queue", "method": "GET", "url": "/active-queue?limit=50",
+             "concurrency": 8, "think_time": 0.05},
+        ],
+    },
+    "mixed": {
+        "stub_env": {"STUB_ROWS": "10000", "STUB_BODY_REPEAT": "10"},
+        "workloads": [
+            {"name": "GET /active-queue", "method": "GET", "url": "/active-queue",
+             "concurrency": 30, "think_time": 0.2},
+            {"name": "GET /analytics", "method": "GET", "url": "/analytics",
+             "concurrency": 4, "think_time": 0.5},
+            {"name": "POST /generate-script", "method": "POST", "url": "/generate-script",
+             "body": "new_topic", "burst": 10, "interval": 1.0},
+            {"name": "GET /health", "method": "GET", "url": "/health", "concurrency": 2, "think_time": 0.1},
+        ],
+    },
+}
+
+
+def run_workload(client: httpx.AsyncClient, w: dict, duration: float):
+    body = BODIES[w["body"]] if w.get("body") else None
+    if "burst" in w:
+        return burst(client, w["method"], w["url"], duration, w["burst"], w["interval"], body_factory=body)
+    return hammer(client, w["method"], w["url"], duration, w.get("concurrency", 1),
+                  body_factory=body, think_time=w.get("think_time", 0))
+
+
+async def sample_memory(pid: int, samples: list, stop: asyncio.Event, interval: float = 0.25):
+    while not stop.is_set():
+        samples.append(process_rss(pid))
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def drive(api: str, pid: int, spec: dict, duration: float, warmup: float) -> dict:
+    async with httpx.AsyncClient(base_url=api, timeout=120,
+                                 limits=httpx.Limits(max_connections=500)) as client:
+        # Warm-up: connection pools, caches and lazily created clients
+        if warmup:
+            await asyncio.gather(*(hammer(client, w["method"], w["url"], warmup, 1)
+                                   for w in spec["workloads"] if w["method"] == "GET"))
+        rss, stop = [], asyncio.Event()
+        memory = asyncio.create_task(sample_memory(pid, rss, stop))
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(run_workload(client, w, duration) for w in spec["workloads"]))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await memory
+    mb = [r / 2 ** 20 for r in rss if r] or [0.0]
+    return {
+        "duration_s": round(elapsed, 2),
+        "endpoints": {w["name"]: summarize(lat, err, elapsed)
+                      for w, (lat, err) in zip(spec["workloads"], results)},
+        "memory_mb": {"start": round(mb[0], 1), "peak": round(max(mb), 1), "end": round(mb[-1], 1)},
+    }
+
+
+def run_scenario(name: str, args) -> dict:
+    spec = SCENARIOS[name]
+    extra = dict(kv.split("=", 1) for kv in args.api_env)
+    print(f"\n== {name} ({args.duration:.0f}s, {args.workers} worker(s))", flush=True)
+    with serve("tests.bench.stub_n8n:app", env={"STUB_N8N_DELAY": str(args.n8n_delay)}) as n8n_url:
+        if args.postgrest_url:
+            env = {"SUPABASE_URL": args.postgrest_url, "SUPABASE_KEY": args.supabase_key,
+                   "N8N_BASE_URL": n8n_url, **extra}
+            with serve_process("admin_api.main:app", env=env, workers=args.workers) as (api, proc):
+                result = asyncio.run(drive(api, proc.pid, spec, args.duration, args.warmup))
+        else:
+            with serve("tests.bench.stub_postgrest:app", env=spec["stub_env"]) as pg_url, \
+                    serve_process("admin_api.main:app", env=api_env(pg_url, n8n_url, **extra),
+                                  workers=args.workers) as (api, proc):
+                result = asyncio.run(drive(api, proc.pid, spec, args.duration, args.warmup))
+    result["config"] = spec
+    print_scenario(result)
+    return result
+
+
+def print_scenario(result: dict):
+    print(f"{'':28} {'count':>7} {'err':>5} {'rps':>8} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9} {'maxms':>9}")
+    for name, s in result["endpoints"].items():
+        print(f"{name:28} {s['count']:>7} {s['errors']:>5} {s.get('rps', 0):>8} {s['p50_ms']:>9} "
+              f"{s['p95_ms']:>9} {s['p99_ms']:>9} {s['max_ms']:>9}")
+    m = result["memory_mb"]
+    print(f"API RSS MB: start {m['start']}  peak {m['peak']}  end {m['end']}")
+
+
+def git(*cmd) -> str:
+    try:
+        return subprocess.run(["git", *cmd], cwd=ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def run(args) -> int:
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+        return 2
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "commit": commit,
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k != "func"},
+        },
+        "scenarios": {name: run_scenario(name, args) for name in args.scenarios},
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.baseline:
+        return compare_reports(load(args.baseline), report, args.max_regression)
+    return 0
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _delta(old: float, new: float) -> float:
+    return (new - old) / old if old else 0.0
+
+
+def compare_reports(old: dict, new: dict, max_regression: float) -> int:
+    print(f"\nBaseline {old['meta']['commit']} ({old['meta']['created_at']}) -> "
+          f"{new['meta']['commit']} ({new['meta']['created_at']})")
+    regressions = []
+    for scenario, result in new["scenarios"].items():
+        base = old["scenarios"].get(scenario)
+        if base is None:
+            continue
+        print(f"\n== {scenario}")
+        print(f"{'':28} " + " ".join(f"{k:>24}" for k in ("rps", "p50ms", "p95ms", "p99ms")))
+        for endpoint, s in result["endpoints"].items():
+            b = base["endpoints"].get(endpoint)
+            if b is None:
+                continue
+            cells = [f"{b.get(k, 0)} -> {s.get(k, 0)} ({_delta(b.get(k, 0), s.get(k, 0)):+.0%})"
+                     for k in ("rps", "p50_ms", "p95_ms", "p99_ms")]
+            print(f"{endpoint:28} " + " ".join(f"{c:>24}" for c in cells))
+            if _delta(b["p95_ms"], s["p95_ms"]) > max_regression:
+                regressions.append(f"{scenario} {endpoint}: p95 {b['p95_ms']} -> {s['p95_ms']} ms")
+            if "burst" not in next((w for w in result["config"]["workloads"] if w["name"] == endpoint), {}) \
+                    and -_delta(b.get("rps", 0), s.get("rps", 0)) > max_regression:
+                regressions.append(f"{scenario} {endpoint}: rps {b.get('rps')} -> {s.get('rps')}")
+            if s["errors"] > b["errors"]:
+                regressions.append(f"{scenario} {endpoint}: errors {b['errors']} -> {s['errors']}")
+        bm, m = base["memory_mb"], result["memory_mb"]
+        print(f"API RSS peak MB: {bm['peak']} -> {m['peak']} ({_delta(bm['peak'], m['peak']):+.0%})")
+    print()
+    for r in regressions:
+        print("REGRESSION", r)
+    print("RESULT:", "FAIL" if regressions else "OK")
+    return 1 if regressions else 0
+
+
+def compare(args) -> int:
+    return compare_reports(load(args.baseline), load(args.current), args.max_regression)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="run scenarios and write a results file")
+    p.add_argument("--scenarios", nargs="+", default=list(SCENARIOS))
+    p.add_argument("--duration", type=float, default=15)
+    p.add_argument("--warmup", type=float, default=2)
+    p.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API")
+    p.add_argument("--n8n-delay", type=float, default=0.2)
+    p.add_argument("--api-env", nargs="*", default=[], metavar="KEY=VALUE",
+                   help="extra Admin API environment, e.g. RESPONSE_CACHE_TTL=0")
+    p.add_argument("--postgrest-url", help="use this PostgREST instead of the stub")
+    p.add_argument("--supabase-key", default=STUB_SUPABASE_KEY)
+    p.add_argument("--output", help="results file (default tests/bench/results/<time>-<commit>.json)")
+    p.add_argument("--baseline", help="results file to compare this run against")
+    p.add_argument("--max-regression", type=float, default=0.2)
+    p.set_defaults(func=run)
+
+    c = sub.add_parser("compare", help="compare two results files")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    c.add_argument("--max-regression", type=float, default=0.2)
+    c.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()